@@ -1,10 +1,17 @@
-import sys
+import os
+import datetime
+import typer
 import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib
+from typing import Optional
+from _crawling_functions import crawling_objects, metrics
 matplotlib.use('Qt5Agg')  # Choose backend here
 
 
+app = typer.Typer()
+
+
 def draw_graph(numbers_list):
     plt.plot(np.arange(len(numbers_list)), numbers_list)
     plt.title(f'Currently at {numbers_list[-1]}')
@@ -16,7 +23,120 @@ def read_numbers_from_file(file_path):
         return [int(line.strip()) for line in file.readlines()]
 
 
+def per_second(times, values):
+    """
+    Turn a counter into its increase per second between two samples.
+    A counter that went down was restarted with the crawler, the
+    interval after the restart has no value.
+    """
+    rates = [None]
+    for i in range(1, len(times)):
+        before, after = values[i - 1], values[i]
+        elapsed = times[i] - times[i - 1]
+        if before is None or after is None or after < before or elapsed <= 0:
+            rates.append(None)
+        else:
+            rates.append((after - before) / elapsed)
+    return rates
+
+
+def mean_per_interval(sums, counts):
+    """Average a histogram over the values observed between two samples."""
+    means = [None]
+    for i in range(1, len(sums)):
+        if None in (sums[i - 1], sums[i], counts[i - 1], counts[i]):
+            means.append(None)
+            continue
+        observed = counts[i] - counts[i - 1]
+        means.append(
+            (sums[i] - sums[i - 1]) / observed if observed > 0 else None
+        )
+    return means
+
+
+def draw_series(times, lines, title):
+    dates = [datetime.datetime.fromtimestamp(t) for t in times]
+    for name, values in lines.items():
+        plt.plot(
+            dates,
+            [np.nan if value is None else value for value in values],
+            label=name
+        )
+    plt.title(title)
+    plt.legend(fontsize='small')
+    plt.gcf().autofmt_xdate()
+    plt.show()
+
+
+@app.command()
+def build_graph(
+    directory: str = typer.Argument(..., help="Site directory of the crawl"),
+    metric: Optional[str] = typer.Argument(
+        None,
+        help="Plot the series whose name contains this text, "
+             "e.g. crawl_frontier_urls or status=\"404\""
+    ),
+    rate: bool = typer.Option(
+        False,
+        "--rate",
+        help="Plot the increase per second of counters, e.g. pages/s"
+    ),
+    mean: bool = typer.Option(
+        False,
+        "--mean",
+        help="Plot the mean of histograms between two samples, "
+             "e.g. the fetch latency"
+    ),
+    list_series: bool = typer.Option(
+        False,
+        "--list",
+        help="Print the names of all series in the metrics file"
+    )
+):
+    """
+    Plot metrics of a crawl from resources/metrics.tsv.
+
+    Without a metrics file, the length of the queue after every page is
+    plotted from resources/graph.txt.
+    """
+    tracking_files = crawling_objects.TrackingFiles(directory.rstrip('/'))
+    if not os.path.exists(tracking_files.metrics):
+        draw_graph(read_numbers_from_file(tracking_files.graph))
+        return
+
+    times, series = metrics.read_series(tracking_files.metrics)
+    if list_series:
+        for name in series:
+            typer.echo(name)
+        return
+
+    metric = metric or 'crawl_frontier_urls'
+    names = [name for name in series if metric in name]
+    if mean:
+        names = [
+            name for name in names
+            if '_sum' in name and name.replace('_sum', '_count', 1) in series
+        ]
+    if not names:
+        typer.echo(f"Error: No series matches '{metric}', see --list")
+        raise typer.Exit(1)
+
+    lines = {}
+    for name in names:
+        if mean:
+            lines[name.replace('_sum', '', 1)] = mean_per_interval(
+                series[name], series[name.replace('_sum', '_count', 1)]
+            )
+        elif rate:
+            lines[name] = per_second(times, series[name])
+        else:
+            lines[name] = series[name]
+    if mean:
+        metric += ' (mean)'
+    elif rate:
+        metric += ' (per second)'
+    draw_series(times, lines, metric)
+
+
 if __name__ == '__main__':
-    directory = sys.argv[1]
-    numbers = read_numbers_from_file(f'{directory}/resources/graph.txt')
-    draw_graph(numbers)
+    app()
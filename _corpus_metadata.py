@@ -1,5 +1,6 @@
 import os
 import sys
+from _crawling_functions import page_store, site_status
 
 
 def count_files(directory):
@@ -8,8 +9,13 @@ def count_files(directory):
     if not os.path.exists(directory):
         raise FileNotFoundError(f'Directory {directory} not found.')
 
-    for _, _, files in os.walk(directory):
-        file_count += len(files)
+    for root, _, files in os.walk(directory):
+        # Segments hold many pages, which are counted from their index
+        file_count += sum(
+            1 for f in files
+            if not page_store.is_segment(f) and f != page_store.INDEX_FILE
+        )
+        file_count += sum(1 for _ in page_store.iter_index(root))
     return file_count
 
 
@@ -21,13 +27,21 @@ except IndexError:
     print('Please provide a site name as an argument.')
     sys.exit(1)
 
-try:
-    article_files = count_files(f'{site}page_contents')
-    board_files = count_files(f'{site}board_pages')
-
-except FileNotFoundError:
-    article_files = count_files(f'{site}article_pages')
-    board_files = count_files(f'{site}nonarticle_pages')
+# The counts kept by the crawler, see status.py. --recount counts the
+# stored files instead
+summary = site_status.site_status(site.rstrip('/'))
+if summary is not None and '--recount' not in sys.argv[2:]:
+    article_files = summary['stored']['article']
+    board_files = summary['stored']['nonarticle']
+
+else:
+    try:
+        article_files = count_files(f'{site}page_contents')
+        board_files = count_files(f'{site}board_pages')
+
+    except FileNotFoundError:
+        article_files = count_files(f'{site}article_pages')
+        board_files = count_files(f'{site}nonarticle_pages')
 
 print(f'article files: {article_files}')
 print(f'Board files: {board_files}')
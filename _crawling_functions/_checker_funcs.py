@@ -16,8 +16,15 @@ TOPICS = (
 )
 
 
-def spektrum_is_ai(html, url):
+def _parsed(html, document):
+    """Return the tree and the text getter of a page, parsing it if needed."""
+    if document is not None:
+        return document.soup, lambda: document.text
     soup = BeautifulSoup(html, 'lxml')
+    return soup, lambda: soup.get_text(separator=' ')
+
+
+def spektrum_is_ai(html, url, document=None):
 
     # Check if the URL contains a topic
     # we care about
@@ -27,6 +34,8 @@ def spektrum_is_ai(html, url):
     if not re.search(r'[0-9]{3}$', url):
         return True
 
+    soup, get_text = _parsed(html, document)
+
     # Check the keywords if they contain AI terms
     kywds = soup.find('meta', {'name': 'keywords'})
     if kywds is not None:
@@ -36,16 +45,16 @@ def spektrum_is_ai(html, url):
                 return True
 
     # Check the text for AI terms
-    text = soup.get_text(separator=' ')
+    text = get_text()
     if len(re.findall(AI_PATTERN, text)) > 2:
         return True
 
     return False
 
 
-def infoakt_is_ai(html, _url):
+def infoakt_is_ai(html, _url, document=None):
 
-    soup = BeautifulSoup(html, 'lxml')
+    soup, get_text = _parsed(html, document)
 
     # Check if the page is an article.
     # If not, we crawl it to find more articles
@@ -61,7 +70,7 @@ def infoakt_is_ai(html, _url):
                 return True
 
     # Check the text for AI terms
-    text = soup.get_text(separator=' ')
+    text = get_text()
     if len(re.findall(AI_PATTERN, text)) > 1:
         return True
 
@@ -75,8 +84,8 @@ def array_element_in_string(array, string):
     return False
 
 
-def zeit_is_health(html, _url):
-    soup = BeautifulSoup(html, 'lxml')
+def zeit_is_health(html, _url, document=None):
+    soup, _ = _parsed(html, document)
     meta = soup.find_all('meta')
     if meta:
         for tag in meta:
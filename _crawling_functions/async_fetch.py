@@ -0,0 +1,168 @@
+"""
+This module contains the asynchronous fetch engine. It keeps many
+requests in flight at once while limiting how often and how many
+requests hit the same host (see politeness.PolitenessScheduler).
+
+Author: Bruno Brocai
+"""
+
+import asyncio
+import concurrent.futures
+import time
+from urllib.parse import urlsplit
+from . import politeness
+from . import robots
+
+
+def host_of(url):
+    """Return the lowercased host (and port) part of a URL."""
+    return urlsplit(url).netloc.lower()
+
+
+class HostLimiter:
+    """
+    Limit the number of simultaneous requests per host and space
+    consecutive requests to the same host as the politeness scheduler
+    decides.
+    """
+
+    def __init__(self, per_host=1, delay=(3, 7), scheduler=None):
+        self.per_host = per_host
+        self.scheduler = scheduler or politeness.PolitenessScheduler(delay)
+        self._semaphores = {}
+
+    async def acquire(self, host):
+        """
+        Wait until a request to the host is allowed.
+
+        A task cancelled while it waits holds no slot afterwards.
+        """
+        semaphore = self._semaphores.setdefault(
+            host, asyncio.Semaphore(self.per_host)
+        )
+        await semaphore.acquire()
+
+        # The slot is reserved before sleeping,
+        # so concurrent waiters for the same host queue up behind it
+        wait = self.scheduler.reserve(host)
+        if wait > 0:
+            try:
+                await asyncio.sleep(wait)
+            except asyncio.CancelledError:
+                semaphore.release()
+                raise
+
+    def release(self, host):
+        """Free the request slot taken by acquire."""
+        self._semaphores[host].release()
+
+
+class FetchEngine:
+    """
+    Run a blocking fetch function for many URLs concurrently.
+
+    The fetch function is executed in a thread pool, so the same
+    functions used by the sequential crawler can be reused. A URL
+    fetched with a robots.txt cache is checked against it first. The
+    robots.txt of a new host is fetched once, in the thread pool and
+    within the per-host limits, while the fetches of that host wait.
+    """
+
+    def __init__(
+        self, fetch_func, concurrency=8, per_host=1, delay=(3, 7),
+        scheduler=None
+    ):
+        self.fetch_func = fetch_func
+        self.concurrency = concurrency
+        self.limiter = HostLimiter(per_host, delay, scheduler)
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=concurrency
+        )
+        self._robots_loads = {}
+
+    async def _load_robots(self, cache, origin):
+        """Fetch the robots.txt of a host like a page and install it."""
+        host = host_of(origin)
+        acquired = False
+        start = time.monotonic()
+        try:
+            await self.limiter.acquire(host)
+            acquired = True
+            start = time.monotonic()
+            loop = asyncio.get_running_loop()
+            parser = await loop.run_in_executor(
+                self._executor, cache.fetch, origin
+            )
+            self.limiter.scheduler.record(host, time.monotonic() - start)
+            cache.install(origin, parser)
+        finally:
+            if acquired:
+                self.limiter.release(host)
+            self._robots_loads.pop((id(cache), origin), None)
+
+    async def check_robots(self, cache, url):
+        """
+        Make sure a URL is allowed, reading the robots.txt of its host
+        first if it is new.
+
+        Raises:
+            robots.Disallowed: If robots.txt disallows the URL.
+        """
+        origin = robots.origin_of(url)
+        if origin is not None and cache.parser(origin, load=False) is None:
+            key = (id(cache), origin)
+            load = self._robots_loads.get(key)
+            if load is None:
+                load = self._robots_loads[key] = asyncio.ensure_future(
+                    self._load_robots(cache, origin)
+                )
+            # A cancelled fetch must not cancel the load the other
+            # fetches of the host wait for
+            await asyncio.shield(load)
+        if not cache.can_fetch(url):
+            raise robots.Disallowed(f'Disallowed by robots.txt: {url}')
+
+    async def fetch(self, url, *args, robots_cache=None):
+        """
+        Fetch a URL while respecting the per-host limits.
+
+        Args:
+            url (str): The URL.
+            *args: Passed on to the fetch function.
+            robots_cache (robots.RobotsCache): The robots.txt rules the
+                URL is checked against, or None.
+
+        Returns:
+            tuple: The URL, the result of the fetch function (or None)
+                and the exception raised during the fetch (or None),
+                robots.Disallowed if robots.txt disallows the URL.
+        """
+        if robots_cache is not None:
+            try:
+                await self.check_robots(robots_cache, url)
+            except robots.Disallowed as e:
+                return url, None, e
+        host = host_of(url)
+        acquired = False
+        start = time.monotonic()
+        try:
+            # Cancelled while waiting in acquire, the slot is not taken
+            await self.limiter.acquire(host)
+            acquired = True
+            start = time.monotonic()
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(
+                self._executor, self.fetch_func, url, *args
+            )
+            self.limiter.scheduler.record(host, time.monotonic() - start)
+            return url, result, None
+        except Exception as e:  # pylint: disable=broad-except
+            self.limiter.scheduler.record(host, time.monotonic() - start, e)
+            return url, None, e
+        finally:
+            if acquired:
+                self.limiter.release(host)
+
+    def close(self):
+        """Shut down the thread pool."""
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,207 @@
+"""
+This module contains the browser pool used to render dynamic pages.
+One Chromium instance is kept alive for the whole crawl and a fixed
+number of browser contexts with one page each are reused for rendering.
+
+Playwright is only imported when the first page is rendered, so the
+static crawler runs without it.
+
+Author: Bruno Brocai
+"""
+
+import asyncio
+import atexit
+import threading
+
+
+class PageSlot:
+    """A browser context with its page and the number of pages it rendered."""
+
+    def __init__(self, context, page):
+        self.context = context
+        self.page = page
+        self.uses = 0
+
+
+class BrowserPool:
+    """
+    A long-lived browser with a pool of reusable contexts and pages.
+
+    The browser runs on its own event loop in a background thread, so
+    render can be called from any thread (e.g. the workers of the
+    concurrent fetch engine) and up to `size` pages render at once.
+
+    Attributes:
+        size (int): The number of contexts/pages kept open.
+        recycle_after (int): The number of pages a context renders before
+            it is closed and replaced by a fresh one.
+    """
+
+    def __init__(self, size=1, recycle_after=50):
+        self.size = size
+        self.recycle_after = recycle_after
+
+        self.pages_rendered = 0
+        self.recycled = 0
+        self.crashes = 0
+
+        self._playwright = None
+        self._browser = None
+        self._slots = None
+        self._start_lock = None
+
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._loop.run_forever, daemon=True
+        )
+        self._thread.start()
+
+    def render(self, url, selector='body', timeout=300):
+        """
+        Render a URL and return its HTML.
+
+        Args:
+            url (str): The URL to render.
+            selector (str): CSS selector to wait for before reading the page.
+            timeout (int): Milliseconds to wait for the selector.
+
+        Returns:
+            str: The rendered HTML content.
+
+        Raises:
+            playwright.async_api.Error: If the page could not be rendered.
+        """
+        future = asyncio.run_coroutine_threadsafe(
+            self._render(url, selector, timeout), self._loop
+        )
+        return future.result()
+
+    def close(self):
+        """Close the browser and stop the background loop."""
+        if self._loop.is_closed():
+            return
+        if self._playwright is not None:
+            asyncio.run_coroutine_threadsafe(
+                self._shutdown(), self._loop
+            ).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+    async def _start(self):
+        # The lock has to be created inside the loop it is used in
+        if self._start_lock is None:
+            self._start_lock = asyncio.Lock()
+        async with self._start_lock:
+            if self._slots is not None:
+                return
+            if self._playwright is None:
+                from playwright.async_api import async_playwright  # pylint: disable=import-outside-toplevel
+                self._playwright = await async_playwright().start()
+            await self._launch_browser()
+            self._slots = asyncio.Queue()
+            for _ in range(self.size):
+                await self._slots.put(await self._new_slot())
+
+    async def _launch_browser(self):
+        self._browser = await self._playwright.chromium.launch(headless=True)
+
+    async def _new_slot(self):
+        if not self._browser.is_connected():
+            await self._launch_browser()
+        context = await self._browser.new_context()
+        page = await context.new_page()
+        return PageSlot(context, page)
+
+    async def _recycle(self, slot):
+        self.recycled += 1
+        try:
+            await slot.context.close()
+        except Exception:  # pylint: disable=broad-except
+            pass
+        return await self._new_slot()
+
+    async def _render(self, url, selector, timeout):
+        from playwright.async_api import TimeoutError as PlaywrightTimeoutError  # pylint: disable=import-outside-toplevel
+
+        await self._start()
+        slot = await self._slots.get()
+        try:
+            await slot.page.goto(url)
+            await slot.page.wait_for_selector(selector, timeout=timeout)
+            html = await slot.page.content()
+            slot.uses += 1
+            self.pages_rendered += 1
+            if slot.uses >= self.recycle_after:
+                slot = await self._recycle(slot)
+            return html
+        except PlaywrightTimeoutError:
+            raise
+        except Exception:
+            # The page or the whole browser crashed, start over
+            self.crashes += 1
+            slot = await self._recycle(slot)
+            raise
+        finally:
+            self._slots.put_nowait(slot)
+
+    async def _shutdown(self):
+        while self._slots is not None and not self._slots.empty():
+            slot = self._slots.get_nowait()
+            try:
+                await slot.context.close()
+            except Exception:  # pylint: disable=broad-except
+                pass
+        try:
+            if self._browser is not None:
+                await self._browser.close()
+        finally:
+            await self._playwright.stop()
+            self._browser = None
+            self._playwright = None
+
+    def stats(self):
+        """Return the number of rendered pages, recycled contexts and crashes."""
+        return {
+            'pages_rendered': self.pages_rendered,
+            'recycled': self.recycled,
+            'crashes': self.crashes,
+        }
+
+
+_POOL = None
+_POOL_LOCK = threading.Lock()
+
+
+def configure(**kwargs):
+    """
+    Replace the shared pool by one created with the given arguments.
+
+    Args:
+        **kwargs: Passed on to BrowserPool.
+
+    Returns:
+        BrowserPool: The new shared pool.
+    """
+    global _POOL  # pylint: disable=global-statement
+    with _POOL_LOCK:
+        if _POOL is not None:
+            _POOL.close()
+        _POOL = BrowserPool(**kwargs)
+    return _POOL
+
+
+def get_pool():
+    """Return the shared pool, creating it on first use."""
+    global _POOL  # pylint: disable=global-statement
+    if _POOL is None:
+        with _POOL_LOCK:
+            if _POOL is None:
+                _POOL = BrowserPool()
+    return _POOL
+
+
+@atexit.register
+def _close_pool():
+    if _POOL is not None:
+        _POOL.close()
@@ -72,15 +72,23 @@ def relevant_set_regex(
     starts_pattern=None, notstart_pattern=None,
     includes_pattern=None, excludes_pattern=None
 ):
+    checks = []
     if starts_pattern:
-        set_ = set_elements_startwith_regex(set_, starts_pattern)
+        checks.append(re.compile(starts_pattern).match)
     if notstart_pattern:
-        set_ = set_elements_notstartwith_regex(set_, notstart_pattern)
+        notstart = re.compile(notstart_pattern).match
+        checks.append(lambda element: not notstart(element))
     if includes_pattern:
-        set_ = set_elements_contain_regex(set_, includes_pattern)
+        checks.append(re.compile(includes_pattern).search)
     if excludes_pattern:
-        set_ = set_elements_notcontain_regex(set_, excludes_pattern)
-    return set_
+        excludes = re.compile(excludes_pattern).search
+        checks.append(lambda element: not excludes(element))
+
+    # Filter in a single pass instead of building a set per pattern
+    return {
+        element for element in set_
+        if all(check(element) for check in checks)
+    }
 
 
 def relevant_set(
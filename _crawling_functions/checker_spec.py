@@ -0,0 +1,233 @@
+"""
+This module contains the declarative relevance checkers. Instead of a
+function in _checker_funcs.py, a checker can be described by a section
+in checkers.ini: topics in the URL, rules for the meta tags and a
+minimum number of terms in the text. A section is compiled once into
+precompiled regular expressions and, if the pyahocorasick package is
+installed, Aho-Corasick automata for the term lists. The rules are
+checked in a fixed order and the first rule that decides ends the check.
+
+A pattern option can name a pattern of _checker_funcs.py instead of
+repeating it, e.g. `body_pattern = @AI_PATTERN`. The [Template] section
+lists the options for new checkers and is not compiled.
+
+Author: Bruno Brocai
+"""
+
+import configparser
+import itertools
+import re
+from . import _checker_funcs
+from . import document as page_document
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+
+OPTIONS = (
+    'url_topics', 'article_url', 'article_canonical', 'meta_names',
+    'meta_separator', 'meta_terms', 'meta_pattern', 'body_pattern',
+    'body_min_count', 'default',
+)
+
+# The section that only shows the options, as in patterns.ini
+TEMPLATE = 'Template'
+
+
+def split_terms(value):
+    """Split a list option into its terms, one per line or comma."""
+    if not value:
+        return ()
+    return tuple(
+        term.strip() for term in re.split(r'[\n,]', value) if term.strip()
+    )
+
+
+class TermMatcher:
+    """
+    Find out whether a text contains one of a list of terms.
+
+    Uses an Aho-Corasick automaton if pyahocorasick is installed and a
+    regular expression alternation of the terms otherwise.
+    """
+
+    def __init__(self, terms):
+        self.terms = terms
+        if ahocorasick is not None:
+            self._automaton = ahocorasick.Automaton()
+            for term in terms:
+                self._automaton.add_word(term, term)
+            self._automaton.make_automaton()
+            self._regex = None
+        else:
+            self._automaton = None
+            self._regex = re.compile(
+                '|'.join(re.escape(term) for term in sorted(
+                    terms, key=len, reverse=True
+                ))
+            )
+
+    def search(self, text):
+        """Return True if the text contains one of the terms."""
+        if self._automaton is not None:
+            return next(self._automaton.iter(text), None) is not None
+        return self._regex.search(text) is not None
+
+
+class CompiledChecker:
+    """
+    A relevance checker compiled from a checkers.ini section.
+
+    The page is relevant (True) if one of the following rules decides
+    so, checked in this order:
+
+    1. url_topics: The URL contains one of the topics.
+    2. article_url: The URL does not match the pattern, so the page is
+       no article and is crawled for its links.
+    3. article_canonical: The canonical link does not match the
+       pattern (or is missing), so the page is no article.
+    4. meta_terms / meta_pattern: The content of a meta tag named in
+       meta_names (all meta tags for '*') contains one of the terms
+       (compared in lower case) or matches the pattern. With
+       meta_separator, the pattern is matched against every part of
+       the content on its own.
+    5. body_pattern: The text of the page matches the pattern at least
+       body_min_count times. Counting stops once the count is reached.
+
+    Otherwise the result is `default` (False unless configured).
+
+    Attributes:
+        name (str): The name of the section.
+    """
+
+    def __init__(self, name, options):
+        unknown = set(options) - set(OPTIONS)
+        if unknown:
+            raise ValueError(
+                f"Unknown options {sorted(unknown)} in checker '{name}'."
+            )
+        self.name = name
+        self.__name__ = name
+
+        topics = split_terms(options.get('url_topics'))
+        self.url_topics = TermMatcher(topics) if topics else None
+        self.article_url = self._compile(name, options.get('article_url'))
+        self.article_canonical = self._compile(
+            name, options.get('article_canonical')
+        )
+
+        meta_names = split_terms(options.get('meta_names', 'keywords'))
+        self.meta_names = (
+            None if '*' in meta_names else {n.lower() for n in meta_names}
+        )
+        self.meta_separator = options.get('meta_separator') or None
+        terms = split_terms(options.get('meta_terms'))
+        self.meta_terms = (
+            TermMatcher(tuple(term.lower() for term in terms))
+            if terms else None
+        )
+        self.meta_pattern = self._compile(name, options.get('meta_pattern'))
+
+        self.body_pattern = self._compile(name, options.get('body_pattern'))
+        self.body_min_count = int(options.get('body_min_count') or 1)
+        self.default = options.get('default', 'false').lower() in (
+            'true', 'yes', '1', 'on'
+        )
+
+    @staticmethod
+    def _compile(name, pattern):
+        if not pattern or not pattern.strip():
+            return None
+        pattern = pattern.strip()
+        if pattern.startswith('@'):
+            # A pattern of _checker_funcs, e.g. @AI_PATTERN
+            shared = getattr(_checker_funcs, pattern[1:], None)
+            if not isinstance(shared, str):
+                raise ValueError(
+                    f"Unknown pattern '{pattern}' in checker '{name}', "
+                    f"it has to name a pattern of _checker_funcs."
+                )
+            pattern = shared
+        return re.compile(pattern)
+
+    def _meta_contents(self, tree):
+        for meta in tree.iter('meta'):
+            if self.meta_names is None or (
+                meta.get('name', '').lower() in self.meta_names
+            ):
+                yield meta.get('content', '')
+
+    def _meta_matches(self, tree):
+        for content in self._meta_contents(tree):
+            if self.meta_terms is not None and (
+                self.meta_terms.search(content.lower())
+            ):
+                return True
+            if self.meta_pattern is not None:
+                parts = (
+                    content.split(self.meta_separator)
+                    if self.meta_separator else (content,)
+                )
+                if any(self.meta_pattern.search(part) for part in parts):
+                    return True
+        return False
+
+    def __call__(self, html, url, document=None):
+        if self.url_topics is not None and self.url_topics.search(url):
+            return True
+        if self.article_url is not None and not self.article_url.search(url):
+            return True
+
+        if document is None:
+            document = page_document.Document(html, url)
+        tree = document.tree
+        if tree is None:
+            return self.default
+
+        if self.article_canonical is not None:
+            canonical = document.links.canonical_href
+            if canonical is None or not self.article_canonical.search(
+                canonical
+            ):
+                return True
+
+        if (self.meta_terms is not None or self.meta_pattern is not None) and (
+            self._meta_matches(tree)
+        ):
+            return True
+
+        if self.body_pattern is not None:
+            matches = self.body_pattern.finditer(document.text)
+            count = sum(
+                1 for _ in itertools.islice(matches, self.body_min_count)
+            )
+            if count >= self.body_min_count:
+                return True
+
+        return self.default
+
+
+def load_checkers(path='checkers.ini'):
+    """
+    Compile all checkers described in a file.
+
+    Returns:
+        dict: The CompiledChecker of every section but the template, by
+            section name.
+    """
+    config = configparser.ConfigParser()
+    config.read(path, encoding='utf-8')
+    return {
+        section: CompiledChecker(
+            section,
+            {
+                option: config.get(section, option)
+                for option in config.options(section)
+                if option not in config.defaults()
+            }
+        )
+        for section in config.sections()
+        if section != TEMPLATE
+    }
@@ -0,0 +1,411 @@
+"""
+This module contains the extraction of links and images from a stored
+corpus. The pages are parsed with lxml in a pool of processes, one chunk
+of files per task, so the parsing uses every core instead of the one the
+GIL leaves to a pool of threads. The links and images of every file are
+kept in a cache keyed by the path, size and modification time of the
+file, so extracting again only parses the files stored or changed since
+the last run. The URLs are deduplicated on disk and written out as they
+are read from the cache instead of being collected in one set.
+
+Author: Bruno Brocai
+"""
+
+import concurrent.futures
+import os
+import sqlite3
+import time
+from tqdm import tqdm
+from urllib.parse import urldefrag, urljoin
+from . import link_extract
+from . import page_store
+
+
+LINKS = 'links'
+IMAGES = 'images'
+
+# Files per task sent to a worker process
+CHUNK_SIZE = 64
+
+# The size recorded for a file that could only be read in part, e.g. a
+# segment cut off by a crash. It matches no real size, so the file is
+# extracted again on the next run.
+INCOMPLETE = -1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    extracted REAL NOT NULL,
+    links TEXT NOT NULL,
+    images TEXT NOT NULL
+);
+"""
+
+
+def is_corpus_file(filename):
+    """Tell whether a file holds stored pages: JSON, segment or .html."""
+    return filename.endswith(('.json', '.html')) or (
+        page_store.is_segment(filename)
+    )
+
+
+def list_files(folders, suffixes=None):
+    """
+    List the corpus files of folders.
+
+    Args:
+        folders (iterable): The folders, missing ones are left out.
+        suffixes (tuple): Only files ending with one of these, or all
+            corpus files if None.
+
+    Returns:
+        list: The paths of the files, sorted by folder and name.
+    """
+    paths = []
+    for folder in folders:
+        if not os.path.isdir(folder):
+            continue
+        for filename in sorted(os.listdir(folder)):
+            if suffixes is None and not is_corpus_file(filename):
+                continue
+            if suffixes is not None and not filename.endswith(suffixes):
+                continue
+            paths.append(os.path.join(folder, filename))
+    return paths
+
+
+def iter_pages(path):
+    """
+    Iterate over the pages of a corpus file.
+
+    A .json file holds one stored page and a segment many. An .html file
+    of the old corpus format has the URL on its first line and the page
+    after the first '#####'.
+
+    Yields:
+        tuple: The URL and the HTML of every page.
+    """
+    filename = os.path.basename(path)
+    if filename.endswith('.json'):
+        record = page_store.read_json(path)
+        yield record['url'], record['html_content']
+    elif page_store.is_segment(filename):
+        for record in page_store.iter_segment(path):
+            yield record['url'], record['html_content']
+    else:
+        with open(path, 'r', encoding='utf-8') as file:
+            content = file.read()
+        yield content.split('\n', 1)[0].strip(), content.split('#####')[1]
+
+
+def resolve(hrefs, base):
+    """Make the hrefs absolute, without fragment, and keep http(s) URLs."""
+    urls = set()
+    for href in hrefs:
+        try:
+            url = urldefrag(urljoin(base, href.strip()))[0]
+        except ValueError:
+            continue
+        if url.startswith(('http://', 'https://')):
+            urls.add(url)
+    return urls
+
+
+def extract_page(html, url=None):
+    """
+    Extract the links and images of a page.
+
+    The links are the href of every <a> and <link> tag, the images the
+    src of every <img> tag.
+
+    Args:
+        html (str): The page.
+        url (str): The URL of the page. The links and images are resolved
+            against it (or the <base href> of the page) if given and
+            returned as found otherwise.
+
+    Returns:
+        tuple: The set of links and the set of images.
+    """
+    root = link_extract.parse_html(html)
+    if root is None:
+        return set(), set()
+    info = link_extract.extract_links(root)
+    links = {link.href for link in info.links}
+    images = {
+        element.get('src') for element in root.iter('img')
+        if element.get('src') is not None
+    }
+    if url is None:
+        return links, images
+    base = urljoin(url, info.base_href) if info.base_href else url
+    return resolve(links, base), resolve(images, base)
+
+
+def extract_files(paths, absolute=True):
+    """
+    Extract the links and images of a chunk of corpus files. Runs in the
+    worker processes.
+
+    The size and modification time are read before the file, so a file
+    that is appended to meanwhile is extracted again on the next run.
+    A file that fails partway keeps the links and images of the pages
+    read before the error, with the size INCOMPLETE, so they are used
+    but the file is extracted again on the next run.
+
+    Args:
+        paths (list): The corpus files.
+        absolute (bool): Resolve the URLs, see extract_page.
+
+    Returns:
+        list: The path, size, modification time, links and images of
+            every file that could be opened.
+    """
+    results = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except OSError as e:
+            print(f'Skipping {path}: {e}')
+            continue
+        size = stat.st_size
+        links, images = set(), set()
+        try:
+            for url, html in iter_pages(path):
+                page_links, page_images = extract_page(
+                    html, url if absolute else None
+                )
+                links.update(page_links)
+                images.update(page_images)
+        except (OSError, ValueError, KeyError, IndexError, EOFError) as e:
+            print(f'Error in {path}: {e}')
+            size = INCOMPLETE
+        results.append((path, size, stat.st_mtime_ns, links, images))
+    return results
+
+
+def run_pool(paths, absolute=True, workers=None, chunk_size=CHUNK_SIZE):
+    """
+    Extract the links and images of corpus files in a pool of processes.
+
+    At most twice as many chunks as workers are in flight, so the
+    results are handed on as they come in and not held until the end.
+
+    Args:
+        paths (list): The corpus files.
+        absolute (bool): Resolve the URLs, see extract_page.
+        workers (int): The worker processes, the CPU cores if None. With
+            one worker the files are extracted in this process.
+        chunk_size (int): The files per task.
+
+    Yields:
+        tuple: The results of every file, see extract_files, in the
+            order the chunks complete.
+    """
+    workers = workers or os.cpu_count() or 1
+    chunks = [
+        paths[i:i + chunk_size] for i in range(0, len(paths), chunk_size)
+    ]
+    if workers == 1 or len(chunks) <= 1:
+        for chunk in chunks:
+            yield from extract_files(chunk, absolute)
+        return
+
+    with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+        pending = set()
+        for chunk in chunks:
+            if len(pending) >= 2 * workers:
+                done, pending = concurrent.futures.wait(
+                    pending, return_when=concurrent.futures.FIRST_COMPLETED
+                )
+                for future in done:
+                    yield from future.result()
+            pending.add(executor.submit(extract_files, chunk, absolute))
+        for future in concurrent.futures.as_completed(pending):
+            yield from future.result()
+
+
+class ExtractionCache:
+    """
+    The links and images extracted from the corpus files of a site.
+
+    The paths are kept relative to the site directory. A file is
+    extracted again when its size or modification time changed, e.g. a
+    segment that pages were appended to, or when it was only read in
+    part (see extract_files).
+
+    Attributes:
+        path (str): The path of the database file.
+        directory (str): The site directory.
+    """
+
+    def __init__(self, path, directory):
+        self.path = path
+        self.directory = directory
+        self.conn = sqlite3.connect(path)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(SCHEMA)
+
+    def relative(self, path):
+        return os.path.relpath(path, self.directory).replace(os.sep, '/')
+
+    def outdated(self, paths):
+        """
+        Find the files that are not cached with their current size and
+        modification time.
+
+        Returns:
+            list: The paths to extract.
+        """
+        cached = {
+            row[0]: (row[1], row[2]) for row in self.conn.execute(
+                'SELECT path, size, mtime_ns FROM files'
+            )
+        }
+        outdated = []
+        for path in paths:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            if cached.get(self.relative(path)) != (
+                stat.st_size, stat.st_mtime_ns
+            ):
+                outdated.append(path)
+        return outdated
+
+    def store(self, results):
+        """Record the results of extracted files, see extract_files."""
+        now = time.time()
+        with self.conn:
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?)',
+                [
+                    (
+                        self.relative(path), size, mtime_ns, now,
+                        '\n'.join(sorted(links)), '\n'.join(sorted(images))
+                    )
+                    for path, size, mtime_ns, links, images in results
+                ]
+            )
+
+    def prune(self, paths):
+        """
+        Forget the files that are not among the given corpus files any
+        more, e.g. renamed or deleted ones.
+
+        Returns:
+            int: The number of files forgotten.
+        """
+        keep = {self.relative(path) for path in paths}
+        gone = [
+            (row[0],) for row in self.conn.execute('SELECT path FROM files')
+            if row[0] not in keep
+        ]
+        with self.conn:
+            self.conn.executemany('DELETE FROM files WHERE path = ?', gone)
+        return len(gone)
+
+    def count(self):
+        return self.conn.execute('SELECT COUNT(*) FROM files').fetchone()[0]
+
+    def unique_urls(self, kind, since=None):
+        """
+        Iterate over the distinct URLs of all cached files.
+
+        The URLs seen so far are kept in a temporary table of the
+        database rather than in memory.
+
+        Args:
+            kind (str): LINKS or IMAGES.
+            since (float): Only the files extracted at or after this
+                unix time.
+
+        Yields:
+            str: Every URL once.
+        """
+        if kind not in (LINKS, IMAGES):
+            raise ValueError(f'Unknown kind {kind!r}')
+        query = f'SELECT {kind} FROM files'
+        params = ()
+        if since is not None:
+            query += ' WHERE extracted >= ?'
+            params = (since,)
+
+        self.conn.execute('DROP TABLE IF EXISTS temp.seen')
+        self.conn.execute('CREATE TEMP TABLE seen (url TEXT PRIMARY KEY)')
+        reader = self.conn.cursor()
+        try:
+            for (urls,) in reader.execute(query, params):
+                for url in urls.split('\n'):
+                    if url and self.conn.execute(
+                        'INSERT OR IGNORE INTO seen VALUES (?)', (url,)
+                    ).rowcount:
+                        yield url
+        finally:
+            reader.close()
+            self.conn.rollback()
+            self.conn.execute('DROP TABLE IF EXISTS temp.seen')
+
+    def close(self):
+        self.conn.close()
+
+
+def update(cache, paths, workers=None, chunk_size=CHUNK_SIZE, progress=None):
+    """
+    Extract the corpus files that changed since they were cached and
+    store their results as every chunk completes.
+
+    Args:
+        cache (ExtractionCache): The cache of the site.
+        paths (list): All corpus files of the site. Cached files that are
+            not among them are forgotten.
+        workers (int): The worker processes, see run_pool.
+        chunk_size (int): The files per task.
+        progress (callable): Called with the number of files extracted.
+
+    Returns:
+        int: The number of files extracted.
+    """
+    cache.prune(paths)
+    outdated = cache.outdated(paths)
+    batch = []
+    extracted = 0
+    for result in run_pool(outdated, True, workers, chunk_size):
+        batch.append(result)
+        extracted += 1
+        if len(batch) >= chunk_size:
+            cache.store(batch)
+            batch = []
+        if progress is not None:
+            progress(extracted)
+    cache.store(batch)
+    return extracted
+
+
+def extract_folder(corpus_dir, suffix, kind, workers=None, desc=None):
+    """
+    Collect the links or images of the files of a folder as they are
+    written in the pages, see retrieve_data.links_from_corpus.
+
+    Args:
+        corpus_dir (str): The folder.
+        suffix (str): Only files ending with it, '.json' or '.html'.
+        kind (str): LINKS or IMAGES.
+        workers (int): The worker processes, see run_pool.
+        desc (str): The label of the progress bar.
+
+    Returns:
+        set: The links or images.
+    """
+    paths = list_files([corpus_dir], (suffix,))
+    position = 3 if kind == LINKS else 4
+    urls = set()
+    for result in tqdm(
+        run_pool(paths, False, workers), total=len(paths), desc=desc
+    ):
+        urls.update(result[position])
+    return urls
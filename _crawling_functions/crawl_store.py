@@ -0,0 +1,406 @@
+"""
+This module contains the disk-backed crawl store. The frontier and the
+visited URLs of a site live in one SQLite database, so a crawl of any
+size starts without reading its whole history, and a URL taken from the
+queue is only marked as done once it was processed.
+
+Author: Bruno Brocai
+"""
+
+import contextlib
+import os
+import sqlite3
+import time
+from . import async_fetch
+from . import url_classifier
+
+
+QUEUED = 0
+LEASED = 1
+VISITED = 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS urls (
+    url TEXT NOT NULL UNIQUE,
+    state INTEGER NOT NULL,
+    depth INTEGER NOT NULL DEFAULT 0,
+    priority INTEGER NOT NULL DEFAULT 0,
+    lease_until REAL
+);
+CREATE INDEX IF NOT EXISTS urls_queue
+    ON urls (state, priority, depth);
+CREATE TABLE IF NOT EXISTS hosts (
+    host TEXT PRIMARY KEY,
+    count INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS counts (
+    state INTEGER PRIMARY KEY,
+    count INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO counts VALUES (0, 0), (1, 0), (2, 0);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+class CrawlStore:
+    """
+    The SQLite database holding the frontier and visited URLs of a site.
+
+    URLs taken from the queue are leased. A lease is turned into a visit
+    by complete(); leases left over by a crashed crawler go back to the
+    queue when the store is opened again (or once they expire).
+
+    Attributes:
+        path (str): The path of the database file.
+        ordering (str): The order of the queue ('bfs', 'article', 'host').
+        lease_time (float): Seconds after which a lease expires.
+    """
+
+    def __init__(
+        self, path, ordering='bfs', classify=None, lease_time=600,
+        reset_leases=True
+    ):
+        self.path = path
+        self.ordering = ordering
+        self.lease_time = lease_time
+        self._classify = classify or (lambda url: None)
+        self.created = not os.path.exists(path)
+
+        self.conn = sqlite3.connect(path, isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        # Stores from before the imported flag finished their import
+        # when they were created
+        legacy = not self.created and self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' "
+            "AND name = 'meta'"
+        ).fetchone() is None
+        self.conn.executescript(SCHEMA)
+        if legacy:
+            self.set_imported()
+
+        if reset_leases:
+            self.release_leases()
+
+    @property
+    def imported(self):
+        """Whether the text files of the site were imported completely."""
+        row = self.conn.execute(
+            "SELECT value FROM meta WHERE key = 'imported'"
+        ).fetchone()
+        return row is not None and row[0] == '1'
+
+    def set_imported(self):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO meta VALUES ('imported', '1')"
+        )
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """Run the enclosed statements in one write transaction."""
+        self.conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield self.conn
+        except BaseException:
+            self.conn.execute('ROLLBACK')
+            raise
+        self.conn.execute('COMMIT')
+
+    def _priority(self, url):
+        if self.ordering == 'article':
+            return 0 if self._classify(url) == url_classifier.ARTICLE else 1
+        if self.ordering == 'host':
+            # The n-th URL of a host gets priority n,
+            # which hands out one URL per host in turn
+            host = async_fetch.host_of(url)
+            self.conn.execute(
+                'INSERT INTO hosts VALUES (?, 1) '
+                'ON CONFLICT(host) DO UPDATE SET count = count + 1',
+                (host,)
+            )
+            return self.conn.execute(
+                'SELECT count FROM hosts WHERE host = ?', (host,)
+            ).fetchone()[0]
+        return 0
+
+    def _count(self, state, delta):
+        self.conn.execute(
+            'UPDATE counts SET count = count + ? WHERE state = ?',
+            (delta, state)
+        )
+
+    def count(self, state):
+        """Return the number of URLs in a state, without scanning the table."""
+        return self.conn.execute(
+            'SELECT count FROM counts WHERE state = ?', (state,)
+        ).fetchone()[0]
+
+    def state_of(self, url):
+        """Return the state of a URL, or None if it is unknown."""
+        row = self.conn.execute(
+            'SELECT state FROM urls WHERE url = ?', (url,)
+        ).fetchone()
+        return None if row is None else row[0]
+
+    def enqueue(self, urls, depth=0):
+        """
+        Queue URLs that are not known to the store yet.
+
+        Returns:
+            list: The URLs that were newly queued.
+        """
+        added = []
+        with self.transaction():
+            for url in urls:
+                cursor = self.conn.execute(
+                    'INSERT OR IGNORE INTO urls (url, state, depth, priority) '
+                    'VALUES (?, ?, ?, ?)',
+                    (url, QUEUED, depth, 0)
+                )
+                if cursor.rowcount:
+                    priority = self._priority(url)
+                    if priority:
+                        self.conn.execute(
+                            'UPDATE urls SET priority = ? WHERE url = ?',
+                            (priority, url)
+                        )
+                    added.append(url)
+            self._count(QUEUED, len(added))
+        return added
+
+    def requeue(self, urls, depth=0):
+        """
+        Queue URLs again, visited ones included, e.g. to refresh them.
+
+        Returns:
+            list: The URLs that were not queued or leased before.
+        """
+        requeued = []
+        with self.transaction():
+            for url in urls:
+                state = self.state_of(url)
+                if state == VISITED:
+                    self.conn.execute(
+                        'UPDATE urls SET state = ?, depth = ? WHERE url = ?',
+                        (QUEUED, depth, url)
+                    )
+                    self._count(VISITED, -1)
+                    self._count(QUEUED, 1)
+                    requeued.append(url)
+                elif state is None:
+                    self.conn.execute(
+                        'INSERT INTO urls (url, state, depth) '
+                        'VALUES (?, ?, ?)',
+                        (url, QUEUED, depth)
+                    )
+                    self._count(QUEUED, 1)
+                    requeued.append(url)
+        return requeued
+
+    def lease(self):
+        """
+        Take the next queued URL and lease it.
+
+        Returns:
+            tuple: The URL and its depth, or None if the queue is empty.
+        """
+        with self.transaction():
+            row = self.conn.execute(
+                'SELECT rowid, url, depth FROM urls WHERE state = ? '
+                'ORDER BY priority, depth, rowid LIMIT 1',
+                (QUEUED,)
+            ).fetchone()
+            if row is None:
+                return None
+            self.conn.execute(
+                'UPDATE urls SET state = ?, lease_until = ? WHERE rowid = ?',
+                (LEASED, time.time() + self.lease_time, row[0])
+            )
+            self._count(QUEUED, -1)
+            self._count(LEASED, 1)
+        return row[1], row[2]
+
+    def complete(self, url):
+        """Mark a URL as visited, whether it was leased, queued or unknown."""
+        with self.transaction():
+            self._mark_visited(url)
+
+    def _mark_visited(self, url):
+        state = self.state_of(url)
+        if state == VISITED:
+            return False
+        if state is None:
+            self.conn.execute(
+                'INSERT INTO urls (url, state) VALUES (?, ?)',
+                (url, VISITED)
+            )
+        else:
+            self.conn.execute(
+                'UPDATE urls SET state = ?, lease_until = NULL '
+                'WHERE url = ?',
+                (VISITED, url)
+            )
+            self._count(state, -1)
+        self._count(VISITED, 1)
+        return True
+
+    def release_leases(self, expired_only=False):
+        """
+        Put leased URLs back into the queue.
+
+        Args:
+            expired_only (bool): Only release leases that expired.
+                Otherwise all leases are released, which is what a
+                single crawler does after a crash.
+        """
+        query = 'UPDATE urls SET state = ?, lease_until = NULL WHERE state = ?'
+        params = [QUEUED, LEASED]
+        if expired_only:
+            query += ' AND lease_until < ?'
+            params.append(time.time())
+        with self.transaction():
+            released = self.conn.execute(query, params).rowcount
+            self._count(LEASED, -released)
+            self._count(QUEUED, released)
+        return released
+
+    def import_lines(self, lines, state, accept=None, batch_size=10000):
+        """
+        Bulk import URLs, e.g. from the text files of an existing crawl.
+
+        Visited URLs override queued ones, queued URLs never override
+        anything known already.
+
+        Args:
+            lines (iterable): The URLs, one per item.
+            state (int): QUEUED or VISITED.
+            accept (callable): Optional filter for the URLs.
+            batch_size (int): The number of URLs written per transaction.
+
+        Returns:
+            int: The number of URLs imported.
+        """
+        imported = 0
+        batch = []
+        for line in lines:
+            url = line.strip()
+            if url and (accept is None or accept(url)):
+                batch.append(url)
+            if len(batch) >= batch_size:
+                imported += self._import_batch(batch, state)
+                batch = []
+        if batch:
+            imported += self._import_batch(batch, state)
+        return imported
+
+    def _import_batch(self, urls, state):
+        if state == QUEUED:
+            return len(self.enqueue(urls))
+        with self.transaction():
+            return sum(self._mark_visited(url) for url in urls)
+
+    def close(self):
+        self.conn.close()
+
+
+class StoreFrontier:
+    """The queued URLs of a CrawlStore, with the interface of a Frontier."""
+
+    def __init__(self, store):
+        self.store = store
+        self.ordering = store.ordering
+        self.dropped = 0
+
+    def add(self, url, depth=0):
+        return bool(self.store.enqueue([url], depth))
+
+    def update(self, urls, depth=0):
+        return self.store.enqueue(urls, depth)
+
+    def requeue(self, urls, depth=0):
+        return self.store.requeue(urls, depth)
+
+    def pop_entry(self):
+        entry = self.store.lease()
+        if entry is None:
+            raise KeyError('pop from an empty frontier')
+        return entry
+
+    def pop(self):
+        return self.pop_entry()[0]
+
+    def complete(self, url):
+        """Mark a leased URL as done."""
+        self.store.complete(url)
+
+    def discard(self, url):
+        """Nothing to do, a URL added to StoreVisited leaves the queue."""
+
+    def stats(self):
+        size = len(self)
+        memory = os.path.getsize(self.store.path)
+        return {
+            'queued': size,
+            'dropped': self.dropped,
+            'bytes': memory,
+            'bytes_per_url': memory / size if size else 0,
+        }
+
+    def __len__(self):
+        return self.store.count(QUEUED)
+
+    def __bool__(self):
+        return len(self) > 0
+
+    def __contains__(self, url):
+        return self.store.state_of(url) == QUEUED
+
+
+class StoreVisited:
+    """
+    The visited URLs of a CrawlStore, with the interface of a set.
+
+    URLs that are leased count as visited, so links to pages currently
+    being crawled are not queued again.
+    """
+
+    def __init__(self, store):
+        self.store = store
+
+    def add(self, url):
+        # Leased URLs become visited once complete() is called
+        if self.store.state_of(url) != LEASED:
+            self.store.complete(url)
+
+    def __contains__(self, url):
+        return self.store.state_of(url) in (LEASED, VISITED)
+
+    def __len__(self):
+        return self.store.count(VISITED) + self.store.count(LEASED)
+
+
+def import_text_resources(store, tracking_files, accept=None):
+    """
+    Import visited.txt and queue.txt of a site directory into a store.
+
+    The files are read line by line, so they never have to fit in memory.
+
+    Args:
+        store (CrawlStore): The store to import into.
+        tracking_files (TrackingFiles): The files of the site directory.
+        accept (callable): Filter for the queued URLs.
+
+    Returns:
+        tuple: The number of visited and queued URLs imported.
+    """
+    visited = queued = 0
+    if os.path.exists(tracking_files.visited):
+        with open(tracking_files.visited, 'r', encoding='utf-8') as file:
+            visited = store.import_lines(file, VISITED)
+    if os.path.exists(tracking_files.queue):
+        with open(tracking_files.queue, 'r', encoding='utf-8') as file:
+            queued = store.import_lines(file, QUEUED, accept)
+    return visited, queued
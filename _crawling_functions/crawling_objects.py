@@ -20,6 +20,8 @@ class UrlPatterns:
         notarticle_pattern (str): Pattern used to classify non-article pages.
         irrelevant_pattern (str): Pattern used to classify irrelevant pages.
         base_url (str): Base URL for the section.
+        drop_params (str): Pattern of query parameter names that do not
+            change the page and are removed from URLs (optional).
     """
 
     file_path: str
@@ -36,6 +38,13 @@ class UrlPatterns:
         self.notarticle_pattern = self.patterns[section][2]
         self.irrelevant_pattern = self.patterns[section][3]
         self.base_url = self.patterns[section][0]
+        self.drop_params = self.load_option(section, 'drop_params')
+
+    def load_option(self, section, option):
+        """Read an optional setting of a section, None if it is missing."""
+        config = configparser.ConfigParser()
+        config.read(self.config)
+        return config.get(section, option, fallback=None) or None
 
     def load_patterns_from_config(self):
         patterns_dict = {}
@@ -77,6 +86,36 @@ class TrackingFiles:
         self.graph = os.path.join(self.directory, 'resources', 'graph.txt')
         self.irrelevant = os.path.join(self.directory, 'resources', 'irrelevant.txt')
         self.forbidden = os.path.join(self.directory, 'resources', 'forbidden.txt')
+        self.store = os.path.join(self.directory, 'resources', 'crawl.sqlite')
+        self.visited_filter = os.path.join(
+            self.directory, 'resources', 'visited.bloom'
+        )
+        self.signatures = os.path.join(
+            self.directory, 'resources', 'signatures.tsv'
+        )
+        self.aliases = os.path.join(self.directory, 'resources', 'aliases.txt')
+        self.revisits = os.path.join(
+            self.directory, 'resources', 'revisit.sqlite'
+        )
+        self.journal = os.path.join(self.directory, 'resources', 'journal.log')
+        self.robots = os.path.join(
+            self.directory, 'resources', 'robots.sqlite'
+        )
+        self.snapshot = os.path.join(
+            self.directory, 'resources', 'snapshot.bin'
+        )
+        self.metrics = os.path.join(
+            self.directory, 'resources', 'metrics.tsv'
+        )
+        self.summary = os.path.join(
+            self.directory, 'resources', 'summary.json'
+        )
+        self.manifest = os.path.join(
+            self.directory, 'resources', 'manifest.sqlite'
+        )
+        self.extract_cache = os.path.join(
+            self.directory, 'resources', 'extract_cache.sqlite'
+        )
 
     @property
     def all_files_dict(self):
@@ -168,3 +207,92 @@ class MediaTrackingFiles(TrackingFiles):
         self.pdf_index = os.path.join(self.indexdirs.pdfs, '_index_.csv')
         self.video_index = os.path.join(self.indexdirs.videos, '_index_.csv')
         self.audio_index = os.path.join(self.indexdirs.audios, '_index_.csv')
+
+@dataclass
+class CrawlSettings:
+    """Represents the settings that control how a crawl is performed.
+
+    Attributes:
+        concurrency (int): The number of requests kept in flight at once.
+            A value of 1 crawls one page after the other.
+        per_host (int): The maximum number of simultaneous requests
+            sent to a single host.
+        delay (tuple): The range of seconds to wait between two requests
+            to the same host, see politeness.PolitenessScheduler.
+        ordering (str): The order in which queued URLs are crawled
+            ('bfs', 'article' or 'host').
+        frontier_limit (int): The maximum number of URLs held in memory,
+            or None for no limit.
+        store (str): Where the queue and the visited URLs are kept,
+            'memory' (read from the text files) or 'sqlite'.
+        visited (str): How visited URLs are held in memory, 'set' or
+            'bloom' (a compact filter with false positives).
+        visited_error_rate (float): The false positive rate of the
+            bloom filter.
+        snapshot_interval (float): The seconds between two snapshots of
+            the in-memory queue and visited URLs, which a restarted crawl
+            resumes from. 0 disables the snapshots.
+        metrics_interval (float): The seconds between two samples of the
+            metrics written to resources/metrics.tsv. 0 disables the file.
+        summary_interval (float): The seconds between two updates of the
+            summary of the site in resources/summary.json, see
+            site_status.
+        storage (str): How pages are stored, 'json' (one file per page)
+            or 'jsonl' (rolling gzip JSONL segments).
+        segment_size (int): The size in bytes of a segment.
+        dedup (str): Which duplicate pages are not stored again, 'off',
+            'exact' (same text) or 'near' (also nearly the same text).
+        dedup_distance (int): The number of SimHash bits in which two
+            near duplicates may differ.
+        duplicate_links (bool): Whether the links of duplicate pages
+            are still extracted and queued.
+        refresh (bool): Whether the board pages that are due for a
+            revisit are crawled again, with conditional requests.
+        revisit_interval (tuple): The shortest and longest time in
+            seconds between two visits of a board page.
+        journal (bool): Whether the text files are written through a
+            journal with group commit, or line by line.
+        fsync (str): When the journal is synced to disk, 'always',
+            'periodic' (once a second) or 'never'.
+        group_commit (int): The number of pages whose records are
+            written to the journal together.
+        follow_nofollow (bool): Whether links with rel="nofollow" are
+            queued.
+        robots (bool): Whether the robots.txt of every host is obeyed.
+        robots_ttl (float): The seconds a cached robots.txt is used
+            before it is fetched again.
+        section (str): The patterns.ini section of the site, or None if
+            it has the name of the site directory.
+        workers (int): The number of worker processes that parse the
+            fetched pages. 0 parses them in the crawling process.
+        parse_queue (int): The maximum number of fetched pages waiting
+            for or in the parse workers, or None for twice the workers.
+    """
+
+    concurrency: int = 1
+    per_host: int = 1
+    delay: tuple = (3, 7)
+    ordering: str = 'bfs'
+    frontier_limit: int = None
+    store: str = 'memory'
+    visited: str = 'set'
+    visited_error_rate: float = 1e-5
+    snapshot_interval: float = 600.0
+    metrics_interval: float = 10.0
+    summary_interval: float = 5.0
+    storage: str = 'json'
+    segment_size: int = 64 * 2**20
+    dedup: str = 'off'
+    dedup_distance: int = 3
+    duplicate_links: bool = True
+    refresh: bool = False
+    revisit_interval: tuple = (3600, 7 * 24 * 3600)
+    journal: bool = True
+    fsync: str = 'periodic'
+    group_commit: int = 16
+    follow_nofollow: bool = True
+    robots: bool = True
+    robots_ttl: float = 24 * 3600
+    section: str = None
+    workers: int = 0
+    parse_queue: int = None
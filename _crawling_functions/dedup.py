@@ -0,0 +1,249 @@
+"""
+This module contains the detection of duplicate pages. Many sites serve
+the same article under several paths (boards, print views, pagination
+variants). Pages are compared by a hash of their text, taken from the
+parsed page the checker and the link extraction share, and, optionally,
+by a SimHash fingerprint that also matches nearly identical texts. The
+fingerprints of the stored pages are kept in a file, so duplicates of
+pages from earlier runs are recognized as well.
+
+Author: Bruno Brocai
+"""
+
+import hashlib
+import os
+import re
+from . import document as page_document
+
+
+SIMHASH_BITS = 64
+SHINGLE_SIZE = 3
+
+# Pages with less text are never taken for duplicates, e.g. pages whose
+# content is only loaded by javascript and that all look empty
+MIN_WORDS = 10
+
+# Below this number of shingles a text is too short to tell a near
+# duplicate from a different page with the same boilerplate
+MIN_NEAR_FEATURES = 16
+
+_WORD = re.compile(r'\w+')
+
+# Every byte of a hash spread into 8 lanes of LANE_BITS bits, so the bit
+# counts of SimHash are summed with a few integer additions per shingle
+LANE_BITS = 32
+_LANE_MASK = (1 << LANE_BITS) - 1
+_SPREAD = [
+    sum(1 << (bit * LANE_BITS) for bit in range(8) if value >> bit & 1)
+    for value in range(256)
+]
+
+
+def page_words(document):
+    """Return the lowercase words of the text of a page."""
+    return _WORD.findall(document.text.lower())
+
+
+def text_hash(words):
+    """Return the hash of a text given by its words."""
+    return hashlib.blake2b(
+        ' '.join(words).encode('utf-8'), digest_size=16
+    ).hexdigest()
+
+
+def shingle_hashes(words, size=SHINGLE_SIZE):
+    """Return the 64-bit hashes of the word shingles of a text."""
+    if len(words) < size:
+        size = len(words)
+    return [
+        int.from_bytes(hashlib.blake2b(
+            ' '.join(words[i:i + size]).encode('utf-8'), digest_size=8
+        ).digest(), 'little')
+        for i in range(len(words) - size + 1)
+    ] if size else []
+
+
+def simhash(hashes):
+    """
+    Return the SimHash of a set of feature hashes.
+
+    Bit i of the SimHash is set if bit i is set in more than half of
+    the hashes.
+    """
+    # lanes[k] holds, for bit b of byte k, its count in lane b
+    lanes = [0] * (SIMHASH_BITS // 8)
+    for value in hashes:
+        for k in range(SIMHASH_BITS // 8):
+            lanes[k] += _SPREAD[value >> (8 * k) & 255]
+
+    half = len(hashes) / 2
+    fingerprint = 0
+    for k, lane in enumerate(lanes):
+        for bit in range(8):
+            if (lane >> (bit * LANE_BITS)) & _LANE_MASK > half:
+                fingerprint |= 1 << (8 * k + bit)
+    return fingerprint
+
+
+def hamming_distance(first, second):
+    return bin(first ^ second).count('1')
+
+
+class Signature:
+    """
+    The fingerprints of a page.
+
+    Attributes:
+        digest (str): The hash of the text of the page.
+        simhash (int): The SimHash of its shingles, or None if the text
+            is too short to compare.
+    """
+
+    __slots__ = ('digest', 'simhash')
+
+    def __init__(self, digest, simhash=None):
+        self.digest = digest
+        self.simhash = simhash
+
+    @classmethod
+    def of_document(cls, document, near=True):
+        """
+        Return the signature of a page, or None if it has too little text.
+
+        Args:
+            document (document.Document): The parsed page.
+            near (bool): Whether to compute the SimHash as well.
+        """
+        words = page_words(document)
+        if len(words) < MIN_WORDS:
+            return None
+        fingerprint = None
+        if near:
+            hashes = shingle_hashes(words)
+            if len(hashes) >= MIN_NEAR_FEATURES:
+                fingerprint = simhash(hashes)
+        return cls(text_hash(words), fingerprint)
+
+
+class DuplicateIndex:
+    """
+    The fingerprints of all stored pages of a site.
+
+    An exact duplicate has the same text hash as a stored page. A near
+    duplicate has a SimHash that differs from the SimHash of a stored
+    page in at most `distance` bits. To find those without comparing
+    against every page, the 64 bits are cut into distance + 1 bands:
+    two fingerprints within the distance agree on at least one band.
+
+    Attributes:
+        path (str): The file the fingerprints are appended to.
+        near (bool): Whether near duplicates are detected.
+        distance (int): The maximum number of differing SimHash bits.
+        exact_duplicates (int): The exact duplicates found in this run.
+        near_duplicates (int): The near duplicates found in this run.
+    """
+
+    def __init__(self, path, near=True, distance=3):
+        if not 0 <= distance < SIMHASH_BITS:
+            raise ValueError(
+                f'The distance must be between 0 and {SIMHASH_BITS - 1}.'
+            )
+        self.path = path
+        self.near = near
+        self.distance = distance
+        self.exact_duplicates = 0
+        self.near_duplicates = 0
+
+        bands = distance + 1
+        width, extra = divmod(SIMHASH_BITS, bands)
+        self._bands = []
+        start = 0
+        for band in range(bands):
+            size = width + (band < extra)
+            self._bands.append((start, (1 << size) - 1))
+            start += size
+
+        self._digests = {}
+        self._buckets = {}
+        self.load()
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def load(self):
+        """Read the fingerprints written by earlier runs."""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'r', encoding='utf-8') as file:
+            for line in file:
+                fields = line.rstrip('\n').split('\t')
+                if len(fields) != 3:
+                    continue
+                url, digest, fingerprint = fields
+                self._index(url, Signature(
+                    digest, int(fingerprint, 16) if fingerprint else None
+                ))
+
+    def _band_keys(self, fingerprint):
+        return [
+            (band, fingerprint >> start & mask)
+            for band, (start, mask) in enumerate(self._bands)
+        ]
+
+    def _index(self, url, signature):
+        self._digests.setdefault(signature.digest, url)
+        if self.near and signature.simhash is not None:
+            for key in self._band_keys(signature.simhash):
+                self._buckets.setdefault(key, []).append(
+                    (signature.simhash, url)
+                )
+
+    def signature(self, html):
+        """Compute the fingerprints of a page, None if it has too little text."""
+        return Signature.of_document(page_document.Document(html), self.near)
+
+    def find(self, signature, url=None):
+        """
+        Look for a stored page with the same or a nearly identical text.
+
+        Args:
+            signature (Signature): The fingerprints of the page.
+            url (str): The URL of the page. Its own earlier version,
+                e.g. of a refreshed page, is no duplicate.
+
+        Returns:
+            str: The URL of the stored page, or None.
+        """
+        if signature is None:
+            return None
+        original = self._digests.get(signature.digest)
+        if original is not None and original != url:
+            self.exact_duplicates += 1
+            return original
+
+        if self.near and signature.simhash is not None:
+            for key in self._band_keys(signature.simhash):
+                for fingerprint, stored in self._buckets.get(key, ()):
+                    if stored != url and hamming_distance(
+                        fingerprint, signature.simhash
+                    ) <= self.distance:
+                        self.near_duplicates += 1
+                        return stored
+        return None
+
+    def add(self, url, signature):
+        """Remember the fingerprints of a stored page."""
+        self._index(url, signature)
+        fingerprint = (
+            '' if signature.simhash is None else f'{signature.simhash:016x}'
+        )
+        self._file.write(f'{url}\t{signature.digest}\t{fingerprint}\n')
+        self._file.flush()
+
+    def stats(self):
+        return {
+            'pages': len(self._digests),
+            'exact_duplicates': self.exact_duplicates,
+            'near_duplicates': self.near_duplicates,
+        }
+
+    def close(self):
+        self._file.close()
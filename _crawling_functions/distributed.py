@@ -0,0 +1,695 @@
+"""
+This module contains the distributed crawl of a site by several worker
+processes, on one machine or many. Every host belongs to one worker,
+chosen by rendezvous hashing over the workers that are alive, so when a
+worker joins or leaves only the hosts of that worker move. A worker
+crawls the URLs of its own hosts and sends the links to other hosts to
+a small coordinator, which keeps them in an sqlite inbox until their
+owner leases them. A leased link that is not acknowledged in time is
+handed out again, so the links a worker leased just before it died
+without a trace can be crawled twice. A worker that stops cleanly, or
+loses hosts to a worker that joins, hands off its queue and the URLs it
+crawled, and no page is crawled twice.
+
+The coordinator speaks JSON lines over TCP, one request and one answer
+per line.
+
+Author: Bruno Brocai
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import socket
+import socketserver
+import sqlite3
+import threading
+import time
+from . import async_fetch
+from . import document
+from . import retrieve_data
+from .new_crawlers import ClassicCrawler, CRAWL_ERRORS
+
+
+LEASE_TIME = 60.0
+WORKER_TIMEOUT = 30.0
+
+QUEUED, LEASED, DONE = 0, 1, 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS inbox (
+    url TEXT PRIMARY KEY,
+    depth INTEGER NOT NULL,
+    host TEXT NOT NULL,
+    owner TEXT,
+    state INTEGER NOT NULL DEFAULT 0,
+    visited INTEGER NOT NULL DEFAULT 0,
+    leased_until REAL NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS inbox_owner ON inbox (owner, state);
+CREATE INDEX IF NOT EXISTS inbox_host ON inbox (host);
+"""
+
+
+def owner_of(host, workers):
+    """
+    Choose the worker of a host by rendezvous hashing.
+
+    Every worker gets a score for the host and the highest score wins,
+    so removing a worker only moves the hosts it owned.
+
+    Args:
+        host (str): The host, see async_fetch.host_of.
+        workers (list): The ids of the workers alive.
+
+    Returns:
+        str: The id of the owner, or None if there are no workers.
+    """
+    return max(
+        workers,
+        key=lambda worker: hashlib.blake2b(
+            f'{worker}\t{host}'.encode('utf-8'), digest_size=8
+        ).digest(),
+        default=None
+    )
+
+
+class Coordinator:
+    """
+    The membership of the workers and the inbox of forwarded links.
+
+    Args:
+        path (str): The path of the inbox database.
+        worker_timeout (float): The seconds after which a worker that
+            sent no heartbeat is considered gone.
+        lease_time (float): The seconds a worker has to acknowledge
+            leased links.
+    """
+
+    def __init__(
+        self, path, worker_timeout=WORKER_TIMEOUT, lease_time=LEASE_TIME
+    ):
+        self.worker_timeout = worker_timeout
+        self.lease_time = lease_time
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+        self._seen = {}
+        self._idle = {}
+        self._members = []
+        self._joined = False
+
+    def members(self):
+        """
+        Return the workers alive, after reassigning the inbox if the
+        membership changed.
+        """
+        now = time.monotonic()
+        for worker, seen in list(self._seen.items()):
+            if now - seen > self.worker_timeout:
+                print(f'Worker {worker} timed out')
+                del self._seen[worker]
+                self._idle.pop(worker, None)
+        members = sorted(self._seen)
+        if members != self._members:
+            self._members = members
+            self._rebalance()
+        return members
+
+    def _rebalance(self):
+        """Reassign the links that are not done to the current owners."""
+        hosts = [
+            row[0] for row in self.conn.execute(
+                'SELECT DISTINCT host FROM inbox WHERE state < ?', (DONE,)
+            )
+        ]
+        with self.conn:
+            self.conn.executemany(
+                'UPDATE inbox SET owner = ? WHERE host = ? AND state < ?',
+                (
+                    (owner_of(host, self._members), host, DONE)
+                    for host in hosts
+                )
+            )
+        print(f'Workers: {self._members}, {len(hosts)} hosts reassigned')
+
+    def join(self, worker):
+        """Add a worker, or renew it after a restart."""
+        self._seen[worker] = time.monotonic()
+        self._idle[worker] = False
+        self._joined = True
+        # Links it leased before a restart are handed out again
+        with self.conn:
+            self.conn.execute(
+                'UPDATE inbox SET state = ?, leased_until = 0 '
+                'WHERE owner = ? AND state = ?',
+                (QUEUED, worker, LEASED)
+            )
+        return {'workers': self.members()}
+
+    def heartbeat(self, worker, idle=False):
+        """
+        Keep a worker alive and tell it the membership.
+
+        Returns:
+            dict: The workers alive and whether the whole crawl is done.
+        """
+        if worker not in self._seen:
+            self.join(worker)
+        self._seen[worker] = time.monotonic()
+        self._idle[worker] = idle
+        return {'workers': self.members(), 'done': self.done()}
+
+    def leave(self, worker):
+        """Remove a worker, e.g. after it handed off its queue."""
+        self._seen.pop(worker, None)
+        self._idle.pop(worker, None)
+        return {'workers': self.members()}
+
+    def route(self, links, handoff=False, visited=False):
+        """
+        Put links into the inbox of their owners.
+
+        Args:
+            links (list): Pairs of URL and crawl depth.
+            handoff (bool): Whether the links come from the queue of a
+                worker that no longer owns them, so they are queued even
+                if they were routed before.
+            visited (bool): Whether the links were crawled by a worker
+                that no longer owns them, so their new owner only marks
+                them as visited.
+
+        Returns:
+            dict: The number of links added.
+        """
+        members = self.members()
+        rows = []
+        for url, depth in links:
+            host = async_fetch.host_of(url)
+            rows.append((url, depth, host, owner_of(host, members)))
+        before = self.conn.total_changes
+        with self.conn:
+            if handoff or visited:
+                self.conn.executemany(
+                    'INSERT INTO inbox (url, depth, host, owner, visited) '
+                    'VALUES (?, ?, ?, ?, ?) ON CONFLICT (url) DO UPDATE SET '
+                    'depth = excluded.depth, owner = excluded.owner, '
+                    'visited = MAX(visited, excluded.visited), '
+                    'state = 0, leased_until = 0',
+                    [row + (int(visited),) for row in rows]
+                )
+            else:
+                self.conn.executemany(
+                    'INSERT OR IGNORE INTO inbox (url, depth, host, owner) '
+                    'VALUES (?, ?, ?, ?)',
+                    rows
+                )
+        return {'added': self.conn.total_changes - before}
+
+    def lease(self, worker, limit=500):
+        """
+        Hand out the queued links of a worker.
+
+        Returns:
+            dict: The leased links as URL, crawl depth and whether the
+                URL was crawled by its former owner.
+        """
+        now = time.time()
+        self.members()
+        rows = self.conn.execute(
+            'SELECT url, depth, visited FROM inbox WHERE owner = ? AND '
+            '(state = ? OR (state = ? AND leased_until < ?)) LIMIT ?',
+            (worker, QUEUED, LEASED, now, limit)
+        ).fetchall()
+        if rows:
+            # The worker has work again until its next heartbeat
+            self._idle[worker] = False
+        with self.conn:
+            self.conn.executemany(
+                'UPDATE inbox SET state = ?, leased_until = ? WHERE url = ?',
+                ((LEASED, now + self.lease_time, row[0]) for row in rows)
+            )
+        return {'links': rows}
+
+    def ack(self, worker, urls):
+        """Mark leased links as queued by their owner."""
+        with self.conn:
+            self.conn.executemany(
+                'UPDATE inbox SET state = ? WHERE url = ? AND owner = ?',
+                ((DONE, url, worker) for url in urls)
+            )
+        return {}
+
+    def done(self):
+        """
+        Tell whether all workers are idle and no link is left to crawl.
+        Visited URLs waiting for a new owner are no work.
+        """
+        if not self._joined or not all(self._idle.values()):
+            return False
+        pending = self.conn.execute(
+            'SELECT COUNT(*) FROM inbox WHERE state < ? AND visited = 0',
+            (DONE,)
+        ).fetchone()[0]
+        return pending == 0
+
+    def status(self):
+        """
+        Report the workers and the inbox.
+
+        Returns:
+            dict: The workers with their idle flag and seconds since the
+                last heartbeat, the number of queued, leased and
+                delivered links, and whether the crawl is done.
+        """
+        members = self.members()
+        now = time.monotonic()
+        counts = dict(self.conn.execute(
+            'SELECT state, COUNT(*) FROM inbox GROUP BY state'
+        ).fetchall())
+        return {
+            'workers': [
+                {
+                    'id': worker,
+                    'idle': self._idle.get(worker, False),
+                    'last_seen': round(now - self._seen[worker], 1),
+                }
+                for worker in members
+            ],
+            'queued': counts.get(QUEUED, 0),
+            'leased': counts.get(LEASED, 0),
+            'delivered': counts.get(DONE, 0),
+            'done': self.done(),
+        }
+
+    def handle(self, request):
+        """Run a request of a client under the coordinator's lock."""
+        operations = {
+            'join': self.join, 'heartbeat': self.heartbeat,
+            'leave': self.leave, 'route': self.route, 'lease': self.lease,
+            'ack': self.ack, 'status': self.status,
+        }
+        op = request.pop('op', None)
+        if op not in operations:
+            return {'error': f'unknown operation {op!r}'}
+        with self._lock:
+            try:
+                return operations[op](**request)
+            except (TypeError, ValueError, sqlite3.Error) as e:
+                return {'error': repr(e)}
+
+    def close(self):
+        """Close the inbox database."""
+        self.conn.close()
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+            except ValueError as e:
+                answer = {'error': repr(e)}
+            else:
+                answer = self.server.coordinator.handle(request)
+            self.wfile.write(json.dumps(answer).encode('utf-8') + b'\n')
+
+
+class CoordinatorServer(socketserver.ThreadingTCPServer):
+    """Serve a Coordinator over TCP."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, coordinator):
+        self.coordinator = coordinator
+        super().__init__(address, _RequestHandler)
+
+
+class CoordinatorClient:
+    """
+    The connection of a worker to the coordinator.
+
+    Args:
+        address (tuple): The host and port of the coordinator.
+        timeout (float): The seconds to wait for an answer.
+    """
+
+    def __init__(self, address, timeout=30.0):
+        self.address = address
+        self.timeout = timeout
+        self._socket = None
+        self._file = None
+
+    def call(self, op, **args):
+        """
+        Send a request and return the answer.
+
+        Raises:
+            ConnectionError: If the coordinator cannot be reached or
+                returns an error.
+        """
+        for attempt in range(2):
+            try:
+                if self._socket is None:
+                    self._socket = socket.create_connection(
+                        self.address, self.timeout
+                    )
+                    self._file = self._socket.makefile('rwb')
+                self._file.write(
+                    json.dumps(dict(args, op=op)).encode('utf-8') + b'\n'
+                )
+                self._file.flush()
+                line = self._file.readline()
+                if not line:
+                    raise ConnectionError('connection closed')
+                break
+            except OSError as e:
+                # Reconnect once, e.g. after a restart of the coordinator
+                self.close()
+                if attempt:
+                    raise ConnectionError(
+                        f'Coordinator {self.address} unreachable: {e}'
+                    ) from e
+        answer = json.loads(line)
+        if 'error' in answer:
+            raise ConnectionError(f"Coordinator error: {answer['error']}")
+        return answer
+
+    def close(self):
+        """Close the connection."""
+        if self._socket is not None:
+            self._file.close()
+            self._socket.close()
+            self._socket = self._file = None
+
+
+def worker_directory(site, worker_id):
+    """
+    Create the crawl directory of a worker inside the site directory.
+
+    Returns:
+        str: The path of the directory, <site>/workers/<worker_id>.
+    """
+    directory = os.path.join(site, 'workers', worker_id)
+    for folder in ('nonarticle_pages', 'article_pages', 'resources'):
+        os.makedirs(os.path.join(directory, folder), exist_ok=True)
+    for name in (
+        'visited', 'error', 'graph', 'queue', 'irrelevant', 'forbidden'
+    ):
+        open(
+            os.path.join(directory, 'resources', f'{name}.txt'), 'a',
+            encoding='utf-8'
+        ).close()
+    return directory
+
+
+class DistributedCrawler(ClassicCrawler):
+    """
+    Crawl the hosts of a site that belong to one worker.
+
+    The worker keeps its own queue, visited URLs and pages in
+    <site>/workers/<worker_id>, so settings.section has to name the
+    patterns.ini section of the site. Only the in-memory queue can be
+    handed off to other workers, and the visited URLs are kept in a set,
+    so the fetches cut off by a stop can be handed off as not visited.
+
+    Args:
+        directory (str): The crawl directory of the worker.
+        worker_id (str): The unique id of the worker.
+        client (CoordinatorClient): The connection to the coordinator.
+        checker_func (callable): The checker of the site, or None.
+        sync_interval (float): The seconds between two exchanges with
+            the coordinator.
+    """
+
+    def __init__(
+        self, directory, worker_id, client, checker_func=None,
+        config='patterns.ini', settings=None, sync_interval=2.0
+    ):
+        self.worker_id = worker_id
+        self.client = client
+        self.checker_func = checker_func
+        self.sync_interval = sync_interval
+        self.members = [worker_id]
+        self.outbox = []
+        self.routed = 0
+        self.received = 0
+        super().__init__(directory, config, settings)
+        self.visited_hosts = self.load_visited_hosts()
+        # Every worker starts from the base URL, the coordinator
+        # lets only the first one through
+        seed = self.url_patterns.base_url + '/'
+        if list(self.to_crawl) == [seed]:
+            self.to_crawl.discard(seed)
+            self.outbox.append((seed, 0))
+        if self.settings.store != 'memory':
+            raise ValueError('A distributed crawl needs the memory store.')
+        if self.settings.visited != 'set':
+            raise ValueError('A distributed crawl needs the visited set.')
+
+    def page_checker(self):
+        """Return the checker function of the site."""
+        return self.checker_func or document.accept_all
+
+    def owns(self, url):
+        """Tell whether the host of a URL belongs to this worker."""
+        return owner_of(async_fetch.host_of(url), self.members) == (
+            self.worker_id
+        )
+
+    def queue_links(self, urls, depth=0):
+        """Queue the links to own hosts and forward the others."""
+        own = []
+        for url in urls:
+            if self.owns(url):
+                own.append(url)
+            else:
+                self.outbox.append((url, depth))
+        return super().queue_links(own, depth)
+
+    def next_url(self):
+        """
+        Take the next URL and remember it with its host.
+
+        It is only written to visited.txt once its page is finished (see
+        finish_page), so a fetch cut off by a stop is not recorded as
+        visited.
+        """
+        self.page_count += 1
+        next_url, depth = self._to_crawl.pop_entry()
+        self.crawled_urls.add(next_url)
+        print(f'{self.page_count}: ', next_url)
+        self.visited_hosts.setdefault(
+            async_fetch.host_of(next_url), []
+        ).append(next_url)
+        return next_url, depth
+
+    def finish_page(self, url):
+        """Record a finished page as visited and commit its records."""
+        self.tracker.append(
+            'visited',
+            url
+        )
+        super().finish_page(url)
+
+    def load_visited_hosts(self):
+        """Group the URLs this worker crawled before by their host."""
+        visited_hosts = {}
+        for url in retrieve_data.read_linklist(self.tracking_files.visited):
+            visited_hosts.setdefault(async_fetch.host_of(url), []).append(url)
+        return visited_hosts
+
+    def rebalance(self, members):
+        """
+        Adopt a new membership and hand off the queued and the visited
+        URLs of the hosts this worker lost.
+        """
+        self.members = members
+        moved = [
+            (url, depth) for url, depth in self.to_crawl.entries()
+            if not self.owns(url)
+        ]
+        for url, _ in moved:
+            self.to_crawl.discard(url)
+        if moved:
+            self.client.call('route', links=moved, handoff=True)
+            self.routed += len(moved)
+            print(f'Handed off {len(moved)} queued URLs')
+
+        lost = [
+            host for host in self.visited_hosts
+            if owner_of(host, members) != self.worker_id
+        ]
+        visited = [
+            (url, 0) for host in lost for url in self.visited_hosts.pop(host)
+        ]
+        if visited:
+            self.client.call('route', links=visited, visited=True)
+            print(
+                f'Handed off {len(visited)} visited URLs of {len(lost)} hosts'
+            )
+
+    def sync(self, idle=False):
+        """
+        Forward the collected links, renew the membership and queue the
+        links leased from the inbox.
+
+        Args:
+            idle (bool): Whether no fetch is in flight. The worker is
+                only reported idle if its queue is empty as well.
+
+        Returns:
+            bool: Whether the whole crawl is done.
+        """
+        idle = idle and not self.to_crawl
+        if self.outbox:
+            self.client.call('route', links=self.outbox)
+            self.routed += len(self.outbox)
+            self.outbox = []
+
+        answer = self.client.call(
+            'heartbeat', worker=self.worker_id, idle=idle
+        )
+        if answer['workers'] != self.members:
+            self.rebalance(answer['workers'])
+
+        links = self.client.call('lease', worker=self.worker_id)['links']
+        if links:
+            by_depth = {}
+            for url, depth, visited in links:
+                if visited:
+                    # Crawled by the former owner of its host
+                    self.crawled_urls.add(url)
+                    self.to_crawl.discard(url)
+                    self.visited_hosts.setdefault(
+                        async_fetch.host_of(url), []
+                    ).append(url)
+                elif url not in self.crawled_urls:
+                    by_depth.setdefault(depth, []).append(url)
+            for depth, urls in by_depth.items():
+                self.tracker.append_lines(
+                    'queue',
+                    self.queue_links(urls, depth)
+                )
+            self.tracker.commit()
+            self.client.call(
+                'ack', worker=self.worker_id, urls=[link[0] for link in links]
+            )
+            self.received += len(links)
+        return answer['done'] and not links
+
+    def start_crawling(self, max_pages=None, dynamic_pages=False):
+        """
+        Crawl the own hosts until all workers are done.
+
+        Args:
+            max_pages (int): The maximum number of pages of this worker.
+            dynamic_pages (bool): Render the pages with a browser.
+        """
+        self.client.call('join', worker=self.worker_id)
+        # Learn the hosts and the URLs crawled by others before crawling
+        self.sync()
+        try:
+            asyncio.run(self.crawl_distributed(max_pages, dynamic_pages))
+        finally:
+            self.leave()
+            self.save_state()
+        self.report_stats()
+        print(
+            f'Distributed: {self.routed} URLs forwarded, '
+            f'{self.received} received from other workers'
+        )
+
+    def leave(self):
+        """Hand off the queued and visited URLs and leave the crawl."""
+        try:
+            # Not idle until the queue is handed off, or the coordinator
+            # could end the crawl of the other workers before it arrives
+            self.sync(idle=False)
+            # The last worker leaves its URLs to the workers of a later run
+            self.rebalance([
+                worker for worker in self.members if worker != self.worker_id
+            ])
+            self.client.call('leave', worker=self.worker_id)
+        except ConnectionError as e:
+            print(f'Could not hand off the queue: {e}')
+        self.client.close()
+
+    async def crawl_distributed(self, max_pages=None, dynamic_pages=False):
+        """
+        Crawl like crawl_concurrently, exchanging links with the other
+        workers every sync_interval seconds.
+        """
+        engine = async_fetch.FetchEngine(
+            self.fetch_page,
+            concurrency=self.settings.concurrency,
+            per_host=self.settings.per_host,
+            scheduler=self.politeness
+        )
+        checker = self.page_checker()
+        pending = {}
+        last_sync = time.monotonic()
+
+        try:
+            while True:
+                while len(pending) < engine.concurrency and (
+                    self.continue_crawling(
+                        max_pages, self.page_count, self.to_crawl
+                    )
+                ):
+                    next_url, depth = self.next_url()
+                    task = asyncio.create_task(engine.fetch(
+                        next_url, dynamic_pages, robots_cache=self.robots
+                    ))
+                    pending[task] = (next_url, depth)
+
+                idle = not pending
+                if idle or time.monotonic() - last_sync >= self.sync_interval:
+                    if self.sync(idle) and idle:
+                        break
+                    last_sync = time.monotonic()
+                if max_pages is not None and self.page_count >= int(
+                    max_pages
+                ) and not pending:
+                    break
+                if not pending:
+                    if not self.to_crawl:
+                        await asyncio.sleep(self.sync_interval / 4)
+                    continue
+
+                done, _ = await asyncio.wait(
+                    pending, timeout=self.sync_interval,
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    _, depth = pending.pop(task)
+                    url, html, error = task.result()
+                    if error is None:
+                        if html is not None:
+                            try:
+                                self.process_page(url, html, checker, depth)
+                            except CRAWL_ERRORS as e:
+                                self.record_error(url, e, depth)
+                    elif isinstance(error, CRAWL_ERRORS):
+                        self.record_error(url, error, depth)
+                    else:
+                        raise error
+                    self.finish_page(url)
+        finally:
+            for task, (url, depth) in pending.items():
+                # Hand off interrupted fetches with the queue, they were
+                # not written to visited.txt yet (see next_url)
+                task.cancel()
+                self.crawled_urls.discard(url)
+                self.to_crawl.add(url, depth)
+                # A sync may have handed off the host meanwhile
+                urls = self.visited_hosts.get(async_fetch.host_of(url), [])
+                if url in urls:
+                    urls.remove(url)
+            engine.close()
+
+        return None
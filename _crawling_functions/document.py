@@ -0,0 +1,133 @@
+"""
+This module contains the parsed representation of a crawled page. The
+HTML of a page is parsed at most once per parser, when the first stage
+needs it: the links are taken from lxml's tree, and a BeautifulSoup tree
+is only built for checkers that use it. The checker, the link extraction
+and the text extraction all share the result.
+
+Author: Bruno Brocai
+"""
+
+import functools
+import inspect
+from bs4 import BeautifulSoup
+from lxml import etree
+from . import link_extract
+
+
+_TEXT = etree.XPath(
+    '//text()[not(ancestor::script or ancestor::style or ancestor::template)]'
+)
+
+
+class Document:
+    """
+    A crawled page whose trees, links and text are computed on first use.
+
+    Attributes:
+        html (str): The HTML content of the page.
+        url (str): The URL the page was fetched from.
+        skip_nofollow (bool): Leave out links with rel="nofollow".
+        parses (int): How often the HTML was parsed (once per parser).
+    """
+
+    def __init__(self, html, url=None, skip_nofollow=False):
+        self.html = html
+        self.url = url
+        self.skip_nofollow = skip_nofollow
+        self.parses = 0
+        self._soup = None
+        self._tree = None
+        self._tree_parsed = False
+        self._text = None
+        self._links = None
+
+    @property
+    def soup(self):
+        """The BeautifulSoup tree of the page, parsed on first access."""
+        if self._soup is None:
+            self._soup = BeautifulSoup(self.html, 'lxml')
+            self.parses += 1
+        return self._soup
+
+    @property
+    def tree(self):
+        """The lxml tree of the page (None if empty), parsed on first access."""
+        if not self._tree_parsed:
+            self._tree = link_extract.parse_html(self.html)
+            self._tree_parsed = True
+            self.parses += 1
+        return self._tree
+
+    @property
+    def text(self):
+        """
+        The text of the page, with its elements separated by spaces.
+
+        Like BeautifulSoup's get_text, without the content of script,
+        style and template elements, but taken from the lxml tree.
+        """
+        if self._text is None:
+            tree = self.tree
+            self._text = '' if tree is None else ' '.join(_TEXT(tree))
+        return self._text
+
+    @property
+    def links(self):
+        """
+        The links of the page with their context.
+
+        Returns:
+            link_extract.LinkInfo: The links, the <base> href and the
+                canonical href.
+        """
+        if self._links is None:
+            self._links = link_extract.extract_links(
+                self.tree, self.skip_nofollow
+            )
+        return self._links
+
+    def link_info(self):
+        """
+        Return the links of the page and the URLs needed to resolve them.
+
+        Returns:
+            tuple: The same as retrieve_data.get_link_info_from_html.
+        """
+        info = self.links
+        return (
+            {link.href for link in info.links},
+            info.base_href,
+            info.canonical_href
+        )
+
+
+@functools.lru_cache(maxsize=256)
+def accepts_document(checker):
+    """Tell whether a checker function takes a 'document' argument."""
+    try:
+        parameters = inspect.signature(checker).parameters
+    except (TypeError, ValueError):
+        return False
+    return 'document' in parameters or any(
+        parameter.kind == inspect.Parameter.VAR_KEYWORD
+        for parameter in parameters.values()
+    )
+
+
+def call_checker(checker, document):
+    """
+    Run a checker function on a page.
+
+    Checkers are called as checker(html, url). Checkers that also take
+    a 'document' argument get the shared Document, so they do not have
+    to parse the page themselves.
+    """
+    if accepts_document(checker):
+        return checker(document.html, document.url, document=document)
+    return checker(document.html, document.url)
+
+
+def accept_all(html, url):
+    """The checker of crawlers that keep every page."""
+    return True
@@ -0,0 +1,309 @@
+"""
+This module contains the crawl frontier, the queue of URLs still to crawl.
+URLs are added and taken in place with O(1) amortized cost, duplicates are
+ignored, and the order in which URLs are handed out is pluggable.
+
+Author: Bruno Brocai
+"""
+
+import heapq
+import itertools
+import sys
+from collections import OrderedDict, deque
+from . import async_fetch
+from . import url_classifier
+
+
+# Rough cost of holding a queued URL besides the string itself and
+# its slot in the dedup set: the (url, depth) tuple and its deque slot
+ENTRY_OVERHEAD = sys.getsizeof((None, 0)) + 8
+
+# Dropped URLs remembered by a full frontier, see Frontier.add
+MAX_REMEMBERED_DROPS = 100000
+
+
+class BreadthFirstOrder:
+    """Hand out the URLs with the lowest crawl depth first, FIFO within a depth."""
+
+    def __init__(self, _classify=None):
+        self._buckets = {}
+        self._depths = []
+
+    def push(self, url, depth):
+        bucket = self._buckets.get(depth)
+        if bucket is None:
+            bucket = self._buckets[depth] = deque()
+            heapq.heappush(self._depths, depth)
+        bucket.append((url, depth))
+
+    def extend(self, entries):
+        for depth, group in itertools.groupby(entries, key=lambda e: e[1]):
+            bucket = self._buckets.get(depth)
+            if bucket is None:
+                bucket = self._buckets[depth] = deque()
+                heapq.heappush(self._depths, depth)
+            bucket.extend(group)
+
+    def pop(self):
+        depth = self._depths[0]
+        bucket = self._buckets[depth]
+        entry = bucket.popleft()
+        if not bucket:
+            del self._buckets[depth]
+            heapq.heappop(self._depths)
+        return entry
+
+    def __iter__(self):
+        for depth in sorted(self._buckets):
+            yield from self._buckets[depth]
+
+
+class ArticleFirstOrder:
+    """Hand out article URLs before all other URLs, FIFO within each group."""
+
+    def __init__(self, classify):
+        self._classify = classify
+        self._articles = deque()
+        self._others = deque()
+
+    def push(self, url, depth):
+        if self._classify(url) == url_classifier.ARTICLE:
+            self._articles.append((url, depth))
+        else:
+            self._others.append((url, depth))
+
+    def extend(self, entries):
+        for url, depth in entries:
+            self.push(url, depth)
+
+    def pop(self):
+        if self._articles:
+            return self._articles.popleft()
+        return self._others.popleft()
+
+    def __iter__(self):
+        yield from self._articles
+        yield from self._others
+
+
+class HostRoundRobinOrder:
+    """Hand out one URL per host in turn, FIFO within each host."""
+
+    def __init__(self, _classify=None):
+        self._hosts = OrderedDict()
+
+    def push(self, url, depth):
+        host = async_fetch.host_of(url)
+        queue = self._hosts.get(host)
+        if queue is None:
+            queue = self._hosts[host] = deque()
+        queue.append((url, depth))
+
+    def extend(self, entries):
+        for url, depth in entries:
+            self.push(url, depth)
+
+    def pop(self):
+        host, queue = next(iter(self._hosts.items()))
+        entry = queue.popleft()
+        if queue:
+            self._hosts.move_to_end(host)
+        else:
+            del self._hosts[host]
+        return entry
+
+    def __iter__(self):
+        for queue in self._hosts.values():
+            yield from queue
+
+
+ORDERINGS = {
+    'bfs': BreadthFirstOrder,
+    'article': ArticleFirstOrder,
+    'host': HostRoundRobinOrder,
+}
+
+
+class Frontier:
+    """
+    The queue of URLs to crawl.
+
+    Attributes:
+        ordering (str): The name of the ordering ('bfs', 'article', 'host').
+        max_size (int): The maximum number of queued URLs, or None. URLs
+            added to a full frontier are dropped (and counted). They are
+            still in queue.txt, which the next run reads them from: all
+            of it without a snapshot, and from the offset the last
+            snapshot kept for them otherwise (see snapshot.save). A
+            crawl that keeps the frontier full takes several runs to
+            reach them all.
+        dropped (int): The number of URLs dropped because of max_size.
+
+    Up to MAX_REMEMBERED_DROPS dropped URLs are remembered, so a URL
+    that is linked again while the frontier is still full is not
+    reported as new and written to queue.txt a second time.
+    """
+
+    def __init__(self, ordering='bfs', classify=None, max_size=None):
+        if ordering not in ORDERINGS:
+            raise ValueError(
+                f"Unknown ordering '{ordering}', "
+                f"choose from {list(ORDERINGS)}."
+            )
+        if ordering == 'article' and classify is None:
+            raise ValueError('The article ordering needs a classify function.')
+
+        self.ordering = ordering
+        self.max_size = max_size
+        self.dropped = 0
+        self._order = ORDERINGS[ordering](classify)
+        self._queued = set()
+        self._dropped = set()
+        self._url_bytes = 0
+
+    def add(self, url, depth=0):
+        """
+        Queue a URL unless it is already queued.
+
+        Returns:
+            bool: True if the URL was neither queued nor dropped before.
+        """
+        if url in self._queued:
+            return False
+        if self.max_size is not None and len(self._queued) >= self.max_size:
+            if url in self._dropped:
+                return False
+            self.dropped += 1
+            self.remember_dropped([url])
+            return True
+        self._queued.add(url)
+        self._url_bytes += sys.getsizeof(url)
+        self._order.push(url, depth)
+        if url in self._dropped:
+            self._dropped.discard(url)
+            return False
+        return True
+
+    def remember_dropped(self, urls):
+        """Keep dropped URLs until MAX_REMEMBERED_DROPS are kept."""
+        for url in urls:
+            if len(self._dropped) >= MAX_REMEMBERED_DROPS:
+                return
+            self._dropped.add(url)
+
+    def update(self, urls, depth=0):
+        """
+        Queue several URLs at the same depth.
+
+        Returns:
+            list: The URLs that were neither queued nor dropped before,
+                including the ones dropped now because the frontier is
+                full.
+        """
+        return [url for url in urls if self.add(url, depth)]
+
+    def restore(self, entries):
+        """
+        Queue many URLs at once, e.g. the entries of a snapshot.
+
+        Args:
+            entries (list): Pairs of URL and crawl depth in crawl order,
+                every URL once.
+        """
+        if self._queued:
+            entries = [entry for entry in entries if entry[0] not in self]
+        if self.max_size is not None:
+            room = max(self.max_size - len(self._queued), 0)
+            self.dropped += max(len(entries) - room, 0)
+            self.remember_dropped(url for url, _ in entries[room:])
+            entries = entries[:room]
+        urls = [url for url, _ in entries]
+        self._queued.update(urls)
+        self._url_bytes += sum(map(sys.getsizeof, urls))
+        self._order.extend(entries)
+
+    def requeue(self, urls, depth=0):
+        """
+        Queue URLs again that were crawled before, e.g. to refresh them.
+
+        Returns:
+            list: The URLs that were not queued before.
+        """
+        return self.update(urls, depth)
+
+    def pop_entry(self):
+        """
+        Take the next URL from the queue.
+
+        Returns:
+            tuple: The URL and its crawl depth.
+
+        Raises:
+            KeyError: If the frontier is empty.
+        """
+        if not self._queued:
+            raise KeyError('pop from an empty frontier')
+        url, depth = self._order.pop()
+        # Skip the entries of discarded URLs
+        while url not in self._queued:
+            url, depth = self._order.pop()
+        self._queued.discard(url)
+        self._url_bytes -= sys.getsizeof(url)
+        return url, depth
+
+    def pop(self):
+        """Take the next URL from the queue."""
+        return self.pop_entry()[0]
+
+    def complete(self, url):
+        """Mark a taken URL as done. Nothing to do for an in-memory queue."""
+
+    def discard(self, url):
+        """
+        Remove a URL from the queue if it is queued.
+
+        Its entry stays in the ordering and is skipped when it comes up.
+        """
+        if url in self._queued:
+            self._queued.discard(url)
+            self._url_bytes -= sys.getsizeof(url)
+
+    def memory_usage(self):
+        """Return an estimate of the bytes used by the queued URLs."""
+        return (
+            self._url_bytes
+            + sys.getsizeof(self._queued)
+            + len(self._queued) * ENTRY_OVERHEAD
+        )
+
+    def stats(self):
+        """Return the size, the memory estimate and the dropped URLs."""
+        size = len(self._queued)
+        memory = self.memory_usage()
+        return {
+            'queued': size,
+            'dropped': self.dropped,
+            'bytes': memory,
+            'bytes_per_url': memory / size if size else 0,
+        }
+
+    def __len__(self):
+        return len(self._queued)
+
+    def __bool__(self):
+        return bool(self._queued)
+
+    def __contains__(self, url):
+        return url in self._queued
+
+    def __iter__(self):
+        for url, _ in self.entries():
+            yield url
+
+    def entries(self):
+        """Iterate over the queued URLs and their depth in crawl order."""
+        seen = set()
+        for url, depth in self._order:
+            if url in self._queued and url not in seen:
+                seen.add(url)
+                yield url, depth
@@ -0,0 +1,178 @@
+"""
+This module contains the shared HTTP session layer. All fetches go
+through one requests session with a keep-alive connection pool per
+host, so repeated requests to the same site reuse their TCP and TLS
+connections.
+
+Author: Bruno Brocai
+"""
+
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+try:
+    import brotli  # noqa: F401  pylint: disable=unused-import
+    ACCEPT_ENCODING = 'gzip, deflate, br'
+except ImportError:
+    try:
+        import brotlicffi  # noqa: F401  pylint: disable=unused-import
+        ACCEPT_ENCODING = 'gzip, deflate, br'
+    except ImportError:
+        ACCEPT_ENCODING = 'gzip, deflate'
+
+
+DEFAULT_HEADERS = {
+    'Accept-Encoding': ACCEPT_ENCODING,
+    'Connection': 'keep-alive',
+}
+
+
+def counting_connection(connection_cls, adapter):
+    """Subclass a urllib3 connection so every new socket is counted."""
+
+    class CountingConnection(connection_cls):
+        def connect(self):
+            adapter.count_connection()
+            super().connect()
+
+    return CountingConnection
+
+
+class CountingAdapter(HTTPAdapter):
+    """
+    HTTPAdapter that counts how many sockets its pools open, so the
+    reuse of keep-alive connections can be reported.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.connections_opened = 0
+        self._lock = threading.Lock()
+        super().__init__(*args, **kwargs)
+
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        super().init_poolmanager(connections, maxsize, block, **pool_kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': type('CountingHTTPConnectionPool', (HTTPConnectionPool,), {
+                'ConnectionCls': counting_connection(HTTPConnection, self)
+            }),
+            'https': type('CountingHTTPSConnectionPool', (HTTPSConnectionPool,), {
+                'ConnectionCls': counting_connection(HTTPSConnection, self)
+            }),
+        }
+
+    def count_connection(self):
+        """Register a newly opened socket."""
+        with self._lock:
+            self.connections_opened += 1
+
+
+class HttpClient:
+    """
+    A requests session with pooled keep-alive connections.
+
+    Attributes:
+        session (requests.Session): The underlying session.
+        timeout (float): The default timeout of a request in seconds.
+    """
+
+    def __init__(
+        self, pool_connections=32, pool_maxsize=16,
+        headers=None, timeout=20
+    ):
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers.update(DEFAULT_HEADERS)
+        if headers:
+            self.session.headers.update(headers)
+
+        self.adapter = CountingAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize
+        )
+        self.session.mount('http://', self.adapter)
+        self.session.mount('https://', self.adapter)
+
+        self.requests_sent = 0
+        self.bytes_received = 0
+        self._lock = threading.Lock()
+
+    def get(self, url, **kwargs):
+        """Send a GET request through the pooled session."""
+        kwargs.setdefault('timeout', self.timeout)
+        response = self.session.get(url, **kwargs)
+        with self._lock:
+            self.requests_sent += 1
+            self.bytes_received += len(response.content)
+        return response
+
+    def stats(self):
+        """
+        Report how well the connection pool is used.
+
+        Returns:
+            dict: The number of requests sent, connections opened and
+                connections reused, and the bytes received.
+        """
+        sent = self.requests_sent
+        connections = self.adapter.connections_opened
+        return {
+            'requests': sent,
+            'connections_opened': connections,
+            'connections_reused': max(sent - connections, 0),
+            'bytes_received': self.bytes_received,
+        }
+
+    def close(self):
+        """Close all pooled connections."""
+        self.session.close()
+
+
+_CLIENT = None
+_CLIENT_LOCK = threading.Lock()
+
+
+def configure(**kwargs):
+    """
+    Replace the shared client by one created with the given arguments.
+
+    Args:
+        **kwargs: Passed on to HttpClient.
+
+    Returns:
+        HttpClient: The new shared client.
+    """
+    global _CLIENT  # pylint: disable=global-statement
+    with _CLIENT_LOCK:
+        if _CLIENT is not None:
+            _CLIENT.close()
+        _CLIENT = HttpClient(**kwargs)
+    return _CLIENT
+
+
+def get_client():
+    """Return the shared client, creating it on first use."""
+    global _CLIENT  # pylint: disable=global-statement
+    if _CLIENT is None:
+        with _CLIENT_LOCK:
+            if _CLIENT is None:
+                _CLIENT = HttpClient()
+    return _CLIENT
+
+
+def parse_header_options(header_lines):
+    """
+    Turn 'Name: value' strings into a header dictionary.
+
+    Raises:
+        ValueError: If a line does not contain a colon.
+    """
+    headers = {}
+    for line in header_lines or ():
+        name, sep, value = line.partition(':')
+        if not sep:
+            raise ValueError(f"Invalid header '{line}', expected 'Name: value'.")
+        headers[name.strip()] = value.strip()
+    return headers
@@ -0,0 +1,340 @@
+"""
+This module contains the trackers that record the progress of a crawl
+in the text files of the site directory (visited.txt, queue.txt, ...).
+
+The FileTracker appends to the text files right away, opening a file
+for every line. The Journal appends all records to one log instead and
+writes them in groups: the records of the pages finished in a short
+time are written and synced together. The text files are views of the
+journal, brought up to date at checkpoints. Only complete groups are
+replayed after a crash, so the text files never show half a page.
+
+Before records are added to the text files, their sizes are written to
+a checkpoint marker next to the journal. The marker is removed once the
+journal is emptied. If it is still there at the start, the text files
+are cut back to the marked sizes before the journal is replayed, so
+the records of a checkpoint cut off by a crash are not added twice.
+
+Author: Bruno Brocai
+"""
+
+import os
+import time
+from . import write_data
+
+
+# The files a tracker writes to, as attributes of TrackingFiles
+VIEWS = (
+    'visited', 'queue', 'irrelevant', 'error', 'graph', 'aliases',
+    'forbidden'
+)
+
+COMMIT = 'commit\n'
+MARKER_SUFFIX = '.checkpoint'
+FSYNC_POLICIES = ('always', 'periodic', 'never')
+
+
+class FileTracker:
+    """Append every record to its text file at once."""
+
+    def __init__(self, tracking_files):
+        self.tracking_files = tracking_files
+        # A journal left by an earlier crawl still has to be replayed
+        self.recovered = recover(tracking_files)
+
+    def append(self, view, line):
+        write_data.append_line_to_file(
+            getattr(self.tracking_files, view), line
+        )
+
+    def append_lines(self, view, lines):
+        write_data.append_lines_to_file(
+            getattr(self.tracking_files, view), lines
+        )
+
+    def commit(self):
+        """Nothing to do, every record is written at once."""
+
+    def close(self):
+        pass
+
+
+class Journal:
+    """
+    An append-only log of all records of a crawl, with group commit.
+
+    Records are buffered and belong to the group that is ended by
+    commit(), normally once per page. Groups are written to the log
+    with one write call when group_size groups are buffered or
+    max_delay seconds passed since the last write. Every written
+    group ends with a commit line; a group without one was cut off by
+    a crash and is dropped.
+
+    Attributes:
+        tracking_files (TrackingFiles): The files of the site directory.
+        fsync (str): When the log is synced to disk: 'always' after
+            every write, 'periodic' at most once a second, 'never'.
+        group_size (int): The number of groups written together.
+        max_delay (float): Seconds after which buffered groups are
+            written, however few there are.
+        checkpoint_bytes (int): The size of the log after which the
+            text files are brought up to date.
+        checkpoint_interval (float): Seconds after which the text files
+            are brought up to date.
+        groups_written (int): The groups written in this run.
+        writes (int): The write calls on the log in this run.
+        syncs (int): The fsync calls on the log in this run.
+    """
+
+    def __init__(
+        self, tracking_files, fsync='periodic', group_size=16,
+        max_delay=1.0, checkpoint_bytes=2**20, checkpoint_interval=30.0
+    ):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(
+                f"Unknown fsync policy '{fsync}', "
+                f"choose from {list(FSYNC_POLICIES)}."
+            )
+        self.tracking_files = tracking_files
+        self.fsync = fsync
+        self.group_size = group_size
+        self.max_delay = max_delay
+        self.checkpoint_bytes = checkpoint_bytes
+        self.checkpoint_interval = checkpoint_interval
+        self.groups_written = 0
+        self.writes = 0
+        self.syncs = 0
+
+        self.recovered = recover(tracking_files)
+
+        self._file = open(tracking_files.journal, 'ab')
+        self._group = []
+        self._buffer = []
+        self._groups_buffered = 0
+        self._views = {view: [] for view in VIEWS}
+        self._view_records = 0
+        self._last_write = self._last_sync = self._last_checkpoint = (
+            time.monotonic()
+        )
+
+    def append(self, view, line):
+        """Add a record for a text file to the current group."""
+        self._group.append(f'{view}\t{line}\n')
+
+    def append_lines(self, view, lines):
+        self._group.extend(f'{view}\t{line}\n' for line in lines)
+
+    def commit(self):
+        """
+        End the current group. It is written now or with the next groups.
+        """
+        if self._group:
+            self._buffer.extend(self._group)
+            self._buffer.append(COMMIT)
+            self._groups_buffered += 1
+            for record in self._group:
+                view, line = record[:-1].split('\t', 1)
+                self._views[view].append(line)
+            self._view_records += len(self._group)
+            self._group = []
+
+        now = time.monotonic()
+        if self._groups_buffered and (
+            self._groups_buffered >= self.group_size
+            or now - self._last_write >= self.max_delay
+        ):
+            self.flush()
+        if self._view_records and (
+            self._file.tell() >= self.checkpoint_bytes
+            or now - self._last_checkpoint >= self.checkpoint_interval
+        ):
+            self.checkpoint()
+
+    def flush(self, sync=False):
+        """Write the buffered groups to the log."""
+        if self._buffer:
+            self._file.write(''.join(self._buffer).encode('utf-8'))
+            self._file.flush()
+            self.writes += 1
+            self.groups_written += self._groups_buffered
+            self._buffer = []
+            self._groups_buffered = 0
+
+        now = time.monotonic()
+        self._last_write = now
+        if self.fsync == 'always' or sync or (
+            self.fsync == 'periodic' and now - self._last_sync >= 1.0
+        ):
+            if self.fsync != 'never':
+                os.fsync(self._file.fileno())
+                self.syncs += 1
+            self._last_sync = now
+
+    def checkpoint(self):
+        """
+        Bring the text files up to date and empty the log.
+
+        The records are only removed from the log once the text files
+        are synced. A crash in between leaves the checkpoint marker, and
+        the next start replays them into text files cut back to it.
+        """
+        self.flush(sync=True)
+        if self._view_records:
+            write_marker(self.tracking_files)
+        for view, lines in self._views.items():
+            if lines:
+                path = getattr(self.tracking_files, view)
+                with open(path, 'a', encoding='utf-8') as file:
+                    file.write(''.join(f'{line}\n' for line in lines))
+                    file.flush()
+                    if self.fsync != 'never':
+                        os.fsync(file.fileno())
+                lines.clear()
+        self._view_records = 0
+        self._file.truncate(0)
+        self._file.seek(0)
+        remove_marker(self.tracking_files)
+        self._last_checkpoint = time.monotonic()
+
+    def stats(self):
+        return {
+            'groups': self.groups_written,
+            'writes': self.writes,
+            'syncs': self.syncs,
+        }
+
+    def close(self):
+        """Write the last records and bring the text files up to date."""
+        self.commit()
+        self.checkpoint()
+        self._file.close()
+
+
+def read_committed(path):
+    """
+    Read the complete groups of a journal.
+
+    Returns:
+        tuple: The records as (view, line) tuples and the number of
+            bytes they take, the rest of the file is a cut off group.
+    """
+    records, group, end = [], [], 0
+    offset = 0
+    with open(path, 'rb') as file:
+        for raw in file:
+            offset += len(raw)
+            if not raw.endswith(b'\n'):
+                break
+            line = raw.decode('utf-8', errors='replace')
+            if line == COMMIT:
+                records.extend(group)
+                group = []
+                end = offset
+                continue
+            view, sep, value = line[:-1].partition('\t')
+            if sep and view in VIEWS:
+                group.append((view, value))
+    return records, end
+
+
+def marker_path(tracking_files):
+    return tracking_files.journal + MARKER_SUFFIX
+
+
+def write_marker(tracking_files):
+    """Record the sizes of the text files before a checkpoint."""
+    sizes = []
+    for view in VIEWS:
+        path = getattr(tracking_files, view)
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        sizes.append(f'{view}\t{size}\n')
+    temporary = marker_path(tracking_files) + '.tmp'
+    with open(temporary, 'w', encoding='utf-8') as file:
+        file.write(''.join(sizes))
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary, marker_path(tracking_files))
+
+
+def remove_marker(tracking_files):
+    if os.path.exists(marker_path(tracking_files)):
+        os.remove(marker_path(tracking_files))
+
+
+def rewind_views(tracking_files):
+    """
+    Cut the text files back to the sizes in the checkpoint marker.
+
+    Returns:
+        int: The number of bytes cut off, the part of a checkpoint
+            that was written before a crash.
+    """
+    removed = 0
+    with open(marker_path(tracking_files), 'r', encoding='utf-8') as file:
+        for line in file:
+            view, _, size = line.rstrip('\n').partition('\t')
+            if view not in VIEWS or not size.isdigit():
+                continue
+            path = getattr(tracking_files, view)
+            if os.path.exists(path) and os.path.getsize(path) > int(size):
+                removed += os.path.getsize(path) - int(size)
+                with open(path, 'r+b') as view_file:
+                    view_file.truncate(int(size))
+    return removed
+
+
+def recover(tracking_files):
+    """
+    Replay the complete groups of a journal left behind by a crash into
+    the text files, then empty the journal.
+
+    Returns:
+        dict: The number of replayed records per text file, the number
+            of bytes of the cut off group that were dropped, and the
+            number of bytes of a cut off checkpoint that were removed
+            from the text files.
+    """
+    path = tracking_files.journal
+    replayed = {view: 0 for view in VIEWS}
+    replayed['dropped_bytes'] = 0
+    replayed['rewound_bytes'] = 0
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        # The journal was emptied, only the marker was left
+        remove_marker(tracking_files)
+        return replayed
+
+    if os.path.exists(marker_path(tracking_files)):
+        replayed['rewound_bytes'] = rewind_views(tracking_files)
+    else:
+        write_marker(tracking_files)
+
+    records, end = read_committed(path)
+    lines = {view: [] for view in VIEWS}
+    for view, line in records:
+        lines[view].append(line)
+    for view, view_lines in lines.items():
+        if view_lines:
+            with open(
+                getattr(tracking_files, view), 'a', encoding='utf-8'
+            ) as file:
+                file.write(''.join(f'{line}\n' for line in view_lines))
+                file.flush()
+                os.fsync(file.fileno())
+            replayed[view] = len(view_lines)
+
+    replayed['dropped_bytes'] = os.path.getsize(path) - end
+    with open(path, 'r+b') as file:
+        file.truncate(0)
+    remove_marker(tracking_files)
+    return replayed
+
+
+def make_tracker(tracking_files, settings):
+    """Create the tracker chosen in the crawl settings."""
+    if settings.journal:
+        return Journal(
+            tracking_files,
+            fsync=settings.fsync,
+            group_size=settings.group_commit
+        )
+    return FileTracker(tracking_files)
@@ -0,0 +1,103 @@
+"""
+This module contains the link extraction of the crawl hot path. The
+links are collected from lxml's C tree of the page, without building a
+BeautifulSoup tree, together with the context they were found in.
+
+Author: Bruno Brocai
+"""
+
+from collections import namedtuple
+from lxml import etree
+
+
+LINK_TAGS = ('a', 'link', 'base')
+
+Link = namedtuple('Link', ['href', 'tag', 'text', 'rel'])
+Link.__doc__ = """A link of a page.
+
+Attributes:
+    href (str): The value of the href attribute.
+    tag (str): The tag of the link, 'a' or 'link'.
+    text (str): The anchor text, whitespace collapsed ('' for <link>).
+    rel (tuple): The lowercase tokens of the rel attribute.
+"""
+
+LinkInfo = namedtuple('LinkInfo', ['links', 'base_href', 'canonical_href'])
+
+_PARSER = etree.HTMLParser(
+    remove_comments=True, remove_pis=True, no_network=True
+)
+
+
+def parse_html(html):
+    """
+    Parse a page into an lxml tree.
+
+    Returns:
+        lxml.etree._Element: The root element, or None if the page is
+            empty.
+    """
+    if not html or not html.strip():
+        return None
+    try:
+        return etree.fromstring(html, _PARSER)
+    except ValueError:
+        # lxml refuses strings with an XML encoding declaration
+        return etree.fromstring(html.encode('utf-8'), _PARSER)
+
+
+def extract_links(root, skip_nofollow=False):
+    """
+    Collect the links of a parsed page with their context.
+
+    Args:
+        root (lxml.etree._Element): The root of the page, see parse_html.
+        skip_nofollow (bool): Leave out links with rel="nofollow".
+
+    Returns:
+        LinkInfo: The links in document order, the href of the first
+            <base> tag and of the first <link rel="canonical"> (None if
+            missing).
+    """
+    links = []
+    base_href = canonical_href = None
+    if root is None:
+        return LinkInfo(links, base_href, canonical_href)
+
+    for element in root.iter(LINK_TAGS):
+        href = element.get('href')
+        if href is None:
+            continue
+        tag = element.tag
+        if tag == 'base':
+            if base_href is None:
+                base_href = href
+            continue
+
+        rel = tuple(element.get('rel', '').lower().split())
+        if tag == 'link' and canonical_href is None and 'canonical' in rel:
+            canonical_href = href
+        if skip_nofollow and 'nofollow' in rel:
+            continue
+        text = ''
+        if tag == 'a':
+            text = ' '.join(''.join(element.itertext()).split())
+        links.append(Link(href, tag, text, rel))
+
+    return LinkInfo(links, base_href, canonical_href)
+
+
+def get_link_info(html, skip_nofollow=False):
+    """
+    Extract the links of a page, see retrieve_data.get_link_info_from_html.
+
+    Returns:
+        tuple: The set of unique links, the href of the <base> tag and the
+            href of the <link rel="canonical"> tag (None if missing).
+    """
+    info = extract_links(parse_html(html), skip_nofollow)
+    return (
+        {link.href for link in info.links},
+        info.base_href,
+        info.canonical_href
+    )
@@ -0,0 +1,366 @@
+"""
+This module contains the manifest of the pages stored for a site. The
+crawler adds a row for every page when it is written: its URL and
+canonical URL, its class, where it is stored (the JSON file, or the
+segment with offset and length), its size and content hash, when it was
+crawled and whether the checker accepted it. The pages of a site can
+then be looked up, counted and filtered without opening them.
+
+The manifest of a corpus crawled before it existed is built once with
+build_manifest.py.
+
+Author: Bruno Brocai
+"""
+
+import datetime
+import hashlib
+import os
+import sqlite3
+import time
+from . import crawling_objects
+from . import page_store
+from . import url_classifier
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    url TEXT PRIMARY KEY,
+    canonical TEXT,
+    kind TEXT NOT NULL,
+    location TEXT,
+    offset INTEGER,
+    length INTEGER,
+    size INTEGER,
+    content_hash TEXT,
+    crawled REAL,
+    relevant INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS documents_kind ON documents (kind);
+CREATE INDEX IF NOT EXISTS documents_canonical ON documents (canonical);
+CREATE INDEX IF NOT EXISTS documents_location ON documents (location);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+COLUMNS = (
+    'url', 'canonical', 'kind', 'location', 'offset', 'length', 'size',
+    'content_hash', 'crawled', 'relevant'
+)
+
+# The folders of the stored pages by class, relative to the site
+FOLDERS = {
+    url_classifier.ARTICLE: 'article_pages',
+    url_classifier.NOT_ARTICLE: 'nonarticle_pages',
+}
+
+
+def content_hash(html):
+    """Hash the content of a page like revisit.RevisitStore does."""
+    return hashlib.blake2b(html.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def parse_time(value):
+    """Turn the time_crawled of a stored record into a unix time."""
+    try:
+        return datetime.datetime.fromisoformat(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+class Manifest:
+    """
+    The manifest of the pages of a site directory.
+
+    The locations are kept relative to the site directory, so the
+    directory can be moved. The manifest is complete if it lists every
+    stored page: it was created before the first page was stored or
+    built by build_manifest.py. Only a complete manifest is used in
+    place of reading the stored pages. A crawler marks it incomplete
+    while it stores pages and complete again when it stops cleanly, so
+    after a crash the stored pages are read until the manifest is
+    repaired by build_manifest.py.
+
+    Attributes:
+        path (str): The path of the database file.
+        directory (str): The site directory.
+    """
+
+    def __init__(self, path, directory):
+        self.path = path
+        self.directory = directory
+        created = not os.path.exists(path)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(SCHEMA)
+        if created and not any(
+            page_store.count_documents(folder) for folder in self.folders()
+            if os.path.isdir(folder)
+        ):
+            self.set_complete()
+
+    def folders(self):
+        return [
+            os.path.join(self.directory, folder) for folder in FOLDERS.values()
+        ]
+
+    @property
+    def complete(self):
+        row = self.conn.execute(
+            "SELECT value FROM meta WHERE key = 'complete'"
+        ).fetchone()
+        return row is not None and row[0] == '1'
+
+    def set_complete(self, complete=True):
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO meta VALUES ('complete', ?)",
+                ('1' if complete else '0',)
+            )
+
+    def relative(self, path):
+        return os.path.relpath(path, self.directory).replace(os.sep, '/')
+
+    def add(
+        self, url, kind, html=None, stored=None, canonical=None,
+        relevant=True, crawled=None, commit=True
+    ):
+        """
+        Record a page, replacing an earlier version.
+
+        Args:
+            url (str): The URL of the page.
+            kind (str): The class of the page, see url_classifier.
+            html (str): The content of the page, or None.
+            stored (dict): Where the page was stored, as returned by the
+                write of a page store, or None if it was not stored.
+            canonical (str): The canonical URL of the page.
+            relevant (bool): Whether the checker accepted the page.
+            crawled (float): The unix time of the crawl, now if None.
+            commit (bool): Commit at once, otherwise call commit later.
+        """
+        location = offset = length = None
+        if stored is not None and 'file' in stored:
+            location = self.relative(stored['file'])
+        elif stored is not None:
+            location = f"{FOLDERS[kind]}/{stored['segment']}"
+            offset, length = stored['offset'], stored['length']
+        self.conn.execute(
+            'INSERT OR REPLACE INTO documents VALUES '
+            '(?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (
+                url, canonical or url, kind, location, offset, length,
+                None if html is None else len(html.encode('utf-8')),
+                None if html is None else content_hash(html),
+                time.time() if crawled is None else crawled, int(relevant)
+            )
+        )
+        if commit:
+            self.conn.commit()
+
+    def commit(self):
+        self.conn.commit()
+
+    def lookup(self, url):
+        """
+        Find a page by its URL or canonical URL.
+
+        Returns:
+            dict: The row of the page, or None.
+        """
+        row = self.conn.execute(
+            f"SELECT {', '.join(COLUMNS)} FROM documents "
+            f"WHERE url = ? OR canonical = ? LIMIT 1", (url, url)
+        ).fetchone()
+        return None if row is None else dict(zip(COLUMNS, row))
+
+    def select(self, kind=None, relevant=None, since=None, stored=True):
+        """
+        Iterate over the pages matching all given filters.
+
+        Args:
+            kind (str): Only pages of this class.
+            relevant (bool): Only pages the checker accepted or rejected.
+            since (float): Only pages crawled at or after this unix time.
+            stored (bool): Only stored pages, or all recorded pages if
+                False.
+
+        Yields:
+            dict: The row of every page.
+        """
+        conditions, params = [], []
+        if kind is not None:
+            conditions.append('kind = ?')
+            params.append(kind)
+        if relevant is not None:
+            conditions.append('relevant = ?')
+            params.append(int(relevant))
+        if since is not None:
+            conditions.append('crawled >= ?')
+            params.append(since)
+        if stored:
+            conditions.append('location IS NOT NULL')
+        query = f"SELECT {', '.join(COLUMNS)} FROM documents"
+        if conditions:
+            query += ' WHERE ' + ' AND '.join(conditions)
+        for row in self.conn.execute(query, params):
+            yield dict(zip(COLUMNS, row))
+
+    def count(self, kind=None):
+        """Count the stored pages, of one class or all."""
+        query = 'SELECT COUNT(*) FROM documents WHERE location IS NOT NULL'
+        params = ()
+        if kind is not None:
+            query += ' AND kind = ?'
+            params = (kind,)
+        return self.conn.execute(query, params).fetchone()[0]
+
+    def urls_in(self, folder):
+        """Return the URLs of the pages stored in a folder of the site."""
+        prefix = self.relative(folder).rstrip('/') + '/'
+        return {
+            row[0] for row in self.conn.execute(
+                'SELECT url FROM documents WHERE substr(location, 1, ?) = ?',
+                (len(prefix), prefix)
+            )
+        }
+
+    def relocate(self, moves):
+        """
+        Record that stored files were renamed.
+
+        Args:
+            moves (iterable): The old and new path of every file.
+        """
+        # The rows are found before any is changed, so a file renamed to
+        # the old name of another one is not moved twice
+        updates = []
+        for old, new in moves:
+            updates.extend(
+                (self.relative(new), rowid) for (rowid,) in self.conn.execute(
+                    'SELECT rowid FROM documents WHERE location = ?',
+                    (self.relative(old),)
+                )
+            )
+        with self.conn:
+            self.conn.executemany(
+                'UPDATE documents SET location = ? WHERE rowid = ?', updates
+            )
+
+    def read(self, row):
+        """
+        Read the stored record of a page.
+
+        Returns:
+            dict: The record with 'url', 'time_crawled' and
+                'html_content'.
+        """
+        path = os.path.join(self.directory, row['location'])
+        if row['offset'] is None:
+            return page_store.read_json(path)
+        return page_store.read_record(
+            os.path.dirname(path), os.path.basename(path),
+            row['offset'], row['length']
+        )
+
+    def close(self):
+        self.conn.close()
+
+
+def open_manifest(directory):
+    """
+    Open the manifest of a site directory if it is complete.
+
+    Returns:
+        Manifest: The manifest, or None.
+    """
+    path = crawling_objects.TrackingFiles(directory).manifest
+    if not os.path.exists(path):
+        return None
+    manifest = Manifest(path, directory)
+    if not manifest.complete:
+        manifest.close()
+        return None
+    return manifest
+
+
+def build(manifest, rebuild=False, progress=None):
+    """
+    Add the pages stored in a site directory to its manifest, reading
+    every JSON file and segment once, and mark it complete.
+
+    The pages are taken as accepted by the checker. Their canonical URL
+    is their URL, the rel=canonical of the pages is not read.
+
+    Args:
+        manifest (Manifest): The manifest to fill.
+        rebuild (bool): Drop the recorded pages first. Otherwise only
+            the pages missing from the manifest are added.
+        progress (callable): Called with the number of pages added.
+
+    Returns:
+        int: The number of pages added.
+    """
+    if rebuild:
+        with manifest.conn:
+            manifest.conn.execute('DELETE FROM documents')
+    known = {
+        row[0] for row in manifest.conn.execute(
+            'SELECT location FROM documents WHERE offset IS NULL '
+            'AND location IS NOT NULL'
+        )
+    }
+    segments = {
+        (row[0], row[1]) for row in manifest.conn.execute(
+            'SELECT location, offset FROM documents WHERE offset IS NOT NULL'
+        )
+    }
+
+    added = 0
+    for kind, name in FOLDERS.items():
+        folder = os.path.join(manifest.directory, name)
+        if not os.path.isdir(folder):
+            continue
+        for filename in sorted(os.listdir(folder)):
+            path = os.path.join(folder, filename)
+            if not filename.endswith('.json') or (
+                manifest.relative(path) in known
+            ):
+                continue
+            try:
+                record = page_store.read_json(path)
+            except (OSError, ValueError) as e:
+                print(f'Skipping {path}: {e}')
+                continue
+            manifest.add(
+                record['url'], kind, record['html_content'], {'file': path},
+                crawled=parse_time(record.get('time_crawled')), commit=False
+            )
+            added += 1
+            if progress is not None:
+                progress(added)
+
+        # The index of the segments lists every record with its location
+        for url, segment, offset, length in page_store.iter_index(folder):
+            if (f'{name}/{segment}', offset) in segments:
+                continue
+            try:
+                record = page_store.read_record(
+                    folder, segment, offset, length
+                )
+            except (OSError, ValueError, EOFError) as e:
+                print(f'Skipping {url} in {segment}: {e}')
+                continue
+            manifest.add(
+                url, kind, record['html_content'],
+                {'segment': segment, 'offset': offset, 'length': length},
+                crawled=parse_time(record.get('time_crawled')), commit=False
+            )
+            added += 1
+            if progress is not None:
+                progress(added)
+    manifest.commit()
+    manifest.set_complete()
+    return added
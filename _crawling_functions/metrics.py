@@ -0,0 +1,555 @@
+"""
+This module contains the metrics of a crawl. The crawlers count and time
+what they do in one registry per process: pages and bytes, the fetch
+latency per host, the check, parse and write time of every page, the
+status codes and errors, the sizes of queue and visited URLs and the
+memory of the process.
+
+The registry is exported in the Prometheus text format by a small HTTP
+server (see serve), and every crawler appends the values of its site to
+a compact time-series file, resources/metrics.tsv, that is rotated when
+it grows too large (see MetricsFile). _build_graph.py plots any series
+of that file.
+
+Author: Bruno Brocai
+"""
+
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+# Upper bounds in seconds of the buckets of the latency histograms
+DEFAULT_BUCKETS = (
+    0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30
+)
+
+# Size of a metrics file before it is rotated, and the rotated files kept
+MAX_BYTES = 8 * 2**20
+BACKUPS = 3
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace(
+        '\n', '\\n'
+    )
+
+
+def series_name(name, labels):
+    """
+    Name a series like Prometheus does, e.g. 'pages_total{site="a"}'.
+
+    Args:
+        name (str): The name of the metric, with its suffix.
+        labels (dict): The label values of the series.
+    """
+    if not labels:
+        return name
+    return name + '{' + ','.join(
+        f'{key}="{_escape(value)}"' for key, value in labels.items()
+    ) + '}'
+
+
+def format_value(value):
+    """Write integral values without a fraction, others with 6 digits."""
+    if float(value).is_integer():
+        return str(int(value))
+    return f'{value:.6g}'
+
+
+class Metric:
+    """
+    A named family of series that differ in their label values.
+
+    Attributes:
+        name (str): The name of the metric.
+        help (str): The description in the exported text.
+        labels (tuple): The names of the labels.
+        persist (bool): Whether the series are written to the metrics
+            files. Metrics with one series per host are only exported.
+    """
+
+    kind = 'untyped'
+
+    def __init__(self, name, help, labels=(), persist=True):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.persist = persist
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labels):
+            raise ValueError(
+                f'{self.name} takes the labels {self.labels}, '
+                f'got {tuple(labels)}'
+            )
+        return tuple(str(labels[label]) for label in self.labels)
+
+    def samples(self):
+        """
+        Yield the current values of all series.
+
+        Yields:
+            tuple: The name with its suffix, the labels (dict) and the
+                value of one series.
+        """
+        with self._lock:
+            values = list(self._values.items())
+        for key, value in values:
+            yield self.name, dict(zip(self.labels, key)), value
+
+
+class Counter(Metric):
+    """A value that only goes up, e.g. the number of pages crawled."""
+
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        """Add to the series with the given label values."""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    """
+    A value that goes up and down, e.g. the size of the queue.
+
+    A series can also be computed when the metrics are collected, see
+    set_function.
+    """
+
+    kind = 'gauge'
+
+    def __init__(self, name, help, labels=(), persist=True):
+        super().__init__(name, help, labels, persist)
+        self._functions = {}
+
+    def set(self, value, **labels):
+        """Set the series with the given label values."""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def set_function(self, function, **labels):
+        """
+        Compute a series when it is collected. The function is called
+        from the thread of the HTTP server, it returns None if the value
+        is not available.
+        """
+        key = self._key(labels)
+        with self._lock:
+            self._functions[key] = function
+
+    def samples(self):
+        yield from super().samples()
+        with self._lock:
+            functions = list(self._functions.items())
+        for key, function in functions:
+            value = function()
+            if value is not None:
+                yield self.name, dict(zip(self.labels, key)), value
+
+
+class Histogram(Metric):
+    """
+    The distribution of observed values, e.g. of the fetch latency,
+    counted in cumulative buckets along with their sum and count.
+    """
+
+    kind = 'histogram'
+
+    def __init__(
+        self, name, help, labels=(), persist=True, buckets=DEFAULT_BUCKETS
+    ):
+        super().__init__(name, help, labels, persist)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        """Count a value in the series with the given label values."""
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    def samples(self):
+        with self._lock:
+            values = [
+                (key, list(counts), total, count)
+                for key, (counts, total, count) in self._values.items()
+            ]
+        for key, counts, total, count in values:
+            labels = dict(zip(self.labels, key))
+            cumulative = 0
+            for bound, bucket in zip(self.buckets, counts):
+                cumulative += bucket
+                yield (
+                    f'{self.name}_bucket',
+                    {**labels, 'le': format_value(bound)}, cumulative
+                )
+            yield f'{self.name}_bucket', {**labels, 'le': '+Inf'}, count
+            yield f'{self.name}_sum', labels, total
+            yield f'{self.name}_count', labels, count
+
+
+class Registry:
+    """
+    The metrics of a process. A metric is created when it is first
+    asked for and shared by everyone asking for it with the same name.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name, help, labels, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(
+                    name, help, labels, **kwargs
+                )
+            elif not isinstance(metric, cls) or (
+                metric.labels != tuple(labels)
+            ):
+                raise ValueError(f'{name} is already a different metric')
+        return metric
+
+    def counter(self, name, help, labels=(), persist=True):
+        """Return the counter with the name, see Counter."""
+        return self._get(Counter, name, help, labels, persist=persist)
+
+    def gauge(self, name, help, labels=(), persist=True):
+        """Return the gauge with the name, see Gauge."""
+        return self._get(Gauge, name, help, labels, persist=persist)
+
+    def histogram(
+        self, name, help, labels=(), persist=True, buckets=DEFAULT_BUCKETS
+    ):
+        """Return the histogram with the name, see Histogram."""
+        return self._get(
+            Histogram, name, help, labels, persist=persist, buckets=buckets
+        )
+
+    def metrics(self):
+        with self._lock:
+            return list(self._metrics.values())
+
+    def render(self):
+        """Return all metrics in the Prometheus text format."""
+        lines = []
+        for metric in self.metrics():
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for name, labels, value in metric.samples():
+                lines.append(
+                    f'{series_name(name, labels)} {format_value(value)}'
+                )
+        return '\n'.join(lines) + '\n'
+
+    def series(self, site=None):
+        """
+        Collect the values written to the metrics files.
+
+        Histograms are only written with their sum and count, the
+        buckets are left to the HTTP endpoint.
+
+        Args:
+            site (str): Only take the series of this site and those
+                without a site label, e.g. the memory of the process.
+
+        Returns:
+            dict: The values by series name.
+        """
+        values = {}
+        for metric in self.metrics():
+            if not metric.persist:
+                continue
+            for name, labels, value in metric.samples():
+                if name.endswith('_bucket'):
+                    continue
+                if site is not None and labels.get('site', site) != site:
+                    continue
+                values[series_name(name, labels)] = value
+        return values
+
+
+_REGISTRY = Registry()
+
+
+def get_registry():
+    """Return the registry of the process."""
+    return _REGISTRY
+
+
+def memory_usage():
+    """
+    Return the resident memory of the process in bytes, or the peak
+    memory where the current one is not available, or None.
+    """
+    try:
+        with open('/proc/self/statm', 'r') as file:
+            pages = int(file.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class CrawlMetrics:
+    """
+    The instruments of the crawler of one site.
+
+    Every series carries the site as a label, so several crawlers of
+    one process (see orchestrator.Orchestrator) share the registry.
+    """
+
+    def __init__(self, site, registry=None):
+        registry = registry or get_registry()
+        self.site = site
+        self.pages = registry.counter(
+            'crawl_pages_total',
+            'Crawled pages by result: article, nonarticle, refreshed, '
+            'irrelevant, duplicate, unchanged, forbidden or error, and '
+            'image, pdf, video or audio for media files',
+            ('site', 'result')
+        )
+        self.bytes = registry.counter(
+            'crawl_bytes_total', 'Bytes of the fetched pages', ('site',)
+        )
+        self.responses = registry.counter(
+            'crawl_responses_total', 'HTTP responses by status code',
+            ('site', 'status')
+        )
+        self.errors = registry.counter(
+            'crawl_errors_total', 'Failed attempts by error class',
+            ('site', 'error')
+        )
+        self.fetch = registry.histogram(
+            'crawl_fetch_seconds', 'Time to fetch a page', ('site',)
+        )
+        self.host_fetch = registry.histogram(
+            'crawl_host_fetch_seconds', 'Time to fetch a page, by host',
+            ('site', 'host'), persist=False
+        )
+        self.check = registry.histogram(
+            'crawl_check_seconds', 'Time to run the checker on a page',
+            ('site',)
+        )
+        self.parse = registry.histogram(
+            'crawl_parse_seconds',
+            'Time to extract the links and signature of a page', ('site',)
+        )
+        self.write = registry.histogram(
+            'crawl_write_seconds', 'Time to store a page', ('site',)
+        )
+        self.frontier = registry.gauge(
+            'crawl_frontier_urls', 'URLs in the queue', ('site',)
+        )
+        self.visited = registry.gauge(
+            'crawl_visited_urls', 'Visited URLs', ('site',)
+        )
+        registry.gauge(
+            'process_resident_memory_bytes', 'Memory of the process'
+        ).set_function(memory_usage)
+
+    def fetched(self, host, seconds, status=None, size=0):
+        """Record a request, status is None if there was no response."""
+        self.fetch.observe(seconds, site=self.site)
+        self.host_fetch.observe(seconds, site=self.site, host=host)
+        if status is not None:
+            self.responses.inc(site=self.site, status=status)
+        if size:
+            self.bytes.inc(size, site=self.site)
+
+    def analyzed(self, analysis):
+        """Record the check and parse time of a pipeline.PageAnalysis."""
+        self.check.observe(analysis.check_seconds, site=self.site)
+        if analysis.relevant:
+            self.parse.observe(analysis.parse_seconds, site=self.site)
+
+    def written(self, seconds):
+        self.write.observe(seconds, site=self.site)
+
+    def page(self, result):
+        """Count a finished page, see the results of crawl_pages_total."""
+        self.pages.inc(site=self.site, result=result)
+
+    def results(self):
+        """Return the pages finished in this process by result."""
+        return {
+            labels['result']: value
+            for _, labels, value in self.pages.samples()
+            if labels['site'] == self.site
+        }
+
+    def error(self, error):
+        self.errors.inc(site=self.site, error=type(error).__name__)
+
+    def progress(self, frontier, visited):
+        """Set the sizes of the queue and the visited URLs."""
+        self.frontier.set(frontier, site=self.site)
+        self.visited.set(visited, site=self.site)
+
+
+class MetricsFile:
+    """
+    A time series of the metrics of a site, one tab separated row of
+    values per sample.
+
+    A line starting with '#' names the columns of the rows below it. It
+    is written again whenever a new series appears and at the start of
+    every file, so a reader never needs an earlier file. When the file
+    grows beyond max_bytes, it is renamed to <path>.1, the older files
+    to <path>.2 and so on, and the oldest beyond backups is deleted.
+    """
+
+    def __init__(self, path, max_bytes=MAX_BYTES, backups=BACKUPS):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._columns = None
+
+    def rotate(self):
+        """Start a new file, keeping the last ones."""
+        for number in range(self.backups, 0, -1):
+            older = f'{self.path}.{number - 1}' if number > 1 else self.path
+            if os.path.exists(older):
+                os.replace(older, f'{self.path}.{number}')
+        if not self.backups and os.path.exists(self.path):
+            os.remove(self.path)
+        self._columns = None
+
+    def write(self, values, timestamp=None):
+        """
+        Append one sample.
+
+        Args:
+            values (dict): The values by series name, see
+                Registry.series.
+            timestamp (float): The unix time of the sample, now if None.
+        """
+        if os.path.exists(self.path) and (
+            os.path.getsize(self.path) >= self.max_bytes
+        ):
+            self.rotate()
+        lines = []
+        columns = sorted(values)
+        if self._columns is None or not set(columns) <= set(self._columns):
+            # Keep the order of the known series, add the new ones
+            known = [c for c in self._columns or () if c in values]
+            columns = known + [c for c in columns if c not in known]
+            self._columns = columns
+            lines.append('# time\t' + '\t'.join(columns))
+        row = [f'{time.time() if timestamp is None else timestamp:.1f}']
+        row.extend(
+            format_value(values[c]) if c in values else ''
+            for c in self._columns
+        )
+        lines.append('\t'.join(row))
+        with open(self.path, 'a', encoding='utf-8') as file:
+            file.write('\n'.join(lines) + '\n')
+
+
+def read_series(path):
+    """
+    Read the samples of a metrics file and the files rotated from it,
+    oldest first.
+
+    Returns:
+        tuple: The timestamps (list) and the values by series name
+            (dict of lists, None where a series has no value).
+    """
+    paths = [path]
+    number = 1
+    while os.path.exists(f'{path}.{number}'):
+        paths.insert(0, f'{path}.{number}')
+        number += 1
+
+    times = []
+    series = {}
+    for file_path in paths:
+        if not os.path.exists(file_path):
+            continue
+        columns = []
+        with open(file_path, 'r', encoding='utf-8') as file:
+            for line in file:
+                fields = line.rstrip('\n').split('\t')
+                if line.startswith('#'):
+                    columns = fields[1:]
+                    continue
+                if not columns or len(fields) != len(columns) + 1:
+                    continue
+                for name in columns:
+                    series.setdefault(name, [None] * len(times))
+                times.append(float(fields[0]))
+                for name, column in series.items():
+                    column.append(None)
+                for name, field in zip(columns, fields[1:]):
+                    if field:
+                        series[name][-1] = float(field)
+    return times, series
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        if self.path.split('?')[0] not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+        body = self.server.registry.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header(
+            'Content-Type', 'text/plain; version=0.0.4; charset=utf-8'
+        )
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MetricsServer(ThreadingHTTPServer):
+    """HTTP server answering GET /metrics with the registry."""
+
+    daemon_threads = True
+
+    def __init__(self, address, registry=None):
+        self.registry = registry or get_registry()
+        super().__init__(address, _MetricsHandler)
+
+
+def serve(port, host='127.0.0.1', registry=None):
+    """
+    Export the metrics at http://<host>:<port>/metrics from a background
+    thread until the process ends.
+
+    Returns:
+        MetricsServer: The running server.
+    """
+    server = MetricsServer((host, port), registry)
+    threading.Thread(
+        target=server.serve_forever, name='metrics', daemon=True
+    ).start()
+    return server
@@ -1,23 +1,60 @@
+import asyncio
+import os
 import time
 import datetime
 import random
-import re
-from urllib import robotparser
+from urllib.parse import urljoin
 import mimetypes
 import requests
+from . import async_fetch
+from . import canonicalize
 from . import crawling_objects
 from . import check_relevance
+from . import crawl_store
+from . import dedup
+from . import document
+from . import frontier
+from . import http_client
+from . import journal
+from . import manifest
+from . import metrics
+from . import page_store
+from . import politeness
+from . import pipeline
 from . import retrieve_data
+from . import revisit
+from . import robots
+from . import site_status
+from . import snapshot
+from . import url_classifier
+from . import visited_filter
 from . import write_data
-from . import special_funcs as special
+
+
+# How often a URL refused with 429 or 503 is queued again
+THROTTLE_RETRIES = 3
+
+# Where the queue and the visited URLs are kept, see CrawlSettings.store
+STORES = ('memory', 'sqlite')
+
+CRAWL_ERRORS = (
+    ValueError,
+    TypeError,
+    FileExistsError,
+    requests.exceptions.RequestException,
+    requests.exceptions.ConnectionError,
+    requests.exceptions.HTTPError
+)
 
 
 def lists_dontcrawl_tocrawl_regex(
     crawllinks, dontlinks,
-    startsw_regex, notinclude_list
+    startsw_regex, notinclude_list,
+    dont_crawl=None
 ):
 
-    dont_crawl = retrieve_data.read_linklist(dontlinks)
+    if dont_crawl is None:
+        dont_crawl = retrieve_data.read_linklist(dontlinks)
     to_crawl = retrieve_data.read_linklist(crawllinks)
     print(f'Links to crawl in list: {len(to_crawl)}')
     to_crawl = check_relevance.relevant_set_regex(
@@ -60,16 +97,31 @@ def list_dontcrawl_tocrawl_index(
     return to_crawl, dont_crawl
 
 
+def in_event_loop():
+    """Tell whether the caller runs in an asyncio event loop."""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
 class Crawler():
     """
     General class for web crawlers.
     """
 
-    def __init__(self, website, config='patterns.ini'):
+    def __init__(self, website, config='patterns.ini', settings=None):
 
         # Get the objects needed
+        self.settings = settings or crawling_objects.CrawlSettings()
+        if self.settings.store not in STORES:
+            raise ValueError(
+                f"Unknown store '{self.settings.store}', "
+                f"choose from {list(STORES)}."
+            )
         self.url_patterns = crawling_objects.UrlPatterns(
-            config, website
+            config, self.settings.section or website
         )
         self.dir_structure = crawling_objects.GoalDirectory(
             website
@@ -77,35 +129,442 @@ class Crawler():
         self.tracking_files = crawling_objects.TrackingFiles(
             website
         )
+        # Replays the records a crash left in the journal,
+        # before the text files are read
+        self.tracker = journal.make_tracker(
+            self.tracking_files, self.settings
+        )
+        self.page_store = page_store.make_page_store(
+            self.dir_structure,
+            self.settings.storage,
+            self.settings.segment_size
+        )
+        # Lists what was stored where, see manifest.Manifest
+        self.manifest = manifest.Manifest(
+            self.tracking_files.manifest, website
+        )
+        # Marked incomplete from the first stored page until save_state,
+        # so a crash between storing a page and listing it is not taken
+        # for a complete manifest
+        self.manifest_complete = self.manifest.complete
+        self.manifest_cleared = False
+        self.storing = None
+        if not self.manifest_complete:
+            print(
+                f'The manifest of {website} misses stored pages, run '
+                f'build_manifest.py {website}'
+            )
+
+        self.classifier = url_classifier.UrlClassifier.from_patterns(
+            self.url_patterns
+        )
+        self.canonicalizer = canonicalize.UrlCanonicalizer(
+            self.url_patterns.drop_params
+        )
+        self.duplicates = self.make_duplicate_index()
 
-        # Initiate the check for robots.txt
-        self._rp = self.make_robots_checker()
+        # Initiate the check for robots.txt, whose Crawl-delay
+        # slows down the requests to each host
+        self.politeness = politeness.PolitenessScheduler(self.settings.delay)
+        self.robots = self.open_robots()
+        self.retries = {}
+        self.retry_depths = {}
+        self.error_count = 0
+
+        self.open_metrics(self.settings.section or website)
 
         # Initiate the queue and visited sets
-        self._to_crawl, self._crawled_urls = lists_dontcrawl_tocrawl_regex(
+        if self.settings.store == 'sqlite':
+            started = time.monotonic()
+            self.store = self.open_store()
+            self._to_crawl = crawl_store.StoreFrontier(self.store)
+            self._crawled_urls = crawl_store.StoreVisited(self.store)
+            print(
+                f'Startup: {time.monotonic() - started:.2f} s opening the '
+                f'store, {len(self._to_crawl)} URLs queued'
+            )
+        else:
+            self._to_crawl, self._crawled_urls = self.load_memory_state()
+        self.last_snapshot = time.monotonic()
+
+        self.summary = self.open_summary()
+
+        # Queue the board pages that are due for a revisit
+        self.revisits = self.open_revisits()
+        self.refreshing = set()
+        if self.settings.refresh:
+            self.queue_revisits()
+
+        # If there's nothing to crawl, check the base url for new content.
+        # It is queued again even if it was visited, which the store
+        # only does on a requeue
+        if len(self._to_crawl) < 1:
+            self._to_crawl.requeue(
+                self.filter_forbidden([self.url_patterns.base_url + '/'])
+            )
+
+    def snapshot_key(self):
+        """Fingerprint the settings the queue in a snapshot depends on."""
+        return snapshot.fingerprint(
+            self.url_patterns.article_pattern,
+            self.url_patterns.notarticle_pattern,
+            self.url_patterns.irrelevant_pattern,
+            self.settings.visited,
+            self.settings.robots
+        )
+
+    def load_memory_state(self):
+        """
+        Restore the queue and the visited URLs kept in memory.
+
+        They are loaded from the last snapshot and the lines appended to
+        queue.txt and visited.txt since it was written, or read from the
+        whole text files if there is no usable snapshot. The time taken
+        is printed.
+
+        Returns:
+            tuple: The frontier and the visited URLs.
+        """
+        started = time.monotonic()
+        visited = None
+        if self.settings.visited == 'bloom':
+            visited = visited_filter.load_visited(
+                self.tracking_files.visited,
+                self.tracking_files.visited_filter,
+                self.settings.visited_error_rate
+            )
+
+        saved = None
+        if self.settings.snapshot_interval:
+            saved = snapshot.load(
+                self.tracking_files.snapshot,
+                self.tracking_files.queue,
+                self.tracking_files.visited,
+                self.snapshot_key()
+            )
+        if saved is None:
+            queued, visited = lists_dontcrawl_tocrawl_regex(
+                self.tracking_files.queue,
+                self.tracking_files.visited,
+                (f'{self.url_patterns.article_pattern}'
+                 f'|{self.url_patterns.notarticle_pattern}'),
+                self.url_patterns.irrelevant_pattern,
+                dont_crawl=visited
+            )
+            to_crawl = self.make_frontier(self.filter_queued(queued))
+            # The URLs a full frontier dropped are only in queue.txt
+            self.queue_offset = 0
+            print(
+                f'Startup: {time.monotonic() - started:.2f} s reading the '
+                f'text files, {len(to_crawl)} URLs queued, '
+                f'{len(visited)} visited'
+            )
+            return to_crawl, visited
+
+        # The bloom filter has already read the visited lines it missed
+        if visited is None:
+            visited = saved.visited
+        to_crawl = self.make_frontier()
+        to_crawl.restore(saved.entries)
+        self.queue_offset = 0 if to_crawl.dropped else saved.queue_offset
+
+        visited_tail = snapshot.read_tail(
+            self.tracking_files.visited, saved.visited_offset
+        )
+        for url in visited_tail:
+            visited.add(url)
+            to_crawl.discard(url)
+        queue_tail = check_relevance.relevant_set_regex(
+            snapshot.read_tail(self.tracking_files.queue, saved.queue_offset),
+            starts_pattern=(f'{self.url_patterns.article_pattern}'
+                            f'|{self.url_patterns.notarticle_pattern}'),
+            excludes_pattern=self.url_patterns.irrelevant_pattern
+        )
+        queue_tail = [url for url in queue_tail if url not in visited]
+        queue_tail = self.filter_queued(queue_tail)
+        to_crawl.update(queue_tail)
+        print(
+            f'Startup: {time.monotonic() - started:.2f} s from the '
+            f'snapshot, {len(to_crawl)} URLs queued, {len(visited)} '
+            f'visited, {len(queue_tail)} queued and {len(visited_tail)} '
+            f'visited lines replayed'
+        )
+        return to_crawl, visited
+
+    def save_snapshot(self):
+        """Write the queue and the visited URLs to a snapshot."""
+        if self.settings.store != 'memory' or not (
+            self.settings.snapshot_interval
+        ):
+            return
+        started = time.monotonic()
+        bloom = isinstance(
+            self.crawled_urls, visited_filter.ScalableBloomFilter
+        )
+        if bloom:
+            self.crawled_urls.save(
+                self.tracking_files.visited_filter,
+                os.path.getsize(self.tracking_files.visited)
+            )
+        # While the frontier drops URLs, the snapshot covers queue.txt
+        # only up to where this crawl started reading it, so the next
+        # one reads the dropped URLs again
+        size = snapshot.save(
+            self.tracking_files.snapshot,
+            self._to_crawl.entries(),
+            None if bloom else self.crawled_urls,
             self.tracking_files.queue,
             self.tracking_files.visited,
-            (f'{self.url_patterns.article_pattern}'
-             f'|{self.url_patterns.notarticle_pattern}'),
-            self.url_patterns.irrelevant_pattern
+            self.snapshot_key(),
+            self.queue_offset if self._to_crawl.dropped else None
+        )
+        self.last_snapshot = time.monotonic()
+        print(
+            f'Snapshot: {len(self._to_crawl)} URLs queued, {size} bytes '
+            f'in {self.last_snapshot - started:.2f} s'
         )
 
-        # If there's nothing to crawl, check the base url for new content
-        if len(self._to_crawl) < 1:
-            self._to_crawl.add(self.url_patterns.base_url + '/')
+    def maybe_snapshot(self):
+        """Write a snapshot if the last one is older than the interval."""
+        if self.settings.snapshot_interval and (
+            time.monotonic() - self.last_snapshot
+            >= self.settings.snapshot_interval
+        ):
+            self.save_snapshot()
+
+    def record_progress(self):
+        """Record the sizes of the queue and visited URLs after a page."""
+        queued = len(self.to_crawl)
+        self.tracker.append(
+            'graph',
+            str(queued)
+        )
+        self.metrics.progress(queued, len(self.crawled_urls))
+
+    def open_metrics(self, site):
+        """Count and time the crawl, see metrics.CrawlMetrics."""
+        self.metrics = metrics.CrawlMetrics(site)
+        self.metrics_file = None
+        if self.settings.metrics_interval:
+            self.metrics_file = metrics.MetricsFile(
+                self.tracking_files.metrics
+            )
+        self.last_metrics = time.monotonic()
 
-    def make_robots_checker(self):
-        """Create a robotparser object to check robots.txt."""
-        rp = robotparser.RobotFileParser()
-        rp.set_url(
-            self.url_patterns.base_url + '/robots.txt')
-        try:
-            rp.read()
-            print('Successfully read robots.txt')
-        except Exception as e:
-            print(f'Error reading robots.txt: {e}')
-            rp = None
-        return rp
+    def write_metrics(self):
+        """Append the current metrics of the site to its metrics file."""
+        self.metrics_file.write(
+            metrics.get_registry().series(self.metrics.site)
+        )
+        self.last_metrics = time.monotonic()
+
+    def maybe_write_metrics(self):
+        """Write the metrics if the last sample is metrics_interval old."""
+        if self.metrics_file is not None and (
+            time.monotonic() - self.last_metrics
+            >= self.settings.metrics_interval
+        ):
+            self.write_metrics()
+
+    def open_summary(self):
+        """
+        Open the summary of the site, see site_status. A site crawled
+        before it had a summary has its stored pages counted once.
+        """
+        summary = site_status.SiteSummary(
+            self.tracking_files.summary,
+            self.metrics.site,
+            self.settings.summary_interval
+        )
+        if summary.base is None:
+            summary.seed(
+                site_status.count_stored(self.dir_structure),
+                len(self._crawled_urls),
+                site_status.count_lines(self.tracking_files.error)
+            )
+        return summary
+
+    def write_summary(self, state='crawling'):
+        """Update the summary of the site, see site_status."""
+        self.summary.write(
+            self.metrics.results(), len(self.to_crawl),
+            len(self.crawled_urls), state
+        )
+
+    def maybe_write_summary(self):
+        """Update the summary if it is summary_interval old."""
+        if self.summary.due():
+            self.write_summary()
+
+    def make_frontier(self, urls=()):
+        """Create the frontier configured in the settings and fill it."""
+        queue = frontier.Frontier(
+            self.settings.ordering,
+            classify=self.classifier.page_kind,
+            max_size=self.settings.frontier_limit
+        )
+        queue.update(urls)
+        return queue
+
+    def make_duplicate_index(self):
+        """Open the fingerprints of the stored pages, if dedup is enabled."""
+        if self.settings.dedup == 'off':
+            return None
+        if self.settings.dedup not in ('exact', 'near'):
+            raise ValueError(
+                f"Unknown dedup mode '{self.settings.dedup}', "
+                "choose off, exact or near."
+            )
+        return dedup.DuplicateIndex(
+            self.tracking_files.signatures,
+            near=self.settings.dedup == 'near',
+            distance=self.settings.dedup_distance
+        )
+
+    def open_revisits(self):
+        """
+        Open the revisit schedule of the site.
+
+        It is created by the first crawl with refresh enabled and from
+        then on also filled by normal crawls, so every board page found
+        is known to the next refresh.
+        """
+        if not (
+            self.settings.refresh
+            or os.path.exists(self.tracking_files.revisits)
+        ):
+            return None
+        revisits = revisit.RevisitStore(
+            self.tracking_files.revisits,
+            *self.settings.revisit_interval
+        )
+        if revisits.created and os.path.exists(self.tracking_files.visited):
+            with open(
+                self.tracking_files.visited, 'r', encoding='utf-8'
+            ) as file:
+                scheduled = revisits.schedule(
+                    url for url in map(str.strip, file)
+                    if url and self.classifier.page_kind(url)
+                    == url_classifier.NOT_ARTICLE
+                )
+            print(f'Scheduled {scheduled} crawled board pages for a revisit')
+        return revisits
+
+    def queue_revisits(self):
+        """Queue the board pages whose revisit is due, visited or not."""
+        due = self.revisits.due()
+        self.refreshing.update(due)
+        self.to_crawl.requeue(due)
+        print(f'Board pages due for a revisit: {len(due)}')
+
+    def open_store(self):
+        """
+        Open the SQLite store of the site.
+
+        A new store is filled once from the queue.txt and visited.txt
+        files of the site directory. The store is only marked as
+        imported once the import committed, so an import cut short by a
+        crash runs again at the next start.
+        """
+        store = crawl_store.CrawlStore(
+            self.tracking_files.store,
+            ordering=self.settings.ordering,
+            classify=self.classifier.page_kind
+        )
+        if not store.imported:
+            visited, queued = crawl_store.import_text_resources(
+                store,
+                self.tracking_files,
+                accept=lambda url: (
+                    self.classifier.classify(url) != url_classifier.IRRELEVANT
+                )
+            )
+            store.set_imported()
+            print(f'Imported {visited} visited and {queued} queued URLs')
+        return store
+
+    def open_robots(self):
+        """
+        Open the robots.txt cache of the crawl.
+
+        Returns:
+            robots.RobotsCache: The cache, or None if robots.txt is
+                ignored.
+        """
+        if not self.settings.robots:
+            return None
+        return robots.RobotsCache(
+            self.tracking_files.robots,
+            user_agent=http_client.get_client().session.headers.get(
+                'User-Agent', '*'
+            ),
+            ttl=self.settings.robots_ttl,
+            scheduler=self.politeness
+        )
+
+    def queue_links(self, urls, depth=0):
+        """
+        Queue the new relevant links of a page that robots.txt allows.
+
+        Returns:
+            list: The URLs that were not queued before.
+        """
+        return self.to_crawl.update(self.filter_forbidden(urls), depth)
+
+    def share_politeness(self, scheduler):
+        """
+        Schedule the requests of the crawl with a scheduler shared by
+        several crawls, see orchestrator.Orchestrator.
+        """
+        self.politeness = scheduler
+        if self.robots is not None:
+            self.robots.use_scheduler(scheduler)
+
+    def filter_forbidden(self, urls):
+        """
+        Drop the URLs disallowed by robots.txt and log them.
+
+        In the event loop of the concurrent crawls, the robots.txt of a
+        new host is not fetched here, which would stall every request
+        in flight. Its URLs are kept and checked when they are fetched,
+        see async_fetch.FetchEngine.
+
+        Returns:
+            list: The allowed URLs.
+        """
+        if self.robots is None:
+            return list(urls)
+        allowed, forbidden = self.robots.filter(
+            urls, load=not in_event_loop()
+        )
+        self.tracker.append_lines(
+            'forbidden',
+            forbidden
+        )
+        return allowed
+
+    def filter_queued(self, urls):
+        """
+        Drop the URLs of queue.txt disallowed by robots.txt, see
+        filter_forbidden. They stay in queue.txt, so only those an
+        earlier start did not log yet are logged.
+
+        Returns:
+            list: The allowed URLs.
+        """
+        if self.robots is None:
+            return list(urls)
+        allowed, forbidden = self.robots.filter(urls)
+        if forbidden and os.path.exists(self.tracking_files.forbidden):
+            logged = retrieve_data.read_linklist(
+                self.tracking_files.forbidden
+            )
+            forbidden = [url for url in forbidden if url not in logged]
+        self.tracker.append_lines(
+            'forbidden',
+            forbidden
+        )
+        return allowed
 
     def ready_to_crawl(self):
         """Check if the crawler is ready to start crawling."""
@@ -132,27 +591,126 @@ class Crawler():
             and to_crawl
         )
 
-    def sort_incoming_links(self, new_links):
+    def sort_incoming_links(self, new_links, page_url=None, base_href=None):
+        """
+        Resolve the links of a page and split them into relevant and
+        irrelevant ones. Links to crawled pages are dropped.
+
+        Args:
+            new_links (set): The href values found on the page.
+            page_url (str): The URL of the page, the site's start page
+                if not given.
+            base_href (str): The href of the page's <base> tag, if any.
+
+        Returns:
+            tuple: The set of relevant and the set of irrelevant URLs.
+        """
 
-        new_links = special.make_absolute_links(
+        new_links = self.canonicalizer.resolve(
             new_links,
-            self.url_patterns.base_url
+            page_url or self.url_patterns.base_url + '/',
+            base_href,
+            known=lambda url: url in self.crawled_urls or url in self.to_crawl
         )
-        relevant_links = check_relevance.relevant_set_regex(
-            new_links,
-            starts_pattern=(
-                f'{self.url_patterns.article_pattern}|'
-                f'{self.url_patterns.notarticle_pattern}'
-            ),
-            excludes_pattern=self.url_patterns.irrelevant_pattern
+        return self.classifier.partition(new_links, self.crawled_urls)
+
+    def save_state(self):
+        """Persist the in-memory state that is not written page by page."""
+        self.tracker.close()
+        self.page_store.close()
+        # Not if the crawl was interrupted between storing a page and
+        # listing it
+        if self.manifest_cleared and self.storing is None:
+            self.manifest.set_complete()
+        self.manifest.close()
+        if self.duplicates is not None:
+            self.duplicates.close()
+        if self.revisits is not None:
+            self.revisits.close()
+        if self.robots is not None:
+            self.robots.close()
+        if self.settings.snapshot_interval:
+            # The text files are complete now, the snapshot covers them
+            self.save_snapshot()
+        elif isinstance(
+            self.crawled_urls, visited_filter.ScalableBloomFilter
+        ):
+            self.crawled_urls.save(
+                self.tracking_files.visited_filter,
+                os.path.getsize(self.tracking_files.visited)
+            )
+        if self.metrics_file is not None:
+            self.write_metrics()
+        self.write_summary('stopped')
+
+    def report_stats(self):
+        """Print connection reuse and the memory held by the frontier."""
+        stats = http_client.get_client().stats()
+        print(
+            f"HTTP: {stats['requests']} requests over "
+            f"{stats['connections_opened']} connections "
+            f"({stats['connections_reused']} reused), "
+            f"{stats['bytes_received']} bytes received"
         )
-        irrel_links = new_links - relevant_links
-        relevant_links = check_relevance.remove_subset(
-            relevant_links,
-            self.crawled_urls
+        stats = self.to_crawl.stats()
+        print(
+            f"Frontier: {stats['queued']} URLs queued "
+            f"({stats['dropped']} dropped), {stats['bytes']} bytes, "
+            f"{stats['bytes_per_url']:.0f} bytes per URL"
         )
-
-        return relevant_links, irrel_links
+        if isinstance(self.crawled_urls, visited_filter.ScalableBloomFilter):
+            print(
+                f"Visited: {len(self.crawled_urls)} URLs in "
+                f"{self.crawled_urls.memory_usage()} bytes"
+            )
+        if getattr(self, 'politeness', None) is not None:
+            stats = self.politeness.stats()
+            print(
+                f"Politeness: {stats['hosts']} hosts, "
+                f"{stats['throttled']} 429/503 answers, "
+                f"{stats['slowdowns']} slowdowns, "
+                f"{stats['backed_off']} hosts still slowed down"
+            )
+        if getattr(self, 'robots', None) is not None:
+            stats = self.robots.stats()
+            print(
+                f"Robots: {stats['hosts']} hosts ({stats['fetched']} "
+                f"robots.txt fetched, {stats['cached']} cached), "
+                f"{stats['forbidden']} URLs forbidden, "
+                f"{stats['sitemaps']} sitemaps listed"
+            )
+        if hasattr(self, 'canonicalizer'):
+            stats = self.canonicalizer.stats()
+            print(
+                f"Canonicalization: {stats['rewritten']} links rewritten, "
+                f"{stats['duplicates_saved']} duplicate fetches saved"
+            )
+        if isinstance(getattr(self, 'tracker', None), journal.Journal):
+            stats = self.tracker.stats()
+            print(
+                f"Journal: {stats['groups']} pages written in "
+                f"{stats['writes']} writes and {stats['syncs']} syncs"
+            )
+        if getattr(self, 'revisits', None) is not None:
+            stats = self.revisits.stats()
+            print(
+                f"Revisits: {stats['not_modified']} not modified, "
+                f"{stats['unchanged']} unchanged and "
+                f"{stats['changed']} new or changed board pages"
+            )
+        if getattr(self, 'stage_depths', None) is not None:
+            stats = self.stage_depths.stats()
+            print('Pipeline: pages per stage (mean/max) ' + ', '.join(
+                f"{stage} {depth['mean']:.1f}/{depth['max']}"
+                for stage, depth in stats.items()
+            ))
+        if getattr(self, 'duplicates', None) is not None:
+            stats = self.duplicates.stats()
+            print(
+                f"Duplicates: {stats['exact_duplicates']} exact and "
+                f"{stats['near_duplicates']} near duplicates not stored, "
+                f"{stats['pages']} pages indexed"
+            )
 
     def wait_random_time(self, min_time=3, max_time=7):
         waittime = random.uniform(min_time, max_time)
@@ -183,10 +741,14 @@ class ClassicCrawler(Crawler):
     Crawl domains where the board and post urls are a regex pattern.
     """
 
-    def __init__(self, website, config='patterns.ini'):
-        super().__init__(website, config)
+    def __init__(self, website, config='patterns.ini', settings=None):
+        super().__init__(website, config, settings)
         self.page_count = 0
 
+    def page_checker(self):
+        """Return the function deciding whether a page is relevant."""
+        return document.accept_all
+
     def start_crawling(self, max_pages=None, dynamic_pages=False):
         """
         Crawls a set of start links up to a maximum number of pages.
@@ -197,187 +759,580 @@ class ClassicCrawler(Crawler):
         If a URL is a board URL, it saves the HTML content and adds the URL to
         the set of URLs to crawl.
 
+        If the settings allow more than one request at a time, the pages
+        are fetched concurrently (see crawl_concurrently). With parse
+        workers, the pages are also analyzed in worker processes (see
+        crawl_pipelined).
+
         Args:
-            start_links (set): The set of URLs to start crawling from.
-            crawled_urls (set): The set of URLs that have already been crawled.
             max_pages (int): The maximum number of pages to crawl.
-            poststr (str): String to identify post URLs.
-            boardstr (str): String to identify board URLs.
-            notinclude (str): String to identify URLs to exclude from crawling.
+            dynamic_pages (bool): Render the pages with a browser.
         """
 
         if not self.ready_to_crawl():
             return None
 
+        try:
+            if self.settings.workers > 0:
+                asyncio.run(self.crawl_pipelined(max_pages, dynamic_pages))
+            elif self.settings.concurrency > 1:
+                asyncio.run(self.crawl_concurrently(max_pages, dynamic_pages))
+            else:
+                self.crawl_sequentially(max_pages, dynamic_pages)
+        finally:
+            self.save_state()
+
+        self.report_stats()
+        return None
+
+    def crawl_sequentially(self, max_pages=None, dynamic_pages=False):
+        """Crawl one page after the other."""
+
         # Main crawling loop
         while super().continue_crawling(max_pages, self.page_count, self.to_crawl):
 
-            self.scrape_page(dynamic_pages=dynamic_pages)
-            write_data.append_line_to_file(
-                self.tracking_files.graph,
-                str(len(self.to_crawl))
+            self.scrape_page(
+                checker=self.page_checker(), dynamic_pages=dynamic_pages
             )
-            # Randomize wait time so it's a little less sus
-            self.wait_random_time()
+            self.record_progress()
+            self.tracker.commit()
+            self.maybe_snapshot()
+            self.maybe_write_metrics()
+            self.maybe_write_summary()
 
-        return None
+    async def crawl_concurrently(self, max_pages=None, dynamic_pages=False):
+        """
+        Crawl with many requests in flight at the same time.
 
-    def scrape_page(self, checker=lambda x, y: True, dynamic_pages=False):
-        self.page_count += 1
-        next_url = self._to_crawl.pop()
-        write_data.append_line_to_file(
-            self.tracking_files.visited,
-            next_url
+        Only the fetching happens concurrently. Every fetched page is
+        classified and stored by process_page in the event loop, one
+        page after the other, so the crawl state is never shared
+        between threads.
+
+        Args:
+            max_pages (int): The maximum number of pages to crawl.
+            dynamic_pages (bool): Render the pages with a browser.
+        """
+        engine = async_fetch.FetchEngine(
+            self.fetch_page,
+            concurrency=self.settings.concurrency,
+            per_host=self.settings.per_host,
+            scheduler=self.politeness
         )
+        checker = self.page_checker()
+        pending = {}
 
         try:
-            self.crawled_urls.add(next_url)
-            print(f'{self.page_count}: ', next_url)
-            if dynamic_pages:
-                html = retrieve_data.get_content_from_url(next_url)
-            else:
-                html = retrieve_data.get_html_from_url(next_url)
-
-            if not checker(html, next_url):
-                write_data.append_line_to_file(
-                    self.tracking_files.irrelevant,
-                    next_url
+            while pending or self.continue_crawling(
+                max_pages, self.page_count, self.to_crawl
+            ):
+                # Fill up the free request slots
+                while len(pending) < engine.concurrency and (
+                    self.continue_crawling(
+                        max_pages, self.page_count, self.to_crawl
+                    )
+                ):
+                    next_url, depth = self.next_url()
+                    task = asyncio.create_task(engine.fetch(
+                        next_url, dynamic_pages, robots_cache=self.robots
+                    ))
+                    pending[task] = depth
+
+                done, _ = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
                 )
-                return None
+                for task in done:
+                    depth = pending.pop(task)
+                    url, html, error = task.result()
+                    if error is None:
+                        if html is not None:
+                            try:
+                                self.process_page(url, html, checker, depth)
+                            except CRAWL_ERRORS as e:
+                                self.record_error(url, e, depth)
+                    elif isinstance(error, CRAWL_ERRORS):
+                        self.record_error(url, error, depth)
+                    else:
+                        raise error
+                    self.finish_page(url)
+        finally:
+            for task in pending:
+                task.cancel()
+            engine.close()
 
-            # If the URL is a post URL, save the HTML content
-            if re.match(self.url_patterns.article_pattern, next_url):
-                write_data.write_html_to_json(
-                        self.dir_structure.article,
-                        next_url,
-                        html
-                    )
+        return None
+
+    async def crawl_pipelined(self, max_pages=None, dynamic_pages=False):
+        """
+        Crawl with fetching, parsing and writing in separate stages.
+
+        The fetch stage downloads the raw pages concurrently, as in
+        crawl_concurrently. The parse stage decodes, checks and searches
+        them for links in a pool of worker processes (see
+        pipeline.ParsePool). The write stage stores the results and
+        updates the queue in the event loop, one page after the other.
+
+        No new request is started while the parse stage holds
+        settings.parse_queue pages, so at most that many pages plus the
+        requests in flight are held in memory. The depth of every stage
+        is reported at the end of the crawl.
 
-            # If the URL is a board URL, save the HTML content and add URL
-            elif (
-                re.match(self.url_patterns.notarticle_pattern, next_url)
+        Args:
+            max_pages (int): The maximum number of pages to crawl.
+            dynamic_pages (bool): Render the pages with a browser.
+        """
+        pool = pipeline.ParsePool(
+            self.page_checker(),
+            workers=self.settings.workers,
+            skip_nofollow=not self.settings.follow_nofollow
+        )
+        engine = async_fetch.FetchEngine(
+            self.fetch_raw,
+            concurrency=self.settings.concurrency,
+            per_host=self.settings.per_host,
+            scheduler=self.politeness
+        )
+        parse_queue = self.settings.parse_queue or 2 * pool.workers
+        self.stage_depths = pipeline.StageDepths(('fetch', 'parse', 'write'))
+        fetching = {}
+        parsing = {}
+
+        try:
+            while fetching or parsing or self.continue_crawling(
+                max_pages, self.page_count, self.to_crawl
             ):
-                write_data.write_html_to_json(
-                        self.dir_structure.not_article,
-                        next_url,
-                        html
-                    )
-            else:
-                write_data.append_line_to_file(
-                    self.tracking_files.irrelevant,
-                    next_url
+                # Fill up the free request slots while the parse stage
+                # keeps up with the fetched pages
+                while len(fetching) < engine.concurrency and (
+                    len(parsing) < parse_queue
+                ) and self.continue_crawling(
+                    max_pages, self.page_count, self.to_crawl
+                ):
+                    next_url, depth = self.next_url()
+                    task = asyncio.create_task(engine.fetch(
+                        next_url, dynamic_pages, robots_cache=self.robots
+                    ))
+                    fetching[task] = depth
+
+                done, _ = await asyncio.wait(
+                    set(fetching) | set(parsing),
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                parsed = [task for task in done if task in parsing]
+                self.stage_depths.sample(
+                    fetch=len(fetching),
+                    parse=len(parsing) - len(parsed),
+                    write=len(parsed)
                 )
 
-            # Extract links from the HTML content
-            # and add them to the set to crawl
-            new_links = retrieve_data.get_links_from_html(
-                html
+                for task in done:
+                    if task in fetching:
+                        depth = fetching.pop(task)
+                        url, page, error = task.result()
+                        if error is None and page is not None:
+                            parse_task = asyncio.create_task(pool.analyze(
+                                url, page, self.fingerprint_mode(url)
+                            ))
+                            parsing[parse_task] = (url, depth)
+                            continue
+                        if error is not None:
+                            if not isinstance(error, CRAWL_ERRORS):
+                                raise error
+                            self.record_error(url, error, depth)
+                    else:
+                        url, depth = parsing.pop(task)
+                        try:
+                            self.store_page(url, task.result(), depth)
+                        except CRAWL_ERRORS as e:
+                            self.record_error(url, e, depth)
+                    self.finish_page(url)
+        finally:
+            for task in fetching:
+                task.cancel()
+            for task in parsing:
+                task.cancel()
+            engine.close()
+            pool.close()
+
+        return None
+
+    def finish_page(self, url):
+        """Mark a page as done and commit its records."""
+        self.complete(url)
+        self.record_progress()
+        self.tracker.commit()
+        self.maybe_snapshot()
+        self.maybe_write_metrics()
+        self.maybe_write_summary()
+
+    def next_url(self):
+        """
+        Take the next URL from the queue and mark it as visited.
+
+        Returns:
+            tuple: The URL and its crawl depth.
+        """
+        self.page_count += 1
+        next_url, depth = self._to_crawl.pop_entry()
+        self.tracker.append(
+            'visited',
+            next_url
+        )
+        self.crawled_urls.add(next_url)
+        print(f'{self.page_count}: ', next_url)
+        return next_url, depth
+
+    def fetch_page(self, url, dynamic_pages=False):
+        """
+        Download the HTML of a page, rendering it if requested.
+
+        Board pages are requested conditionally if the site has a
+        revisit schedule.
+
+        Returns:
+            str: The HTML of the page, or None if the page did not
+                change since its last visit.
+        """
+        page = self.fetch_raw(url, dynamic_pages)
+        return None if page is None else pipeline.decode_html(*page)
+
+    def fetch_raw(self, url, dynamic_pages=False):
+        """
+        Download a page without decoding it, see fetch_page.
+
+        Returns:
+            pipeline.RawPage: The body of the page and its encoding, or
+                None if the page did not change since its last visit.
+        """
+        host = async_fetch.host_of(url)
+        started = time.perf_counter()
+        if dynamic_pages:
+            html = retrieve_data.get_rendered_html_from_url(url)
+            if html is None:
+                self.metrics.fetched(host, time.perf_counter() - started)
+                raise ValueError(f'Could not render {url}')
+            self.metrics.fetched(
+                host, time.perf_counter() - started,
+                size=len(html.encode('utf-8'))
             )
-            relevant_links, irrel_links = self.sort_incoming_links(
-                new_links
+            return pipeline.RawPage(html, None)
+
+        headers = None
+        revisit = self.revisits is not None and (
+            self.classifier.page_kind(url) == url_classifier.NOT_ARTICLE
+        )
+        if revisit:
+            headers = self.revisits.validators(url)
+        try:
+            response = retrieve_data.get_response_from_url(url, headers)
+        except requests.exceptions.RequestException as e:
+            self.metrics.fetched(
+                host, time.perf_counter() - started, politeness.status_of(e)
             )
+            raise
+        self.metrics.fetched(
+            host, time.perf_counter() - started,
+            response.status_code, len(response.content)
+        )
+        if revisit and not self.revisits.record(
+            url, response.status_code, response.headers, response.content
+        ):
+            self.metrics.page('unchanged')
+            return None
+        return pipeline.RawPage(response.content, response.encoding)
 
-            self.to_crawl = self.to_crawl | relevant_links
+    def record_error(self, url, error, depth=0):
+        """
+        Log a URL that could not be crawled.
 
-            write_data.append_lines_to_file(
-                self.tracking_files.queue,
-                relevant_links
-            )
-            write_data.append_lines_to_file(
-                self.tracking_files.irrelevant,
-                irrel_links
-            )
-
-        except (
-            ValueError,
-            TypeError,
-            FileExistsError,
-            requests.exceptions.RequestException,
-            requests.exceptions.ConnectionError,
-            requests.exceptions.HTTPError
-        ) as e:
-            write_data.append_line_to_file(
-                self.tracking_files.error,
-                next_url
+        A URL the host refused with 429 or 503 is queued again when it
+        is completed (see complete), up to THROTTLE_RETRIES times. A URL
+        robots.txt disallows is logged as forbidden.
+        """
+        if isinstance(error, robots.Disallowed):
+            self.metrics.page('forbidden')
+            self.tracker.append(
+                'forbidden',
+                url
             )
-            print(e)
-
+            return None
+        self.metrics.error(error)
+        if politeness.is_throttled(error) and (
+            self.retries.get(url, 0) < THROTTLE_RETRIES
+        ):
+            self.retries[url] = self.retries.get(url, 0) + 1
+            self.retry_depths[url] = depth
+            print(f'{error}, queued again')
+            return None
+        self.error_count += 1
+        self.metrics.page('error')
+        self.tracker.append(
+            'error',
+            url
+        )
+        print(error)
         return None
 
+    def complete(self, url):
+        """Mark a taken URL as done, queueing it again if it is retried."""
+        self.to_crawl.complete(url)
+        depth = self.retry_depths.pop(url, None)
+        if depth is not None:
+            self.tracker.append_lines(
+                'queue',
+                self.to_crawl.requeue([url], depth)
+            )
 
-class CheckerCrawler(ClassicCrawler):
-    """
-    Crawl domains where the board and post urls are a regex pattern
-    and a checker function is provided to determine if the page is relevant.
-    """
+    def scrape_page(self, checker=lambda x, y: True, dynamic_pages=False):
+        next_url, depth = self.next_url()
 
-    def __init__(
-        self, website, checker_func, config='patterns.ini'
-    ):
-        self.checker_func = checker_func
-        super().__init__(website, config)
+        # Wait for the next request slot of the host
+        host = async_fetch.host_of(next_url)
+        time.sleep(self.politeness.reserve(host))
+        start = time.monotonic()
+        try:
+            html = self.fetch_page(next_url, dynamic_pages)
+        except CRAWL_ERRORS as e:
+            self.politeness.record(host, time.monotonic() - start, e)
+            self.record_error(next_url, e, depth)
+            html = None
+        else:
+            self.politeness.record(host, time.monotonic() - start)
 
-    def start_crawling(self, max_pages=None, dynamic_pages=False):
+        try:
+            if html is not None:
+                self.process_page(next_url, html, checker, depth)
+        except CRAWL_ERRORS as e:
+            self.record_error(next_url, e, depth)
+
+        self.complete(next_url)
+        return None
+
+    def process_page(self, url, html, checker=lambda x, y: True, depth=0):
         """
-        Crawls a set of start links up to a maximum number of pages.
+        Classify and store a fetched page and queue its relevant links.
 
-        This function performs a breadth-first search (BFS) starting from the
-        provided start links. It keeps track of the URLs it has already crawled
-        to avoid duplicates. If a URL is a post URL, it saves the HTML content.
-        If a URL is a board URL, it saves the HTML content and adds the URL to
-        the set of URLs to crawl.
+        The page is analyzed in this process, see store_page.
 
         Args:
-            start_links (set): The set of URLs to start crawling from.
-            crawled_urls (set): The set of URLs that have already been crawled.
-            max_pages (int): The maximum number of pages to crawl.
-            poststr (str): String to identify post URLs.
-            boardstr (str): String to identify board URLs.
-            notinclude (str): String to identify URLs to exclude from crawling.
+            url (str): The URL the page was fetched from.
+            html (str): The HTML content of the page.
+            checker (callable): Function deciding if the page is relevant,
+                see document.call_checker.
+            depth (int): The crawl depth of the page.
         """
 
-        if not self.ready_to_crawl():
+        analysis = pipeline.analyze_page(
+            html, url, checker,
+            skip_nofollow=not self.settings.follow_nofollow,
+            fingerprint=self.fingerprint_mode(url)
+        )
+        self.store_page(url, analysis, depth)
+        return None
+
+    def fingerprint_mode(self, url):
+        """
+        Tell the parse stage which duplicate signature a page needs.
+
+        Returns:
+            bool: None if the page is not checked for duplicates, else
+                whether near duplicates are detected.
+        """
+        if self.duplicates is None or self.classifier.page_kind(url) not in (
+            url_classifier.ARTICLE, url_classifier.NOT_ARTICLE
+        ):
             return None
+        return self.duplicates.near
 
-        # Main crawling loop
-        while super().continue_crawling(max_pages, self.page_count, self.to_crawl):
+    def store_page(self, url, analysis, depth=0):
+        """
+        Store an analyzed page and queue its relevant links.
 
-            self.scrape_page(
-                checker=self.checker_func, dynamic_pages=dynamic_pages
+        Args:
+            url (str): The URL the page was fetched from.
+            analysis (pipeline.PageAnalysis): The result of the parse
+                stage for the page.
+            depth (int): The crawl depth of the page.
+        """
+        html = analysis.html
+        self.metrics.analyzed(analysis)
+        page_kind = self.classifier.page_kind(url)
+        if not analysis.relevant:
+            self.metrics.page(url_classifier.IRRELEVANT)
+            self.manifest.add(url, page_kind, relevant=False)
+            self.tracker.append(
+                'irrelevant',
+                url
+            )
+            return None
+
+        storable = page_kind in (
+            url_classifier.ARTICLE, url_classifier.NOT_ARTICLE
+        )
+
+        # A page with the same text as a stored page is
+        # only recorded as an alias of that page
+        signature = analysis.signature
+        original = None
+        if storable and self.duplicates is not None:
+            original = self.duplicates.find(signature, url)
+            if original is not None:
+                self.metrics.page('duplicate')
+                self.tracker.append(
+                    'aliases',
+                    f'{url}\t{original}'
+                )
+                if not self.settings.duplicate_links:
+                    return None
+
+        new_links = analysis.links
+        base_href = analysis.base_href
+        canonical_href = analysis.canonical_href
+
+        # Honor rel=canonical: the page is only stored and searched
+        # for links under its canonical URL once
+        canonical_url = None
+        if canonical_href:
+            canonical_url = self.canonicalizer.canonical(
+                urljoin(url, canonical_href)
             )
-            write_data.append_line_to_file(
-                self.tracking_files.graph,
-                str(len(self.to_crawl))
+            if canonical_url != self.canonicalizer.canonical(url):
+                if canonical_url in self.crawled_urls:
+                    self.canonicalizer.duplicates_saved += 1
+                    if original is None:
+                        self.metrics.page('duplicate')
+                    return None
+                self.crawled_urls.add(canonical_url)
+                self.to_crawl.discard(canonical_url)
+                self.tracker.append(
+                    'visited',
+                    canonical_url
+                )
+
+        # If the URL is a post or board URL, save the HTML content
+        if storable:
+            if original is None:
+                started = time.perf_counter()
+                if self.manifest_complete and not self.manifest_cleared:
+                    self.manifest.set_complete(False)
+                    self.manifest_cleared = True
+                self.storing = url
+                try:
+                    stored = self.page_store.write(
+                        page_kind, url, html, replace=url in self.refreshing
+                    )
+                except FileExistsError:
+                    # Stored by a run that was cut off before the
+                    # page's visited record left the journal
+                    stored = self.page_store.write(
+                        page_kind, url, html, replace=True
+                    )
+                self.manifest.add(
+                    url, page_kind, html, stored,
+                    canonical_url or self.canonicalizer.canonical(url)
+                )
+                self.storing = None
+                self.metrics.written(time.perf_counter() - started)
+                # A refreshed page replaces its stored version
+                self.metrics.page(
+                    'refreshed' if url in self.refreshing else page_kind
+                )
+                if signature is not None:
+                    self.duplicates.add(url, signature)
+        else:
+            self.metrics.page(url_classifier.IRRELEVANT)
+            self.tracker.append(
+                'irrelevant',
+                url
             )
-            # Randomize wait time so it's a little less sus
-            self.wait_random_time()
+
+        # Resolve the links from the HTML content
+        # and add them to the set to crawl
+        relevant_links, irrel_links = self.sort_incoming_links(
+            new_links, url, base_href
+        )
+
+        queued_links = self.queue_links(relevant_links, depth + 1)
+
+        self.tracker.append_lines(
+            'queue',
+            queued_links
+        )
+        self.tracker.append_lines(
+            'irrelevant',
+            irrel_links
+        )
 
         return None
 
 
-class ListedMediaCrawler(Crawler):
+class CheckerCrawler(ClassicCrawler):
     """
     Crawl domains where the board and post urls are a regex pattern
     and a checker function is provided to determine if the page is relevant.
     """
 
-    def __init__(self, website, delay=(2, 6)):
-        try:
-            super().__init__(website)
-        except (ValueError, KeyError):
-            pass
+    def __init__(
+        self, website, checker_func, config='patterns.ini', settings=None
+    ):
+        self.checker_func = checker_func
+        super().__init__(website, config, settings)
 
+    def page_checker(self):
+        """Return the checker function given to the crawler."""
+        return self.checker_func
+
+
+class ListedMediaCrawler(Crawler):
+    """
+    Crawl domains where the board and post urls are a regex pattern
+    and a checker function is provided to determine if the page is relevant.
+    """
+
+    def __init__(self, website, delay=(2, 6), settings=None):
+        # A media directory has no URL patterns, stored pages or
+        # manifest, so only the parts of Crawler.__init__ the media
+        # files need are set up, and everything opened is closed at the
+        # end of start_crawling
+        self.settings = settings or crawling_objects.CrawlSettings()
         self.dir_structure = crawling_objects.MediaGoalDirectory(
             website
         )
         self.tracking_files = crawling_objects.MediaTrackingFiles(
             website, self.dir_structure
         )
-        self._to_crawl, self._crawled_urls = list_dontcrawl_tocrawl_index(
+        # Replays the records a crash left in the journal,
+        # before the text files are read
+        self.tracker = journal.make_tracker(
+            self.tracking_files, self.settings
+        )
+        queued, self._crawled_urls = list_dontcrawl_tocrawl_index(
             self.tracking_files
         )
+        self._to_crawl = frontier.Frontier(
+            self.settings.ordering,
+            classify=lambda url: None,
+            max_size=self.settings.frontier_limit
+        )
         self.delay = delay
 
+        self.politeness = politeness.PolitenessScheduler(delay)
+        self.robots = self.open_robots()
+
+        # The media files are checked against the robots.txt of their
+        # hosts before they are queued
+        self._to_crawl.update(self.filter_forbidden(queued))
+        self.tracker.commit()
+
+        # The media files are counted by type, the summary does not
+        # count the files of earlier crawls (see open_summary)
+        self.open_metrics(self.settings.section or website)
+        self.summary = site_status.SiteSummary(
+            self.tracking_files.summary,
+            self.metrics.site,
+            self.settings.summary_interval
+        )
+
     def filetype(self, url):
         filetype = mimetypes.guess_type(url)[0]
         if filetype:
@@ -403,8 +1358,8 @@ class ListedMediaCrawler(Crawler):
 
             page_count += 1
             next_url = self._to_crawl.pop()
-            write_data.append_line_to_file(
-                self.tracking_files.visited,
+            self.tracker.append(
+                'visited',
                 next_url
             )
 
@@ -412,7 +1367,26 @@ class ListedMediaCrawler(Crawler):
                 self.crawled_urls.add(next_url)
                 print(f'{page_count}: ', next_url)
                 mimetype, extension = self.filetype(next_url)
-                binary_content = retrieve_data.get_content_from_url(next_url)
+
+                # Wait for the next request slot of the host
+                host = async_fetch.host_of(next_url)
+                time.sleep(self.politeness.reserve(host))
+                start = time.monotonic()
+                try:
+                    response = retrieve_data.get_response_from_url(next_url)
+                except CRAWL_ERRORS as e:
+                    self.politeness.record(host, time.monotonic() - start, e)
+                    self.metrics.fetched(
+                        host, time.monotonic() - start,
+                        politeness.status_of(e)
+                    )
+                    raise
+                self.politeness.record(host, time.monotonic() - start)
+                binary_content = response.content
+                self.metrics.fetched(
+                    host, time.monotonic() - start,
+                    response.status_code, len(binary_content)
+                )
 
                 # If the URL is a post URL, save the HTML content
                 if mimetype == 'image':
@@ -432,6 +1406,7 @@ class ListedMediaCrawler(Crawler):
                         self.tracking_files.image_index,
                         index_line
                     )
+                    self.metrics.page('image')
 
                 # If the URL is a board URL, save the HTML content and add URL
                 elif mimetype == 'application' and extension == 'pdf':
@@ -451,6 +1426,7 @@ class ListedMediaCrawler(Crawler):
                         self.tracking_files.pdf_index,
                         index_line
                     )
+                    self.metrics.page('pdf')
 
                 elif mimetype == 'video':
                     self.dir_structure.videocount += 1
@@ -469,6 +1445,7 @@ class ListedMediaCrawler(Crawler):
                         self.tracking_files.video_index,
                         index_line
                     )
+                    self.metrics.page('video')
 
                 elif mimetype == 'audio':
                     self.dir_structure.audiocount += 1
@@ -487,33 +1464,31 @@ class ListedMediaCrawler(Crawler):
                         self.tracking_files.audio_index,
                         index_line
                     )
+                    self.metrics.page('audio')
 
-                write_data.append_line_to_file(
-                    self.tracking_files.graph,
-                    str(len(self.to_crawl))
-                )
+                else:
+                    self.metrics.page(url_classifier.IRRELEVANT)
 
-                # Randomize wait time so it's a little less sus
-                self.wait_random_time(self.delay[0], self.delay[1])
-
-            except (
-                ValueError,
-                TypeError,
-                FileExistsError,
-                requests.exceptions.RequestException,
-                requests.exceptions.ConnectionError,
-                requests.exceptions.HTTPError
-            ) as e:
-                write_data.append_line_to_file(
-                    self.tracking_files.error,
+            except CRAWL_ERRORS as e:
+                self.metrics.error(e)
+                self.metrics.page('error')
+                self.tracker.append(
+                    'error',
                     next_url
                 )
                 print(e)
-                self.wait_random_time()
 
-        write_data.append_line_to_file(
-            self.tracking_files.graph,
-            str(len(self.to_crawl))
-        )
+            self.record_progress()
+            self.tracker.commit()
+            self.maybe_write_metrics()
+            self.maybe_write_summary()
+
+        self.tracker.close()
+        if self.metrics_file is not None:
+            self.write_metrics()
+        self.write_summary('stopped')
+        if self.robots is not None:
+            self.robots.close()
+        self.report_stats()
 
         return None
@@ -0,0 +1,267 @@
+"""
+This module contains the orchestrator that crawls several sites of
+patterns.ini in one process. Each site keeps its own crawler with its
+frontier, storage and checker, while all sites share one fetch engine
+and one politeness scheduler. The requests of all sites are kept in
+flight together, so the pauses of one site are filled with the
+requests of the others.
+
+Author: Bruno Brocai
+"""
+
+import asyncio
+import time
+from . import async_fetch
+from . import politeness
+from .new_crawlers import CRAWL_ERRORS
+
+
+def fetch_site_page(url, crawler, dynamic_pages=False):
+    """Fetch a page with the fetch function of the crawler of its site."""
+    return crawler.fetch_page(url, dynamic_pages)
+
+
+class SiteCrawl:
+    """
+    The state of one site in a multi-site crawl.
+
+    Attributes:
+        name (str): The name of the site, its patterns.ini section and
+            directory.
+        crawler (new_crawlers.ClassicCrawler): The crawler of the site.
+        checker (callable): The checker of the site.
+        state (str): 'crawling', 'done' or 'failed'.
+        in_flight (int): The requests of the site in flight.
+        error (Exception): The exception that stopped the site, if any.
+    """
+
+    def __init__(self, name, crawler):
+        self.name = name
+        self.crawler = crawler
+        self.checker = crawler.page_checker()
+        self.state = 'crawling'
+        self.in_flight = 0
+        self.error = None
+        self.started = time.monotonic()
+        self.finished = None
+
+    def can_start(self, max_pages, per_site):
+        """Tell whether another request of the site may be sent."""
+        return self.state == 'crawling' and self.in_flight < per_site and (
+            self.crawler.continue_crawling(
+                max_pages, self.crawler.page_count, self.crawler.to_crawl
+            )
+        )
+
+    def finish(self, state='done'):
+        """Record that the site is no longer crawled."""
+        if self.finished is None:
+            self.state = state
+            self.finished = time.monotonic()
+
+    def fail(self, error):
+        """Stop crawling the site after an unexpected error."""
+        self.finish('failed')
+        self.error = error
+        print(f'{self.name}: stopped after {error!r}')
+
+    def status(self):
+        """
+        Summarize the progress of the site.
+
+        Returns:
+            dict: The name, state, crawled, queued and in-flight pages,
+                errors, minutes crawled and pages per minute of the site.
+        """
+        minutes = max(
+            (self.finished or time.monotonic()) - self.started, 1
+        ) / 60
+        return {
+            'site': self.name,
+            'state': self.state,
+            'crawled': self.crawler.page_count,
+            'queued': len(self.crawler.to_crawl),
+            'in_flight': self.in_flight,
+            'errors': self.crawler.error_count,
+            'minutes': minutes,
+            'pages_per_minute': self.crawler.page_count / minutes,
+        }
+
+
+def format_status(rows):
+    """Render the status of the sites as a table."""
+    lines = [
+        f"{'site':24} {'state':9} {'crawled':>8} {'queued':>8} "
+        f"{'flight':>6} {'errors':>6} {'pages/min':>9}"
+    ]
+    for row in rows:
+        lines.append(
+            f"{row['site'][:24]:24} {row['state']:9} {row['crawled']:8} "
+            f"{row['queued']:8} {row['in_flight']:6} {row['errors']:6} "
+            f"{row['pages_per_minute']:9.1f}"
+        )
+    crawled = sum(row['crawled'] for row in rows)
+    total = crawled / max([row['minutes'] for row in rows] or [1])
+    lines.append(
+        f"{'total':24} {'':9} {crawled:8} "
+        f"{sum(row['queued'] for row in rows):8} "
+        f"{sum(row['in_flight'] for row in rows):6} "
+        f"{sum(row['errors'] for row in rows):6} {total:9.1f}"
+    )
+    return '\n'.join(lines)
+
+
+class Orchestrator:
+    """
+    Crawl several sites at once with shared fetching and politeness.
+
+    Args:
+        crawlers (dict): The crawler of every site, by site name.
+        concurrency (int): The requests kept in flight over all sites.
+        per_site (int): The requests kept in flight for one site.
+        per_host (int): The simultaneous requests sent to one host.
+        delay (tuple): The range of seconds between two requests to one
+            host, see politeness.PolitenessScheduler.
+        status_interval (float): The seconds between two status tables,
+            or None for a table at the end only.
+    """
+
+    def __init__(
+        self, crawlers, concurrency=16, per_site=4, per_host=1,
+        delay=(3, 7), status_interval=60.0
+    ):
+        self.concurrency = concurrency
+        self.per_site = per_site
+        self.per_host = per_host
+        self.status_interval = status_interval
+        self.scheduler = politeness.PolitenessScheduler(delay)
+        self.sites = []
+        self._first = 0
+        for name, crawler in crawlers.items():
+            crawler.share_politeness(self.scheduler)
+            self.sites.append(SiteCrawl(name, crawler))
+
+    def status(self):
+        """Return the status of every site, see SiteCrawl.status."""
+        return [site.status() for site in self.sites]
+
+    def start_crawling(self, max_pages=None, dynamic_pages=False):
+        """
+        Crawl all sites until their queues are empty.
+
+        Args:
+            max_pages (int): The maximum number of pages per site.
+            dynamic_pages (bool): Render the pages with a browser.
+        """
+        for site in self.sites:
+            try:
+                site.crawler.ready_to_crawl()
+            except ValueError as e:
+                site.fail(e)
+
+        try:
+            asyncio.run(self.crawl(max_pages, dynamic_pages))
+        finally:
+            for site in self.sites:
+                site.crawler.save_state()
+                site.finish()
+
+        for site in self.sites:
+            print(f'== {site.name}')
+            site.crawler.report_stats()
+        print(format_status(self.status()))
+        print(
+            f"Politeness: {self.scheduler.stats()['hosts']} hosts shared "
+            f"by {len(self.sites)} sites"
+        )
+
+    def _fill_slots(self, engine, pending, max_pages, dynamic_pages):
+        """Start requests, one site after the other, up to the caps."""
+        started = True
+        while started and len(pending) < self.concurrency:
+            started = False
+            # Every round starts with another site
+            self._first = (self._first + 1) % len(self.sites)
+            for site in self.sites[self._first:] + self.sites[:self._first]:
+                if len(pending) >= self.concurrency:
+                    break
+                if not site.can_start(max_pages, self.per_site):
+                    continue
+                url, depth = site.crawler.next_url()
+                task = asyncio.create_task(engine.fetch(
+                    url, site.crawler, dynamic_pages,
+                    robots_cache=site.crawler.robots
+                ))
+                pending[task] = (site, depth)
+                site.in_flight += 1
+                started = True
+
+    def _process(self, site, url, html, error, depth, max_pages=None):
+        """Store a fetched page in its site, as crawl_concurrently does."""
+        crawler = site.crawler
+        try:
+            if error is None:
+                if html is not None:
+                    try:
+                        crawler.process_page(url, html, site.checker, depth)
+                    except CRAWL_ERRORS as e:
+                        crawler.record_error(url, e, depth)
+            elif isinstance(error, CRAWL_ERRORS):
+                crawler.record_error(url, error, depth)
+            else:
+                raise error
+            crawler.finish_page(url)
+            if site.state == 'crawling' and site.in_flight == 0 and not (
+                crawler.continue_crawling(
+                    max_pages, crawler.page_count, crawler.to_crawl
+                )
+            ):
+                site.finish()
+        except Exception as e:  # pylint: disable=broad-except
+            # A failing site must not stop the others
+            site.fail(e)
+
+    async def crawl(self, max_pages=None, dynamic_pages=False):
+        """
+        Keep the requests of all sites in flight until they are done.
+
+        Args:
+            max_pages (int): The maximum number of pages per site.
+            dynamic_pages (bool): Render the pages with a browser.
+        """
+        engine = async_fetch.FetchEngine(
+            fetch_site_page,
+            concurrency=self.concurrency,
+            per_host=self.per_host,
+            scheduler=self.scheduler
+        )
+        pending = {}
+        last_status = time.monotonic()
+
+        try:
+            while True:
+                self._fill_slots(engine, pending, max_pages, dynamic_pages)
+                if not pending:
+                    break
+
+                done, _ = await asyncio.wait(
+                    pending, timeout=self.status_interval,
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    site, depth = pending.pop(task)
+                    site.in_flight -= 1
+                    url, html, error = task.result()
+                    self._process(site, url, html, error, depth, max_pages)
+
+                if self.status_interval is not None and (
+                    time.monotonic() - last_status >= self.status_interval
+                ):
+                    last_status = time.monotonic()
+                    print(format_status(self.status()))
+        finally:
+            for task in pending:
+                task.cancel()
+            engine.close()
+
+        return None
@@ -0,0 +1,289 @@
+"""
+This module contains the stores the crawled pages are written to.
+
+Besides one JSON file per page, pages can be appended to rolling,
+gzip-compressed JSONL segments. Every record is its own gzip member,
+so a record can be read on its own from its offset and length, which
+are kept in an index file next to the segments. A segment as a whole
+is a regular .jsonl.gz file.
+
+Author: Bruno Brocai
+"""
+
+import datetime
+import gzip
+import json
+import os
+from . import url_classifier
+from . import write_data
+
+
+SEGMENT_PREFIX = 'segment-'
+SEGMENT_SUFFIX = '.jsonl.gz'
+INDEX_FILE = 'segments.idx'
+
+
+def segment_name(number):
+    return f'{SEGMENT_PREFIX}{number:05d}{SEGMENT_SUFFIX}'
+
+
+def is_segment(filename):
+    return filename.startswith(SEGMENT_PREFIX) and filename.endswith(SEGMENT_SUFFIX)
+
+
+def make_record(url, html):
+    """Return the dictionary stored for a page, the same as in a JSON file."""
+    return {
+        'url': url,
+        'time_crawled': str(datetime.datetime.now().isoformat()),
+        'html_content': html
+    }
+
+
+class SegmentWriter:
+    """
+    Append pages to rolling gzip JSONL segments in a folder.
+
+    Attributes:
+        folder (str): The folder holding the segments and the index.
+        segment_size (int): The size in bytes after which a new segment
+            is started.
+    """
+
+    def __init__(self, folder, segment_size=64 * 2**20):
+        self.folder = folder
+        self.segment_size = segment_size
+        self.index_path = os.path.join(folder, INDEX_FILE)
+
+        self._repair_index()
+        self.number, self._file = self._open_last_segment()
+        self._index = open(self.index_path, 'a', encoding='utf-8')
+
+    def _repair_index(self):
+        """
+        Cut off a line of the index that was only partly written before a
+        crash, so the next entry starts on a line of its own.
+        """
+        if not os.path.exists(self.index_path):
+            return
+        with open(self.index_path, 'r+b') as file:
+            size = file.seek(0, os.SEEK_END)
+            end = size
+            while end > 0:
+                start = max(0, end - 65536)
+                file.seek(start)
+                block = file.read(end - start)
+                newline = block.rfind(b'\n')
+                if newline >= 0:
+                    end = start + newline + 1
+                    break
+                end = start
+            if end < size:
+                file.truncate(end)
+
+    def _last_index_entry(self):
+        """Read the last line of the index without reading the whole file."""
+        if not os.path.exists(self.index_path):
+            return None
+        with open(self.index_path, 'rb') as file:
+            file.seek(0, os.SEEK_END)
+            file.seek(max(0, file.tell() - 65536))
+            data = file.read()
+        # Only lines ending with a newline were written completely
+        lines = data.split(b'\n')[:-1]
+        for line in reversed(lines):
+            fields = line.decode('utf-8').split('\t')
+            if len(fields) == 4:
+                return fields
+        return None
+
+    def _open_last_segment(self):
+        segments = sorted(f for f in os.listdir(self.folder) if is_segment(f))
+        if not segments:
+            return 0, open(os.path.join(self.folder, segment_name(0)), 'ab')
+
+        number = int(segments[-1][len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)])
+        path = os.path.join(self.folder, segments[-1])
+
+        # Cut off a record that was only partly written before a crash
+        entry = self._last_index_entry()
+        if entry is not None and entry[1] == segments[-1]:
+            end = int(entry[2]) + int(entry[3])
+        elif entry is None or entry[1] < segments[-1]:
+            end = 0
+        else:
+            end = os.path.getsize(path)
+        if os.path.getsize(path) > end:
+            with open(path, 'r+b') as file:
+                file.truncate(end)
+
+        return number, open(path, 'ab')
+
+    def write(self, url, html):
+        """
+        Append a page to the current segment.
+
+        Returns:
+            dict: The segment, offset and length of the record.
+        """
+        if 0 < self.segment_size <= self._file.tell():
+            self._file.close()
+            self.number += 1
+            self._file = open(
+                os.path.join(self.folder, segment_name(self.number)), 'ab'
+            )
+
+        line = json.dumps(make_record(url, html)) + '\n'
+        member = gzip.compress(line.encode('utf-8'))
+        offset = self._file.tell()
+        self._file.write(member)
+        self._file.flush()
+
+        location = {
+            'segment': segment_name(self.number),
+            'offset': offset,
+            'length': len(member),
+        }
+        self._index.write(
+            f"{url}\t{location['segment']}\t{offset}\t{len(member)}\n"
+        )
+        self._index.flush()
+        return location
+
+    def close(self):
+        self._file.close()
+        self._index.close()
+
+
+class JsonFilePageStore:
+    """Write every page to its own JSON file (the original layout)."""
+
+    def __init__(self, goal_directory):
+        self.folders = {
+            url_classifier.ARTICLE: goal_directory.article,
+            url_classifier.NOT_ARTICLE: goal_directory.not_article,
+        }
+
+    def write(self, kind, url, html, replace=False):
+        """
+        Store a page.
+
+        Args:
+            kind (str): ARTICLE or NOT_ARTICLE.
+            url (str): The URL of the page.
+            html (str): The HTML content of the page.
+            replace (bool): Whether a stored version of the page is
+                replaced. Otherwise storing a page twice is an error.
+
+        Returns:
+            dict: Where the page was stored.
+        """
+        path = write_data.write_html_to_json(
+            self.folders[kind], url, html, overwrite=replace
+        )
+        return {'file': path}
+
+    def close(self):
+        pass
+
+
+class SegmentPageStore(JsonFilePageStore):
+    """Append pages to gzip JSONL segments, one set per page class."""
+
+    def __init__(self, goal_directory, segment_size=64 * 2**20):
+        super().__init__(goal_directory)
+        self.writers = {
+            kind: SegmentWriter(folder, segment_size)
+            for kind, folder in self.folders.items()
+        }
+
+    def write(self, kind, url, html, replace=False):
+        # A new version of a page is appended, the old one stays
+        # in its segment
+        return self.writers[kind].write(url, html)
+
+    def close(self):
+        for writer in self.writers.values():
+            writer.close()
+
+
+def make_page_store(goal_directory, storage='json', segment_size=64 * 2**20):
+    """Create the page store chosen in the crawl settings."""
+    if storage == 'jsonl':
+        return SegmentPageStore(goal_directory, segment_size)
+    if storage == 'json':
+        return JsonFilePageStore(goal_directory)
+    raise ValueError(f"Unknown storage '{storage}', choose json or jsonl.")
+
+
+def read_json(path):
+    """Read a page stored as a JSON file."""
+    with open(path, 'r', encoding='utf-8') as file:
+        return json.load(file)
+
+
+def read_record(folder, segment, offset, length):
+    """Read a single record from a segment by its offset and length."""
+    with open(os.path.join(folder, segment), 'rb') as file:
+        file.seek(offset)
+        member = file.read(length)
+    return json.loads(gzip.decompress(member))
+
+
+def iter_index(folder):
+    """
+    Iterate over the index of the segments in a folder.
+
+    Yields:
+        tuple: The URL, segment, offset and length of each record.
+    """
+    path = os.path.join(folder, INDEX_FILE)
+    if not os.path.exists(path):
+        return
+    with open(path, 'r', encoding='utf-8') as file:
+        for line in file:
+            fields = line.rstrip('\n').split('\t')
+            if len(fields) == 4:
+                yield fields[0], fields[1], int(fields[2]), int(fields[3])
+
+
+def iter_segment(path):
+    """
+    Iterate over the records of one segment file.
+
+    Yields:
+        dict: The stored record of every complete page in the segment.
+    """
+    with gzip.open(path, 'rt', encoding='utf-8') as file:
+        try:
+            for line in file:
+                yield json.loads(line)
+        except (EOFError, json.JSONDecodeError):
+            # Partly written record at the end of the segment
+            pass
+
+
+def iter_documents(folder):
+    """
+    Iterate over all pages stored in a folder, as JSON files or segments.
+
+    Yields:
+        dict: The stored record with 'url', 'time_crawled' and
+            'html_content'.
+    """
+    for filename in sorted(os.listdir(folder)):
+        path = os.path.join(folder, filename)
+        if filename.endswith('.json'):
+            with open(path, 'r', encoding='utf-8') as file:
+                yield json.load(file)
+        elif is_segment(filename):
+            yield from iter_segment(path)
+
+
+def count_documents(folder):
+    """Count the pages in a folder without reading their contents."""
+    count = 0
+    for filename in os.listdir(folder):
+        if filename.endswith('.json'):
+            count += 1
+    return count + sum(1 for _ in iter_index(folder))
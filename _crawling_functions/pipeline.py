@@ -0,0 +1,214 @@
+"""
+This module contains the parse stage of the pipelined crawler. The
+fetchers only download the raw bytes of a page. A pool of worker
+processes decodes them, runs the relevance check, computes the duplicate
+signature and extracts the links, so this CPU work runs on several cores
+and does not hold up the fetching. The crawl state stays in the main
+process, which applies the results one page after the other (see
+new_crawlers.ClassicCrawler.crawl_pipelined).
+
+Author: Bruno Brocai
+"""
+
+import asyncio
+import concurrent.futures
+import multiprocessing
+import time
+from collections import namedtuple
+from requests.compat import chardet
+from . import dedup
+from . import document
+
+
+RawPage = namedtuple('RawPage', ['content', 'encoding'])
+RawPage.__doc__ = """A fetched page before decoding.
+
+Attributes:
+    content (bytes): The body of the response. Pages rendered by a
+        browser are already decoded (str).
+    encoding (str): The encoding given by the response headers, or None.
+"""
+
+PageAnalysis = namedtuple('PageAnalysis', [
+    'html', 'relevant', 'links', 'base_href', 'canonical_href', 'signature',
+    'check_seconds', 'parse_seconds'
+], defaults=(0.0, 0.0))
+PageAnalysis.__doc__ = """The result of the parse stage for one page.
+
+Attributes:
+    html (str): The decoded page.
+    relevant (bool): The decision of the checker.
+    links (set): The hrefs of the links (empty for irrelevant pages).
+    base_href (str): The href of the <base> tag, or None.
+    canonical_href (str): The href of <link rel="canonical">, or None.
+    signature (dedup.Signature): The duplicate signature, or None if it
+        was not requested or the text is too short.
+    check_seconds (float): The time the checker took.
+    parse_seconds (float): The time to compute the links and signature.
+"""
+
+
+def decode_html(content, encoding=None):
+    """
+    Decode the body of a response like requests' Response.text.
+
+    Args:
+        content (bytes): The body of the response.
+        encoding (str): The encoding from the headers. If None, the
+            encoding is guessed from the content.
+
+    Returns:
+        str: The decoded page.
+    """
+    if isinstance(content, str):
+        return content
+    if not content:
+        return ''
+    if encoding is None:
+        encoding = chardet.detect(content)['encoding'] if chardet else 'utf-8'
+    try:
+        return str(content, encoding, errors='replace')
+    except (LookupError, TypeError):
+        return str(content, errors='replace')
+
+
+def analyze_page(html, url, checker, skip_nofollow=False, fingerprint=None):
+    """
+    Check a page and collect what the crawler needs to store it.
+
+    The page is parsed once for the checker, the link extraction and
+    the text of the signature. Links and signature are only computed
+    for relevant pages.
+
+    Args:
+        html (str): The HTML content of the page.
+        url (str): The URL of the page.
+        checker (callable): Function deciding if the page is relevant,
+            see document.call_checker.
+        skip_nofollow (bool): Leave out links with rel="nofollow".
+        fingerprint (bool): None to skip the duplicate signature, else
+            whether it includes the SimHash for near duplicates.
+
+    Returns:
+        PageAnalysis: The result for the page.
+    """
+    started = time.perf_counter()
+    page = document.Document(html, url, skip_nofollow=skip_nofollow)
+    relevant = document.call_checker(checker, page)
+    checked = time.perf_counter()
+    if not relevant:
+        return PageAnalysis(
+            html, False, set(), None, None, None, checked - started
+        )
+
+    signature = None
+    if fingerprint is not None:
+        signature = dedup.Signature.of_document(page, fingerprint)
+    links, base_href, canonical_href = page.link_info()
+    return PageAnalysis(
+        html, True, links, base_href, canonical_href, signature,
+        checked - started, time.perf_counter() - checked
+    )
+
+
+# The checker of a worker process, set once when the worker starts
+_worker = {}
+
+
+def _init_worker(checker, skip_nofollow):
+    _worker['checker'] = checker
+    _worker['skip_nofollow'] = skip_nofollow
+
+
+def _analyze_raw_page(url, page, fingerprint):
+    return analyze_page(
+        decode_html(*page), url, _worker['checker'],
+        _worker['skip_nofollow'], fingerprint
+    )
+
+
+def start_method():
+    """Return the safest way to start workers on this platform."""
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        return 'forkserver'
+    return 'spawn'
+
+
+class ParsePool:
+    """
+    Analyze raw pages in a pool of worker processes.
+
+    The checker is sent to every worker once, so it has to be picklable:
+    a function defined at module level or a checker_spec.CompiledChecker.
+
+    The crawling process already runs threads when the pool starts (the
+    metrics server, the browser pool, the fetchers of other sites), and
+    forking it could copy a lock one of them holds into a worker. The
+    workers are therefore started from a fork server, or spawned where
+    there is none, never forked from the crawling process.
+    """
+
+    def __init__(self, checker, workers=2, skip_nofollow=False):
+        self.workers = workers
+        self._executor = concurrent.futures.ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context(start_method()),
+            initializer=_init_worker,
+            initargs=(checker, skip_nofollow)
+        )
+        # Start the workers now, so a checker that cannot be sent to
+        # them fails before the first request
+        self._executor.submit(int).result()
+
+    async def analyze(self, url, page, fingerprint=None):
+        """
+        Analyze a page in a worker, see analyze_page.
+
+        Args:
+            url (str): The URL of the page.
+            page (RawPage): The fetched page.
+            fingerprint (bool): See analyze_page.
+
+        Returns:
+            PageAnalysis: The result for the page.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, _analyze_raw_page, url, page, fingerprint
+        )
+
+    def close(self):
+        """Stop the workers, dropping the pages not yet analyzed."""
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+
+class StageDepths:
+    """
+    Sample how many pages are in each stage of the pipeline.
+
+    A stage whose depth stays at its limit is the bottleneck: a full
+    fetch stage asks for more requests in flight, a full parse stage for
+    more workers.
+    """
+
+    def __init__(self, stages):
+        self._samples = 0
+        self._totals = dict.fromkeys(stages, 0)
+        self._maxima = dict.fromkeys(stages, 0)
+
+    def sample(self, **depths):
+        """Record the current depth of each stage."""
+        self._samples += 1
+        for stage, depth in depths.items():
+            self._totals[stage] += depth
+            self._maxima[stage] = max(self._maxima[stage], depth)
+
+    def stats(self):
+        """Return the mean and maximum depth of each stage."""
+        return {
+            stage: {
+                'mean': total / max(self._samples, 1),
+                'max': self._maxima[stage]
+            }
+            for stage, total in self._totals.items()
+        }
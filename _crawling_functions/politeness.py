@@ -0,0 +1,237 @@
+"""
+This module contains the per-host politeness scheduler. Every host gets
+its own request rate, so a crawl over many hosts is not held up by one
+global pause. The rate starts at the configured delay or the
+Crawl-delay/Request-rate of the host's robots.txt, whichever is slower,
+and adapts to the host: it slowly increases while the host answers
+quickly (additive increase) and halves when the host slows down, fails
+or answers 429/503 (multiplicative decrease). A Retry-After header
+pauses the host for the given time.
+
+Author: Bruno Brocai
+"""
+
+import email.utils
+import random
+import time
+import requests
+
+
+# Answers that ask the crawler to come back later
+THROTTLE_STATUS = (429, 503)
+
+
+def status_of(error):
+    """Return the HTTP status of a failed request, or None."""
+    response = getattr(error, 'response', None)
+    return getattr(response, 'status_code', None)
+
+
+def is_throttled(error):
+    """Tell whether a request failed because the host asked to wait."""
+    return status_of(error) in THROTTLE_STATUS
+
+
+def retry_after(error):
+    """
+    Read the Retry-After header of a failed request.
+
+    Returns:
+        float: The seconds to wait, or None if the header is missing or
+            invalid.
+    """
+    response = getattr(error, 'response', None)
+    if response is None:
+        return None
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(date.timestamp() - time.time(), 0.0)
+
+
+class HostState:
+    """
+    The request rate of one host.
+
+    Attributes:
+        floor (float): The shortest interval allowed between two
+            requests, from the settings and robots.txt.
+        interval (float): The current interval between two requests.
+        next_slot (float): The earliest time of the next request
+            (time.monotonic), the virtual clock of the token bucket.
+        blocked_until (float): The end of a Retry-After pause.
+        latency (float): The smoothed response time, or None.
+        samples (int): The number of response times seen.
+    """
+
+    __slots__ = (
+        'floor', 'interval', 'next_slot', 'blocked_until', 'latency',
+        'samples'
+    )
+
+    def __init__(self, floor):
+        self.floor = floor
+        self.interval = floor
+        self.next_slot = 0.0
+        self.blocked_until = 0.0
+        self.latency = None
+        self.samples = 0
+
+
+class PolitenessScheduler:
+    """
+    Decide when the next request to a host may be sent.
+
+    Each host has a token bucket that is refilled at the host's current
+    rate. reserve() takes a token and returns how long to wait for it,
+    record() adapts the rate to the outcome of the request.
+
+    Args:
+        delay (tuple): The range of seconds between two requests to one
+            host. The lower bound is the shortest interval, the spread of
+            the range is added as random jitter.
+        burst (int): The number of requests a host may get at once after
+            being idle.
+        max_interval (float): The longest interval after backing off.
+        increase (float): The requests per second added to the rate of a
+            host after every fast answer.
+        slow_factor (float): A response this many times slower than the
+            host's average (and slower than one second) counts as a sign
+            of overload.
+
+    Attributes:
+        throttled (int): The 429/503 answers received.
+        slowdowns (int): The times a host's rate was decreased.
+    """
+
+    def __init__(
+        self, delay=(3, 7), burst=1, max_interval=300.0, increase=0.1,
+        slow_factor=3.0
+    ):
+        self.min_delay = max(delay[0], 0.0)
+        self.spread = max(delay[1] - delay[0], 0.0)
+        self.burst = burst
+        self.max_interval = max_interval
+        self.increase = increase
+        self.slow_factor = slow_factor
+        self.throttled = 0
+        self.slowdowns = 0
+        self._hosts = {}
+
+    def _state(self, host):
+        state = self._hosts.get(host)
+        if state is None:
+            state = self._hosts[host] = HostState(self.min_delay)
+        return state
+
+    def set_robots(self, host, robots, user_agent='*'):
+        """
+        Slow a host down to the Crawl-delay or Request-rate of its
+        robots.txt.
+
+        Args:
+            host (str): The host, see async_fetch.host_of.
+            robots (urllib.robotparser.RobotFileParser): The parsed
+                robots.txt of the host.
+            user_agent (str): The user agent the rules are looked up for.
+        """
+        floor = self.min_delay
+        crawl_delay = robots.crawl_delay(user_agent)
+        if crawl_delay:
+            floor = max(floor, float(crawl_delay))
+        rate = robots.request_rate(user_agent)
+        if rate and rate.requests:
+            floor = max(floor, rate.seconds / rate.requests)
+        state = self._state(host)
+        state.floor = floor
+        state.interval = max(state.interval, floor)
+
+    def reserve(self, host):
+        """
+        Take the next request slot of a host.
+
+        Returns:
+            float: The seconds to wait before sending the request.
+        """
+        state = self._state(host)
+        now = time.monotonic()
+        start = max(
+            now, state.blocked_until,
+            state.next_slot - (self.burst - 1) * state.interval
+        )
+        state.next_slot = max(state.next_slot, start) + state.interval + (
+            random.uniform(0, self.spread)
+        )
+        return start - now
+
+    def record(self, host, elapsed, error=None):
+        """
+        Adapt the rate of a host to the outcome of a request.
+
+        Args:
+            host (str): The host of the request.
+            elapsed (float): The seconds the request took.
+            error (Exception): The exception raised by the request, or
+                None if it succeeded.
+        """
+        state = self._state(host)
+        status = status_of(error)
+
+        overloaded = status in THROTTLE_STATUS or (
+            status is not None and status >= 500
+        ) or isinstance(
+            error, (requests.exceptions.ConnectionError,
+                    requests.exceptions.Timeout)
+        )
+        if status in THROTTLE_STATUS:
+            self.throttled += 1
+            pause = retry_after(error)
+            if pause is not None:
+                state.blocked_until = max(
+                    state.blocked_until,
+                    time.monotonic() + min(pause, self.max_interval)
+                )
+        elif error is None and state.samples >= 5 and elapsed > max(
+            1.0, self.slow_factor * state.latency
+        ):
+            overloaded = True
+
+        if error is None:
+            state.latency = elapsed if state.latency is None else (
+                0.8 * state.latency + 0.2 * elapsed
+            )
+            state.samples += 1
+
+        if overloaded:
+            self.slowdowns += 1
+            state.interval = min(
+                max(state.interval * 2, state.floor, 1.0), self.max_interval
+            )
+        elif error is None and state.interval > state.floor:
+            rate = 1 / state.interval + self.increase
+            state.interval = max(1 / rate, state.floor)
+
+    def stats(self):
+        """
+        Report how the hosts were throttled.
+
+        Returns:
+            dict: The number of hosts, of 429/503 answers, of rate
+                decreases and of hosts slower than their floor.
+        """
+        return {
+            'hosts': len(self._hosts),
+            'throttled': self.throttled,
+            'slowdowns': self.slowdowns,
+            'backed_off': sum(
+                1 for state in self._hosts.values()
+                if state.interval > state.floor
+            ),
+        }
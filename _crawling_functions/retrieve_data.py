@@ -1,12 +1,12 @@
 import json
 import os
 import csv
-import concurrent.futures
-import requests
 from bs4 import BeautifulSoup
-from tqdm import tqdm
-from playwright.sync_api import sync_playwright
-from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
+from . import browser_pool
+from . import corpus_extract
+from . import http_client
+from . import manifest
+from . import page_store
 
 
 def urls_from_files(directory):
@@ -148,44 +148,59 @@ def get_html_from_url(url):
     """
     Retrieve the HTML content from a given URL.
 
-    The function sends a GET request to the provided URL and returns the text
-    content of the response. If the request fails for any reason, an error
-    message is printed and None is returned.
+    The function sends a GET request through the shared pooled session
+    and returns the text content of the response. If the request fails,
+    an HTTPError is raised.
 
     Args:
         url (str): The URL to retrieve the HTML content from.
 
     Returns:
-        str: The text content of the response, or None if the request fails.
+        str: The text content of the response.
     """
 
-    response = requests.get(
-        url,
-        timeout=20
-    )
+    response = http_client.get_client().get(url)
     response.raise_for_status()  # Raise an HTTPError for bad responses
     return response.text
 
 
+def get_response_from_url(url, headers=None):
+    """
+    Send a GET request with additional headers and return the response.
+
+    Unlike get_html_from_url, a 304 Not Modified answer to a conditional
+    request is returned like any other successful response.
+
+    Args:
+        url (str): The URL to request.
+        headers (dict): Headers sent in addition to the default ones,
+            e.g. If-None-Match.
+
+    Returns:
+        requests.Response: The response.
+    """
+
+    response = http_client.get_client().get(url, headers=headers)
+    response.raise_for_status()  # Raise an HTTPError for bad responses
+    return response
+
+
 def get_content_from_url(url):
     """
-    Retrieve the HTML content from a given URL.
+    Retrieve the binary content from a given URL.
 
-    The function sends a GET request to the provided URL and returns the text
-    content of the response. If the request fails for any reason, an error
-    message is printed and None is returned.
+    The function sends a GET request through the shared pooled session
+    and returns the binary content of the response. If the request fails,
+    an HTTPError is raised.
 
     Args:
-        url (str): The URL to retrieve the HTML content from.
+        url (str): The URL to retrieve the content from.
 
     Returns:
-        str: The text content of the response, or None if the request fails.
+        bytes: The binary content of the response.
     """
 
-    response = requests.get(
-        url,
-        timeout=20
-    )
+    response = http_client.get_client().get(url)
     response.raise_for_status()  # Raise an HTTPError for bad responses
     return response.content
 
@@ -206,19 +221,57 @@ def get_links_from_html(html):
         set: A set of unique links found in the HTML content, or an empty set
              if an error occurs.
     """
-    try:
-        soup = BeautifulSoup(html, 'lxml')
+    return get_link_info_from_html(html)[0]
 
-        links = set()
-        for a_tag in soup.find_all(['a', 'link'], href=True):
-            absolute_url = a_tag['href']
-            links.add(absolute_url)
 
-        return links
+def get_link_info_from_html(html, skip_nofollow=False):
+    """
+    Extract the links of a page together with the URLs needed to resolve them.
+
+    Args:
+        html (str): The HTML content to extract links from.
+        skip_nofollow (bool): Leave out links with rel="nofollow".
+
+    Returns:
+        tuple: The set of unique links, the href of the <base> tag and the
+            href of the <link rel="canonical"> tag (None if missing). If an
+            error occurs, an empty set and two Nones are returned.
+    """
+    try:
+        return get_link_info_from_soup(
+            BeautifulSoup(html, 'lxml'), skip_nofollow
+        )
 
     except Exception as e:
         print(f"Error: {e}")
-        return set()
+        return set(), None, None
+
+
+def get_link_info_from_soup(soup, skip_nofollow=False):
+    """
+    Extract the links of an already parsed page, see get_link_info_from_html.
+
+    Args:
+        soup (BeautifulSoup): The parsed page.
+        skip_nofollow (bool): Leave out links with rel="nofollow".
+
+    Returns:
+        tuple: The set of unique links, the href of the <base> tag and the
+            href of the <link rel="canonical"> tag (None if missing).
+    """
+    links = set()
+    canonical = None
+    for a_tag in soup.find_all(['a', 'link'], href=True):
+        absolute_url = a_tag['href']
+        rel = [token.lower() for token in a_tag.get('rel', ())]
+        if canonical is None and a_tag.name == 'link' and 'canonical' in rel:
+            canonical = absolute_url
+        if skip_nofollow and 'nofollow' in rel:
+            continue
+        links.add(absolute_url)
+
+    base = soup.find('base', href=True)
+    return links, base['href'] if base else None, canonical
 
 
 def get_links_from_netdoktor_html(html):
@@ -251,25 +304,10 @@ def links_from_corpus(corpus_dir):
         set: A set of links extracted from all HTML files found
             in the directory, or an empty set if no HTML files are found.
     """
-    html_files = [
-        os.path.join(corpus_dir, f) for f in os.listdir(corpus_dir)
-        if f.endswith('.json')
-    ]
-
-    links = set()
-
-    with concurrent.futures.ThreadPoolExecutor() as executor:
-        future_to_file = {
-            executor.submit(get_links_from_file, f): f for f in html_files
-        }
-        for future in tqdm(
-            concurrent.futures.as_completed(future_to_file),
-            total=len(future_to_file),
-            desc="Processing HTML files"
-        ):
-            links.update(future.result())
-
-    return links
+    return corpus_extract.extract_folder(
+        corpus_dir, '.json', corpus_extract.LINKS,
+        desc="Processing HTML files"
+    )
 
 
 def imgs_from_corpus(corpus_dir):
@@ -290,25 +328,10 @@ def imgs_from_corpus(corpus_dir):
         set: A set of images extracted from all HTML files found
             in the directory, or an empty set if no HTML files are found.
     """
-    html_files = [
-        os.path.join(corpus_dir, f) for f in os.listdir(corpus_dir)
-        if f.endswith('.html')
-    ]
-
-    imgs = set()
-
-    with concurrent.futures.ThreadPoolExecutor() as executor:
-        future_to_file = {
-            executor.submit(get_imgs_from_file, f): f for f in html_files
-        }
-        for future in tqdm(
-            concurrent.futures.as_completed(future_to_file),
-            total=len(future_to_file),
-            desc="Processing HTML files"
-        ):
-            imgs.update(future.result())
-
-    return imgs
+    return corpus_extract.extract_folder(
+        corpus_dir, '.html', corpus_extract.IMAGES,
+        desc="Processing HTML files"
+    )
 
 
 def imgs_from_jsoncorpus(corpus_dir):
@@ -329,25 +352,10 @@ def imgs_from_jsoncorpus(corpus_dir):
         set: A set of images extracted from all HTML files found
             in the directory, or an empty set if no HTML files are found.
     """
-    html_files = [
-        os.path.join(corpus_dir, f) for f in os.listdir(corpus_dir)
-        if f.endswith('.json')
-    ]
-
-    imgs = set()
-
-    with concurrent.futures.ThreadPoolExecutor(8) as executor:
-        future_to_file = {
-            executor.submit(get_imgs_from_json, f): f for f in html_files
-        }
-        for future in tqdm(
-            concurrent.futures.as_completed(future_to_file),
-            total=len(future_to_file),
-            desc="Processing json files"
-        ):
-            imgs.update(future.result())
-
-    return imgs
+    return corpus_extract.extract_folder(
+        corpus_dir, '.json', corpus_extract.IMAGES,
+        desc="Processing json files"
+    )
 
 
 def list_urls_from_files(directory):
@@ -364,6 +372,14 @@ def list_urls_from_files(directory):
 
 
 def urls_from_jsons(directory):
+    # The manifest of the site lists the pages without opening them
+    site = manifest.open_manifest(os.path.dirname(os.path.abspath(directory)))
+    if site is not None:
+        try:
+            return site.urls_in(os.path.abspath(directory))
+        finally:
+            site.close()
+
     url_set = set()
     for filename in os.listdir(directory):
         if filename.endswith('.json'):
@@ -373,6 +389,9 @@ def urls_from_jsons(directory):
             ) as file:
                 data = json.load(file)
                 url_set.add(data['url'])
+
+    # Pages stored in segments are listed in their index
+    url_set.update(url for url, *_ in page_store.iter_index(directory))
     return url_set
 
 
@@ -386,30 +405,29 @@ def read_index_csv(file_path):
     return crawled
 
 
-def get_content_from_url(url, selector='body', timeout=300):
-    try:
-        with sync_playwright() as p:
-            browser = p.chromium.launch(headless=True)
-            page = browser.new_page()
-
-            # Go to the URL
-            page.goto(url)
-
-            # Wait for the content to be rendered
-            page.wait_for_selector(selector, timeout=timeout)
+def get_rendered_html_from_url(url, selector='body', timeout=300):
+    """
+    Render a page in the shared browser pool and return its HTML.
 
-            # Extract the HTML content
-            html_content = page.content()
+    Unlike get_html_from_url, the page's javascript is executed before
+    the content is read. The browser stays open between calls.
 
-            # Close the browser
-            browser.close()
+    Args:
+        url (str): The URL to render.
+        selector (str): CSS selector to wait for before reading the page.
+        timeout (int): Milliseconds to wait for the selector.
 
-            print('heheh')
+    Returns:
+        str: The rendered HTML content, or None if rendering fails.
+    """
+    from playwright.async_api import Error as PlaywrightError  # pylint: disable=import-outside-toplevel
+    from playwright.async_api import TimeoutError as PlaywrightTimeoutError  # pylint: disable=import-outside-toplevel
 
-            return html_content
+    try:
+        return browser_pool.get_pool().render(url, selector, timeout)
     except PlaywrightTimeoutError:
         print(f"Timeout waiting for {selector} on {url}")
         return None
-    except Exception as e:
+    except PlaywrightError as e:
         print(f"An error occurred: {e}")
         return None
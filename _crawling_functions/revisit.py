@@ -0,0 +1,189 @@
+"""
+This module contains the revisit schedule of the pages that are crawled
+again to find new links, e.g. the board pages of news sites. For every
+page the validators of its last response (ETag, Last-Modified and a
+hash of its content) are kept, so it can be requested conditionally,
+and the interval until its next visit adapts to how often it changes.
+
+Author: Bruno Brocai
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+
+HOUR = 3600
+DAY = 24 * HOUR
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    url TEXT PRIMARY KEY,
+    etag TEXT,
+    last_modified TEXT,
+    content_hash TEXT,
+    interval REAL NOT NULL,
+    next_visit REAL NOT NULL,
+    fetches INTEGER NOT NULL DEFAULT 0,
+    changes INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS pages_due ON pages (next_visit);
+"""
+
+
+class RevisitStore:
+    """
+    The validators and revisit times of the pages of a site.
+
+    A page that changed since its last visit is visited again after
+    half the interval, a page that did not change after one and a half
+    times the interval, within min_interval and max_interval.
+
+    The store is used from the threads fetching the pages, so all
+    access goes through one lock.
+
+    Attributes:
+        path (str): The path of the database file.
+        min_interval (float): The shortest revisit interval in seconds.
+        max_interval (float): The longest revisit interval in seconds.
+        not_modified (int): The 304 responses received in this run.
+        unchanged (int): The full responses with unchanged content.
+        changed (int): The responses with new or changed content.
+    """
+
+    def __init__(self, path, min_interval=HOUR, max_interval=7 * DAY):
+        self.path = path
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.not_modified = 0
+        self.unchanged = 0
+        self.changed = 0
+
+        self._lock = threading.Lock()
+        self.created = not os.path.exists(path)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.executescript(SCHEMA)
+
+    def schedule(self, urls):
+        """
+        Add pages without validators that are due at once, e.g. the
+        board pages crawled before the schedule existed.
+
+        Returns:
+            int: The number of pages added.
+        """
+        with self._lock, self.conn:
+            return self.conn.executemany(
+                'INSERT OR IGNORE INTO pages (url, interval, next_visit) '
+                'VALUES (?, ?, 0)',
+                ((url, self.min_interval) for url in urls)
+            ).rowcount
+
+    def validators(self, url):
+        """
+        Return the headers for a conditional request of a page.
+
+        Returns:
+            dict: If-None-Match and If-Modified-Since, as far as known.
+        """
+        with self._lock:
+            row = self.conn.execute(
+                'SELECT etag, last_modified FROM pages WHERE url = ?', (url,)
+            ).fetchone()
+        headers = {}
+        if row is not None:
+            if row[0]:
+                headers['If-None-Match'] = row[0]
+            if row[1]:
+                headers['If-Modified-Since'] = row[1]
+        return headers
+
+    def record(self, url, status_code, headers, content):
+        """
+        Record the response to a (conditional) request of a page.
+
+        Args:
+            url (str): The URL of the page.
+            status_code (int): The status of the response.
+            headers (dict): The response headers.
+            content (bytes): The body of the response.
+
+        Returns:
+            bool: True if the page is new or its content changed.
+        """
+        now = time.time()
+        with self._lock, self.conn:
+            row = self.conn.execute(
+                'SELECT etag, last_modified, content_hash, interval '
+                'FROM pages WHERE url = ?', (url,)
+            ).fetchone()
+
+            if status_code == 304 and row is not None:
+                etag = headers.get('ETag') or row[0]
+                last_modified = headers.get('Last-Modified') or row[1]
+                content_hash = row[2]
+                changed = False
+                self.not_modified += 1
+            else:
+                etag = headers.get('ETag')
+                last_modified = headers.get('Last-Modified')
+                content_hash = hashlib.blake2b(
+                    content, digest_size=16
+                ).hexdigest()
+                changed = row is None or content_hash != row[2]
+                if changed:
+                    self.changed += 1
+                else:
+                    self.unchanged += 1
+
+            if row is None:
+                interval = self.min_interval
+            elif changed:
+                interval = max(self.min_interval, row[3] / 2)
+            else:
+                interval = min(self.max_interval, row[3] * 1.5)
+
+            self.conn.execute(
+                'INSERT INTO pages (url, etag, last_modified, content_hash, '
+                'interval, next_visit, fetches, changes) '
+                'VALUES (?, ?, ?, ?, ?, ?, 1, 1) '
+                'ON CONFLICT(url) DO UPDATE SET etag = excluded.etag, '
+                'last_modified = excluded.last_modified, '
+                'content_hash = excluded.content_hash, '
+                'interval = excluded.interval, '
+                'next_visit = excluded.next_visit, '
+                'fetches = fetches + 1, changes = changes + ?',
+                (url, etag, last_modified, content_hash,
+                 interval, now + interval, int(changed))
+            )
+        return changed
+
+    def due(self, limit=None, now=None):
+        """
+        Return the pages whose next visit is due, the most overdue first.
+
+        Args:
+            limit (int): The maximum number of pages, or None.
+            now (float): The reference time, the current time if None.
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            rows = self.conn.execute(
+                'SELECT url FROM pages WHERE next_visit <= ? '
+                'ORDER BY next_visit LIMIT ?',
+                (now, -1 if limit is None else limit)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def stats(self):
+        return {
+            'not_modified': self.not_modified,
+            'unchanged': self.unchanged,
+            'changed': self.changed,
+        }
+
+    def close(self):
+        self.conn.close()
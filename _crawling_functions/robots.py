@@ -0,0 +1,273 @@
+"""
+This module contains the robots.txt handling of the crawl. The
+robots.txt of a host is fetched through the pooled HTTP client when the
+first URL of the host is checked, and kept in an sqlite cache for a
+time to live, so the next crawls of the site do not fetch it again.
+URLs are checked in bulk, one parser lookup per host, before they are
+queued. In the event loop of the concurrent crawls, only the rules at
+hand are used then, and the URLs of new hosts are checked when they are
+fetched (see async_fetch.FetchEngine), which reads their robots.txt
+like a page, without blocking the loop.
+
+Author: Bruno Brocai
+"""
+
+import sqlite3
+import threading
+import time
+from urllib import robotparser
+from urllib.parse import urlsplit
+from . import http_client
+
+
+DAY = 24 * 3600
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS robots (
+    origin TEXT PRIMARY KEY,
+    status INTEGER NOT NULL,
+    body TEXT NOT NULL,
+    fetched REAL NOT NULL
+);
+"""
+
+
+def origin_of(url):
+    """
+    Return the scheme and host of a URL, which a robots.txt applies to.
+
+    Returns:
+        str: The origin, e.g. 'https://www.example.com', or None if the
+            URL is not an http(s) URL.
+    """
+    parts = urlsplit(url)
+    if parts.scheme not in ('http', 'https') or not parts.netloc:
+        return None
+    return f'{parts.scheme}://{parts.netloc.lower()}'
+
+
+class Disallowed(ValueError):
+    """A URL that robots.txt disallows, found when it was fetched."""
+
+
+def make_parser(status, body):
+    """
+    Build the parser of a fetched robots.txt.
+
+    Same status handling as RobotFileParser.read: 401 and 403 forbid
+    everything, other errors allow everything.
+    """
+    parser = robotparser.RobotFileParser()
+    if status in (401, 403):
+        parser.disallow_all = True
+    elif status >= 400:
+        parser.allow_all = True
+    else:
+        parser.parse(body.splitlines())
+    return parser
+
+
+class RobotsCache:
+    """
+    The robots.txt rules of all hosts of a crawl.
+
+    Args:
+        path (str): The path of the cache database, or None to keep the
+            rules in memory only.
+        user_agent (str): The user agent the rules are looked up for.
+        ttl (float): The seconds a cached robots.txt is used before it
+            is fetched again.
+        scheduler (politeness.PolitenessScheduler): If given, learns the
+            Crawl-delay and Request-rate of every host.
+
+    Attributes:
+        fetched (int): The robots.txt files fetched in this run.
+        cached (int): The robots.txt files read from the cache.
+        forbidden (int): The URLs found to be disallowed.
+    """
+
+    def __init__(self, path=None, user_agent='*', ttl=DAY, scheduler=None):
+        self.path = path
+        self.user_agent = user_agent
+        self.ttl = ttl
+        self.scheduler = scheduler
+        self.fetched = 0
+        self.cached = 0
+        self.forbidden = 0
+        self._parsers = {}
+        self._lock = threading.Lock()
+        self.conn = None
+        if path is not None:
+            self.conn = sqlite3.connect(path, check_same_thread=False)
+            self.conn.executescript(SCHEMA)
+
+    def _cached(self, origin):
+        """Read a fresh robots.txt from the cache, None if there is none."""
+        if self.conn is None:
+            return None
+        with self._lock:
+            row = self.conn.execute(
+                'SELECT status, body FROM robots '
+                'WHERE origin = ? AND fetched > ?',
+                (origin, time.time() - self.ttl)
+            ).fetchone()
+        if row is None:
+            return None
+        self.cached += 1
+        return make_parser(*row)
+
+    def fetch(self, origin):
+        """
+        Fetch the robots.txt of a host and cache it. Blocks until the
+        host answers, so the concurrent crawls call it in a thread.
+
+        Returns:
+            urllib.robotparser.RobotFileParser: The rules, to be passed
+                to install.
+        """
+        try:
+            response = http_client.get_client().get(
+                origin + '/robots.txt', timeout=10
+            )
+        except Exception as e:  # pylint: disable=broad-except
+            # Allow the host for this run and try again in the next one
+            print(f'Error reading robots.txt of {origin}: {e}')
+            parser = robotparser.RobotFileParser()
+            parser.allow_all = True
+            return parser
+
+        self.fetched += 1
+        print(f'Read robots.txt of {origin}')
+        body = response.text if response.status_code < 400 else ''
+        if self.conn is not None:
+            with self._lock, self.conn:
+                self.conn.execute(
+                    'INSERT OR REPLACE INTO robots VALUES (?, ?, ?, ?)',
+                    (origin, response.status_code, body, time.time())
+                )
+        return make_parser(response.status_code, body)
+
+    def install(self, origin, parser):
+        """
+        Use the rules of a host from now on, unless it already has some.
+
+        Returns:
+            urllib.robotparser.RobotFileParser: The rules of the host.
+        """
+        if origin in self._parsers:
+            return self._parsers[origin]
+        self._parsers[origin] = parser
+        if self.scheduler is not None:
+            self.scheduler.set_robots(
+                urlsplit(origin).netloc, parser, self.user_agent
+            )
+        return parser
+
+    def parser(self, origin, load=True):
+        """
+        Return the robots.txt rules of a host, loading them on first use.
+
+        Args:
+            origin (str): The scheme and host, see origin_of.
+            load (bool): Fetch a robots.txt that is not cached. If
+                False, None is returned for such a host.
+
+        Returns:
+            urllib.robotparser.RobotFileParser: The rules of the host.
+        """
+        parser = self._parsers.get(origin)
+        if parser is not None:
+            return parser
+        parser = self._cached(origin)
+        if parser is None:
+            if not load:
+                return None
+            parser = self.fetch(origin)
+        return self.install(origin, parser)
+
+    def use_scheduler(self, scheduler):
+        """Pass the rules read so far and all later ones to a scheduler."""
+        self.scheduler = scheduler
+        for origin, parser in self._parsers.items():
+            scheduler.set_robots(
+                urlsplit(origin).netloc, parser, self.user_agent
+            )
+
+    def can_fetch(self, url):
+        """Tell whether the robots.txt of its host allows a URL."""
+        origin = origin_of(url)
+        if origin is None:
+            return True
+        if self.parser(origin).can_fetch(self.user_agent, url):
+            return True
+        self.forbidden += 1
+        return False
+
+    def filter(self, urls, load=True):
+        """
+        Split URLs into allowed and disallowed ones.
+
+        Args:
+            urls (iterable): The URLs to check.
+            load (bool): Fetch the robots.txt files that are not cached.
+                If False, the URLs of those hosts are allowed and have
+                to be checked when they are fetched.
+
+        Returns:
+            tuple: The list of allowed and the list of disallowed URLs.
+        """
+        allowed, forbidden = [], []
+        parsers = {}
+        for url in urls:
+            origin = origin_of(url)
+            if origin is None:
+                allowed.append(url)
+                continue
+            if origin not in parsers:
+                parsers[origin] = self.parser(origin, load)
+            parser = parsers[origin]
+            if parser is None or parser.can_fetch(self.user_agent, url):
+                allowed.append(url)
+            else:
+                forbidden.append(url)
+        self.forbidden += len(forbidden)
+        return allowed, forbidden
+
+    def sitemaps(self, origin=None):
+        """
+        Return the sitemaps listed in the robots.txt files read so far.
+
+        Args:
+            origin (str): Only list the sitemaps of this host.
+
+        Returns:
+            list: The sitemap URLs.
+        """
+        origins = [origin] if origin is not None else list(self._parsers)
+        return [
+            sitemap
+            for key in origins
+            for sitemap in (self.parser(key).site_maps() or ())
+        ]
+
+    def stats(self):
+        """
+        Report how the robots.txt files were used.
+
+        Returns:
+            dict: The number of hosts, robots.txt files fetched and read
+                from the cache, disallowed URLs and sitemaps found.
+        """
+        return {
+            'hosts': len(self._parsers),
+            'fetched': self.fetched,
+            'cached': self.cached,
+            'forbidden': self.forbidden,
+            'sitemaps': len(self.sitemaps()),
+        }
+
+    def close(self):
+        """Close the cache database."""
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
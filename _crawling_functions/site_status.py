@@ -0,0 +1,265 @@
+"""
+This module contains the summary records of the crawled sites. The
+crawler of a site keeps a small JSON file, resources/summary.json, up to
+date with its stored pages by class, queue length, errors, last activity
+and current throughput. Reading the status of a site then takes one
+small file, however long the site has been crawled, instead of counting
+the stored pages or reading the tracking files.
+
+Author: Bruno Brocai
+"""
+
+import collections
+import json
+import os
+import socket
+import time
+from . import crawling_objects
+from . import page_store
+
+
+# The classes of stored pages, see url_classifier
+STORED = ('article', 'nonarticle')
+
+# Seconds of recent pages the current throughput is measured over
+WINDOW = 300.0
+
+# A crawl whose summary is older than this many intervals has stopped
+# without writing its last summary, e.g. after a crash
+STALE_INTERVALS = 6
+
+
+def read_summary(path):
+    """
+    Read a summary record.
+
+    Returns:
+        dict: The summary, or None if there is none or it is unreadable.
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def count_lines(path):
+    """Count the lines of a text file, 0 if it does not exist."""
+    if not os.path.exists(path):
+        return 0
+    count = 0
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(2**20), b''):
+            count += block.count(b'\n')
+    return count
+
+
+def count_stored(dir_structure):
+    """
+    Count the stored pages of a site, the slow way. Only used for a
+    site that has no summary yet.
+
+    Returns:
+        dict: The number of pages by class.
+    """
+    folders = {
+        'article': dir_structure.article,
+        'nonarticle': dir_structure.not_article,
+    }
+    return {
+        kind: page_store.count_documents(folder)
+        if os.path.isdir(folder) else 0
+        for kind, folder in folders.items()
+    }
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, OSError):
+        pass
+    return True
+
+
+class SiteSummary:
+    """
+    The summary record that the crawler of a site keeps up to date.
+
+    The totals of earlier crawls are read from the last record and the
+    counts of the running crawl are added to them.
+
+    Args:
+        path (str): The summary file.
+        site (str): The name of the site.
+        interval (float): The seconds between two writes of the record.
+    """
+
+    def __init__(self, path, site, interval=5.0):
+        self.path = path
+        self.site = site
+        self.interval = interval
+        self.base = read_summary(path)
+        self.started = time.time()
+        self.last_write = None
+        self._recent = collections.deque([(time.monotonic(), 0)])
+
+    def seed(self, stored, crawled, errors):
+        """
+        Set the totals of a site crawled before it had a summary.
+
+        Args:
+            stored (dict): The stored pages by class, see count_stored.
+            crawled (int): The pages crawled so far.
+            errors (int): The pages that failed so far.
+        """
+        self.base = {'stored': stored, 'crawled': crawled, 'errors': errors}
+
+    def record(self, results, queued, visited):
+        """
+        Build the record from the results of the running crawl.
+
+        Args:
+            results (dict): The finished pages of the running crawl by
+                result, see metrics.CrawlMetrics.results.
+            queued (int): The URLs in the queue.
+            visited (int): The visited URLs.
+
+        Returns:
+            dict: The summary of the site.
+        """
+        base = self.base or {}
+        base_stored = base.get('stored', {})
+        stored = {
+            kind: base_stored.get(kind, 0) + results.get(kind, 0)
+            for kind in STORED
+        }
+        finished = sum(results.values())
+
+        # Pages per minute over the last WINDOW seconds
+        now = time.monotonic()
+        self._recent.append((now, finished))
+        while len(self._recent) > 2 and now - self._recent[1][0] >= WINDOW:
+            self._recent.popleft()
+        since, finished_before = self._recent[0]
+        per_minute = (
+            60 * (finished - finished_before) / (now - since)
+            if now - since >= 1 else 0.0
+        )
+
+        return {
+            'site': self.site,
+            'state': 'crawling',
+            'host': socket.gethostname(),
+            'pid': os.getpid(),
+            'interval': self.interval,
+            'started': self.started,
+            'updated': time.time(),
+            'stored': stored,
+            'crawled': base.get('crawled', 0) + finished,
+            'errors': base.get('errors', 0) + results.get('error', 0),
+            'queued': queued,
+            'visited': visited,
+            'pages_per_minute': per_minute,
+        }
+
+    def write(self, results, queued, visited, state='crawling'):
+        """Replace the summary file with the current record."""
+        summary = self.record(results, queued, visited)
+        summary['state'] = state
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump(summary, file)
+        os.replace(tmp_path, self.path)
+        self.last_write = time.monotonic()
+
+    def due(self):
+        """Tell whether the record is interval seconds old."""
+        return self.last_write is None or (
+            time.monotonic() - self.last_write >= self.interval
+        )
+
+
+def site_status(directory):
+    """
+    Read the status of a site directory from its summary.
+
+    A crawl that is neither running nor stopped properly, because its
+    process is gone or its summary is too old, is reported as 'stale'.
+
+    Returns:
+        dict: The summary with the error rate and the seconds since the
+            last activity, or None if the site has no summary.
+    """
+    summary = read_summary(crawling_objects.TrackingFiles(directory).summary)
+    if summary is None:
+        return None
+    summary['directory'] = directory
+    summary['idle'] = max(time.time() - summary.get('updated', 0), 0)
+    summary['error_rate'] = (
+        summary.get('errors', 0) / summary['crawled']
+        if summary.get('crawled') else 0.0
+    )
+    if summary.get('state') == 'crawling':
+        gone = summary.get('host') == socket.gethostname() and (
+            not _process_alive(summary.get('pid', 0))
+        )
+        too_old = summary['idle'] > STALE_INTERVALS * max(
+            summary.get('interval', 5.0), 10
+        )
+        if gone or too_old:
+            summary['state'] = 'stale'
+    if summary.get('state') != 'crawling':
+        summary['pages_per_minute'] = 0.0
+    return summary
+
+
+def find_sites(root='.'):
+    """
+    List the site directories below a directory, including the worker
+    directories of distributed crawls (<site>/workers/<id>).
+    """
+    sites = []
+    for entry in sorted(os.scandir(root), key=lambda e: e.name):
+        if not entry.is_dir() or entry.name.startswith('.'):
+            continue
+        if os.path.isdir(os.path.join(entry.path, 'resources')):
+            sites.append(entry.path)
+        workers = os.path.join(entry.path, 'workers')
+        if os.path.isdir(workers):
+            sites.extend(
+                worker.path for worker in sorted(
+                    os.scandir(workers), key=lambda e: e.name
+                ) if worker.is_dir()
+            )
+    return sites
+
+
+def format_age(seconds):
+    """Write a duration like 45s, 12m or 3h."""
+    if seconds < 60:
+        return f'{seconds:.0f}s'
+    if seconds < 3600:
+        return f'{seconds / 60:.0f}m'
+    if seconds < 86400:
+        return f'{seconds / 3600:.1f}h'
+    return f'{seconds / 86400:.1f}d'
+
+
+def format_table(rows):
+    """Render the status of site directories as a table."""
+    lines = [
+        f"{'site':28} {'state':8} {'articles':>9} {'boards':>8} "
+        f"{'queued':>9} {'errors':>7} {'pages/min':>9} {'active':>7}"
+    ]
+    for row in rows:
+        stored = row.get('stored', {})
+        lines.append(
+            f"{row['directory'][-28:]:28} {row['state']:8} "
+            f"{stored.get('article', 0):9} {stored.get('nonarticle', 0):8} "
+            f"{row.get('queued', 0):9} {row['error_rate']:7.1%} "
+            f"{row.get('pages_per_minute', 0):9.1f} "
+            f"{format_age(row['idle']):>7}"
+        )
+    return '\n'.join(lines)
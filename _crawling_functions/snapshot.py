@@ -0,0 +1,183 @@
+"""
+This module contains the binary snapshots of the in-memory crawl state.
+A snapshot holds the queued URLs with their depth and the visited URLs,
+together with the sizes of queue.txt and visited.txt it covers. A
+restarted crawler loads the snapshot and only reads the lines appended
+to the text files since, instead of reading and filtering them whole.
+
+Appending the same lines again does not change the restored state, the
+visited URLs are taken out of the queue after both are replayed, so a
+snapshot may be written while the journal still holds records. A crawl
+whose frontier dropped URLs (see frontier.Frontier) keeps the offset of
+queue.txt it started from, so the next crawl reads them again.
+
+Author: Bruno Brocai
+"""
+
+import hashlib
+import os
+import struct
+import zlib
+from array import array
+from collections import namedtuple
+
+
+MAGIC = b'CCSNAP01'
+# magic, fingerprint, queue.txt offset and mark, visited.txt offset and
+# mark, number of queued URLs, whether visited URLs follow
+HEADER = struct.Struct('<8s16sQ16sQ16sQ?')
+BLOCK = struct.Struct('<Q')
+
+# The bytes before an offset that have to be unchanged
+MARK_SIZE = 4096
+
+Snapshot = namedtuple(
+    'Snapshot', ['entries', 'visited', 'queue_offset', 'visited_offset']
+)
+
+
+def fingerprint(*parts):
+    """
+    Hash the settings a snapshot depends on, e.g. the URL patterns the
+    queue was filtered with.
+    """
+    return hashlib.blake2b(
+        '\0'.join(str(part) for part in parts).encode('utf-8'),
+        digest_size=16
+    ).digest()
+
+
+def file_mark(path, offset):
+    """Hash the bytes before an offset to recognize a rewritten file."""
+    with open(path, 'rb') as file:
+        file.seek(max(offset - MARK_SIZE, 0))
+        data = file.read(min(offset, MARK_SIZE))
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+def _write_block(file, data):
+    data = zlib.compress(data, 1)
+    file.write(BLOCK.pack(len(data)))
+    file.write(data)
+
+
+def _read_block(file):
+    (size,) = BLOCK.unpack(file.read(BLOCK.size))
+    data = file.read(size)
+    if len(data) != size:
+        raise ValueError('truncated block')
+    return zlib.decompress(data)
+
+
+def _join(urls):
+    return '\n'.join(urls).encode('utf-8')
+
+
+def _split(data):
+    return data.decode('utf-8').split('\n') if data else []
+
+
+def save(
+    path, entries, visited, queue_path, visited_path, key, queue_offset=None
+):
+    """
+    Write a snapshot, replacing the last one atomically.
+
+    Args:
+        path (str): The snapshot file.
+        entries (iterable): The queued URLs and their depth in crawl order.
+        visited (iterable): The visited URLs, or None if they are kept
+            elsewhere (e.g. in the saved bloom filter).
+        queue_path (str): The path of queue.txt.
+        visited_path (str): The path of visited.txt.
+        key (bytes): The fingerprint of the settings, see fingerprint.
+        queue_offset (int): The size of queue.txt the queued URLs cover,
+            all of it if None. The lines after it are read again on
+            load, e.g. URLs a full frontier dropped.
+
+    Returns:
+        int: The size of the snapshot in bytes.
+    """
+    if queue_offset is None:
+        queue_offset = os.path.getsize(queue_path)
+    visited_offset = os.path.getsize(visited_path)
+    urls = []
+    depths = array('i')
+    for url, depth in entries:
+        urls.append(url)
+        depths.append(depth)
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as file:
+        file.write(HEADER.pack(
+            MAGIC, key,
+            queue_offset, file_mark(queue_path, queue_offset),
+            visited_offset, file_mark(visited_path, visited_offset),
+            len(urls), visited is not None
+        ))
+        _write_block(file, _join(urls))
+        _write_block(file, depths.tobytes())
+        if visited is not None:
+            _write_block(file, _join(visited))
+        file.flush()
+        os.fsync(file.fileno())
+        size = file.tell()
+    os.replace(tmp_path, path)
+    return size
+
+
+def load(path, queue_path, visited_path, key):
+    """
+    Read a snapshot written by save, if it still matches the text files
+    and the settings.
+
+    Returns:
+        Snapshot: The queued entries, the set of visited URLs (or None)
+            and the offsets of the text files, or None if there is no
+            usable snapshot.
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'rb') as file:
+            (
+                magic, saved_key, queue_offset, queue_mark,
+                visited_offset, visited_mark, count, has_visited
+            ) = HEADER.unpack(file.read(HEADER.size))
+            if magic != MAGIC:
+                raise ValueError('not a snapshot')
+            if saved_key != key:
+                raise ValueError('the patterns or settings changed')
+            for text_path, offset, mark in (
+                (queue_path, queue_offset, queue_mark),
+                (visited_path, visited_offset, visited_mark),
+            ):
+                if offset > os.path.getsize(text_path) or (
+                    file_mark(text_path, offset) != mark
+                ):
+                    raise ValueError(f"'{text_path}' was rewritten")
+            urls = _split(_read_block(file))
+            depths = array('i')
+            depths.frombytes(_read_block(file))
+            if len(urls) != count or len(depths) != count:
+                raise ValueError('wrong number of queued URLs')
+            visited = set(_split(_read_block(file))) if has_visited else None
+    except (ValueError, struct.error, zlib.error) as e:
+        print(f'Ignoring snapshot {path}: {e}')
+        return None
+    return Snapshot(
+        list(zip(urls, depths)), visited, queue_offset, visited_offset
+    )
+
+
+def read_tail(path, offset):
+    """
+    Read the lines appended to a text file after an offset.
+
+    Returns:
+        list: The stripped, non-empty lines.
+    """
+    with open(path, 'rb') as file:
+        file.seek(offset)
+        data = file.read().decode('utf-8')
+    return [line.strip() for line in data.splitlines() if line.strip()]
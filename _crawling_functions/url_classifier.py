@@ -0,0 +1,119 @@
+"""
+This module contains the URL classifier. It compiles the patterns of a
+patterns.ini section once and labels URLs in a single pass, instead of
+filtering sets of URLs with one regex after the other.
+
+Author: Bruno Brocai
+"""
+
+import functools
+import re
+
+
+ARTICLE = 'article'
+NOT_ARTICLE = 'nonarticle'
+IRRELEVANT = 'irrelevant'
+CRAWLED = 'crawled'
+
+
+class UrlClassifier:
+    """
+    Label URLs as article, non-article, irrelevant or already crawled.
+
+    The pattern decisions of recent URLs are memoized, since board pages
+    repeat the same navigation links on every page. Whether a URL was
+    already crawled is never memoized, as that changes during the crawl.
+
+    Attributes:
+        memo_size (int): The number of pattern decisions kept in memory.
+    """
+
+    def __init__(
+        self, article_pattern, notarticle_pattern, irrelevant_pattern,
+        memo_size=65536
+    ):
+        self.memo_size = memo_size
+        self._article = re.compile(article_pattern).match
+        self._notarticle = re.compile(notarticle_pattern).match
+        self._irrelevant = (
+            re.compile(irrelevant_pattern).search
+            if irrelevant_pattern else None
+        )
+        self._decide = functools.lru_cache(maxsize=memo_size)(
+            self._decide_uncached
+        )
+
+    @classmethod
+    def from_patterns(cls, url_patterns, memo_size=65536):
+        """Build a classifier from a UrlPatterns object."""
+        return cls(
+            url_patterns.article_pattern,
+            url_patterns.notarticle_pattern,
+            url_patterns.irrelevant_pattern,
+            memo_size
+        )
+
+    def _decide_uncached(self, url):
+        if self._article(url):
+            kind = ARTICLE
+        elif self._notarticle(url):
+            kind = NOT_ARTICLE
+        else:
+            kind = None
+        excluded = bool(self._irrelevant and self._irrelevant(url))
+        return kind, excluded
+
+    def page_kind(self, url):
+        """
+        Return ARTICLE or NOT_ARTICLE for a crawled page, IRRELEVANT if
+        its URL matches neither pattern. The irrelevant pattern is not
+        applied, the page was already chosen to be crawled.
+        """
+        kind, _ = self._decide(url)
+        return kind or IRRELEVANT
+
+    def classify(self, url, crawled=()):
+        """
+        Label a single URL.
+
+        Args:
+            url (str): The URL to label.
+            crawled (set): The URLs that were already crawled.
+
+        Returns:
+            str: ARTICLE, NOT_ARTICLE, IRRELEVANT or CRAWLED.
+        """
+        kind, excluded = self._decide(url)
+        if excluded or kind is None:
+            return IRRELEVANT
+        if url in crawled:
+            return CRAWLED
+        return kind
+
+    def partition(self, urls, crawled=()):
+        """
+        Split URLs into the ones to crawl and the irrelevant ones.
+
+        Relevant URLs that were already crawled are in neither set.
+
+        Args:
+            urls (iterable): The URLs to sort.
+            crawled (set): The URLs that were already crawled.
+
+        Returns:
+            tuple: The set of relevant URLs and the set of irrelevant URLs.
+        """
+        relevant = set()
+        irrelevant = set()
+        decide = self._decide
+        for url in urls:
+            kind, excluded = decide(url)
+            if excluded or kind is None:
+                irrelevant.add(url)
+            elif url not in crawled:
+                relevant.add(url)
+        return relevant, irrelevant
+
+    def memo_info(self):
+        """Return the hit/miss statistics of the memo."""
+        return self._decide.cache_info()
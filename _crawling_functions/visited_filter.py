@@ -0,0 +1,223 @@
+"""
+This module contains a compact, probabilistic replacement for the set of
+visited URLs. A scalable Bloom filter needs a few bytes per URL instead
+of a whole Python string, at the price of a configurable rate of false
+positives: a URL that was never crawled may be taken for a visited one.
+
+Author: Bruno Brocai
+"""
+
+import hashlib
+import math
+import os
+import struct
+
+
+MAGIC = b'CCBLOOM1'
+HEADER = struct.Struct('<8sdQQI')
+FILTER_HEADER = struct.Struct('<QdQIQ')
+
+
+def url_hashes(url):
+    """Return two independent 64-bit hashes of a URL."""
+    digest = hashlib.blake2b(url.encode('utf-8'), digest_size=16).digest()
+    return (
+        int.from_bytes(digest[:8], 'little'),
+        int.from_bytes(digest[8:], 'little') | 1
+    )
+
+
+class BloomFilter:
+    """
+    A fixed-size Bloom filter.
+
+    Attributes:
+        capacity (int): The number of URLs the filter is sized for.
+        error_rate (float): The false positive rate at full capacity.
+        count (int): The number of URLs added.
+    """
+
+    def __init__(self, capacity, error_rate, size=None, hashes=None, bits=None):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = size or math.ceil(
+            -capacity * math.log(error_rate) / math.log(2) ** 2
+        )
+        self.hashes = hashes or max(
+            1, round(self.size / capacity * math.log(2))
+        )
+        self.bits = bits if bits is not None else bytearray(
+            (self.size + 7) // 8
+        )
+        self.count = 0
+
+    def _positions(self, hashes):
+        first, second = hashes
+        size = self.size
+        return [(first + i * second) % size for i in range(self.hashes)]
+
+    def add_hashes(self, hashes):
+        """Add a URL given by its hashes."""
+        bits = self.bits
+        for position in self._positions(hashes):
+            bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def contains_hashes(self, hashes):
+        """Check a URL given by its hashes."""
+        bits = self.bits
+        return all(
+            bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(hashes)
+        )
+
+    @property
+    def full(self):
+        return self.count >= self.capacity
+
+
+class ScalableBloomFilter:
+    """
+    A Bloom filter that grows with the number of URLs.
+
+    When the current filter is full, a new one with twice the capacity
+    and half the error rate is added, so the overall false positive rate
+    stays below error_rate however many URLs are added.
+
+    Attributes:
+        error_rate (float): The maximum overall false positive rate.
+        initial_capacity (int): The capacity of the first filter.
+    """
+
+    GROWTH = 2
+    TIGHTENING = 0.5
+
+    def __init__(self, error_rate=1e-5, initial_capacity=100000):
+        self.error_rate = error_rate
+        self.initial_capacity = initial_capacity
+        self.filters = []
+
+    def _grow(self):
+        capacity = self.initial_capacity * self.GROWTH ** len(self.filters)
+        error_rate = (
+            self.error_rate * (1 - self.TIGHTENING)
+            * self.TIGHTENING ** len(self.filters)
+        )
+        self.filters.append(BloomFilter(capacity, error_rate))
+
+    def add(self, url):
+        """
+        Add a URL.
+
+        Returns:
+            bool: False if the URL (probably) was already in the filter.
+        """
+        hashes = url_hashes(url)
+        if any(filt.contains_hashes(hashes) for filt in self.filters):
+            return False
+        if not self.filters or self.filters[-1].full:
+            self._grow()
+        self.filters[-1].add_hashes(hashes)
+        return True
+
+    def update(self, urls):
+        for url in urls:
+            self.add(url)
+
+    def __contains__(self, url):
+        hashes = url_hashes(url)
+        return any(filt.contains_hashes(hashes) for filt in self.filters)
+
+    def __len__(self):
+        return sum(filt.count for filt in self.filters)
+
+    def memory_usage(self):
+        """Return the bytes used by the bit arrays."""
+        return sum(len(filt.bits) for filt in self.filters)
+
+    def save(self, path, offset=0):
+        """
+        Write the filter to a file, replacing it atomically.
+
+        Args:
+            path (str): The file to write.
+            offset (int): The number of bytes of visited.txt covered by
+                the filter, so only the rest has to be read on load.
+        """
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as file:
+            file.write(HEADER.pack(
+                MAGIC, self.error_rate, self.initial_capacity,
+                offset, len(self.filters)
+            ))
+            for filt in self.filters:
+                file.write(FILTER_HEADER.pack(
+                    filt.capacity, filt.error_rate, filt.size,
+                    filt.hashes, filt.count
+                ))
+                file.write(filt.bits)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Read a filter written by save.
+
+        Returns:
+            tuple: The filter and the offset stored with it.
+
+        Raises:
+            ValueError: If the file is not a saved filter.
+        """
+        with open(path, 'rb') as file:
+            magic, error_rate, initial_capacity, offset, count = HEADER.unpack(
+                file.read(HEADER.size)
+            )
+            if magic != MAGIC:
+                raise ValueError(f"'{path}' is not a visited filter.")
+            bloom = cls(error_rate, initial_capacity)
+            for _ in range(count):
+                capacity, rate, size, hashes, added = FILTER_HEADER.unpack(
+                    file.read(FILTER_HEADER.size)
+                )
+                bits = bytearray(file.read((size + 7) // 8))
+                filt = BloomFilter(capacity, rate, size, hashes, bits)
+                filt.count = added
+                bloom.filters.append(filt)
+        return bloom, offset
+
+
+def load_visited(visited_path, filter_path, error_rate=1e-5):
+    """
+    Load the visited URLs of a site into a scalable Bloom filter.
+
+    The saved filter is reused and only the lines appended to visited.txt
+    since it was saved are read. Without a usable saved filter, the whole
+    file is streamed into a new one.
+
+    Args:
+        visited_path (str): The path of visited.txt.
+        filter_path (str): The path of the saved filter.
+        error_rate (float): The error rate of a newly created filter.
+
+    Returns:
+        ScalableBloomFilter: The filter holding all visited URLs.
+    """
+    bloom, offset = None, 0
+    if os.path.exists(filter_path):
+        try:
+            bloom, offset = ScalableBloomFilter.load(filter_path)
+        except (ValueError, struct.error) as e:
+            print(f'Ignoring saved visited filter: {e}')
+    if bloom is None or offset > os.path.getsize(visited_path):
+        bloom, offset = ScalableBloomFilter(error_rate), 0
+
+    with open(visited_path, 'rb') as file:
+        file.seek(offset)
+        for line in file:
+            url = line.decode('utf-8').strip()
+            if url:
+                bloom.add(url)
+    return bloom
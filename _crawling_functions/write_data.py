@@ -1,6 +1,22 @@
 import os
 import json
 import datetime
+import hashlib
+
+
+def url_to_filename(url, max_length=250):
+    """
+    Turn a URL into a file name.
+
+    All slashes are replaced with underscores. URLs longer than max_length
+    are cut and end in a hash of the full URL, so that two long URLs with
+    the same beginning do not end up in the same file.
+    """
+    filename = url.replace('/', '_')
+    if len(filename) > max_length:
+        digest = hashlib.sha1(url.encode('utf-8')).hexdigest()[:16]
+        filename = f'{filename[:max_length - 17]}_{digest}'
+    return filename
 
 
 def dump_html(folder, filename, html):
@@ -28,7 +44,7 @@ def dump_html(folder, filename, html):
         output.write(html)
 
 
-def write_html_to_json(folder, url, html):
+def write_html_to_json(folder, url, html, overwrite=False):
     """
     Write HTML content to a file in JSON format.
 
@@ -38,15 +54,18 @@ def write_html_to_json(folder, url, html):
 
     Args:
         folder (str): The folder where the file is to be saved.
-        filename (str): The name of the file.
+        url (str): The URL of the page, used as the name of the file.
         html (str): The HTML content to write to the file.
+        overwrite (bool): Replace an existing file, e.g. with a newer
+            version of the page.
+
+    Returns:
+        str: The path of the written file.
     """
 
-    filename = url.replace('/', '_')
-    filename = filename[:250]
-    file_path = os.path.join(folder, f'{filename}.json')
+    file_path = os.path.join(folder, f'{url_to_filename(url)}.json')
 
-    if os.path.exists(file_path):
+    if not overwrite and os.path.exists(file_path):
         raise FileExistsError(f"File '{file_path}' already exists.")
 
     data = {
@@ -58,6 +77,8 @@ def write_html_to_json(folder, url, html):
     with open(file_path, 'w', encoding='utf-8') as output:
         json.dump(data, output)
 
+    return file_path
+
 
 def append_line_to_file(file_path, new_line):
     """Does what it says."""
@@ -1,4 +1,5 @@
 import os
+from _crawling_functions import site_status
 
 
 def list_dirs(directory):
@@ -17,18 +18,40 @@ def list_dirs(directory):
     ]
 
 
+def last_line(path):
+    """Read the last line of a file without reading the whole file."""
+    with open(path, 'rb') as file:
+        file.seek(0, os.SEEK_END)
+        position = file.tell()
+        data = b''
+        while position > 0 and data.rstrip(b'\n').count(b'\n') < 1:
+            step = min(4096, position)
+            position -= step
+            file.seek(position)
+            data = file.read(step) + data
+    lines = data.rstrip(b'\n').split(b'\n')
+    if not lines[-1]:
+        raise IndexError('list index out of range')
+    return lines[-1].decode('utf-8')
+
+
 if __name__ == '__main__':
     current_dirs = list_dirs('.')
     for direc in current_dirs:
-        graph_path = os.path.join(direc, 'resources', 'graph.txt')
+        # The summary kept by the crawler, see status.py
+        summary = site_status.site_status(direc)
+        if summary is not None:
+            if summary['queued'] > 0:
+                print(f"{direc}: {summary['queued']}")
+            continue
 
+        graph_path = os.path.join(direc, 'resources', 'graph.txt')
         try:
-            with open(graph_path, 'r', encoding='utf-8') as file:
-                try:
-                    last_line = file.readlines()[-1]
-                    if int(last_line) > 0:
-                        print(f'{direc}: {last_line}')
-                except IndexError as e:
-                    print(f'{e} in {direc}')
+            try:
+                queued = last_line(graph_path)
+                if int(queued) > 0:
+                    print(f'{direc}: {queued}')
+            except IndexError as e:
+                print(f'{e} in {direc}')
         except FileNotFoundError:
             pass
@@ -0,0 +1,106 @@
+"""
+Benchmark of the checkers compiled from checkers.ini against the
+hand-written functions in _checker_funcs.py.
+
+Both have to decide the same on every generated page before they are
+timed. The pages mix article and board URLs, AI terms in the keywords
+and in the text, and health terms in the meta tags.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_checker_spec [pages]
+"""
+
+import random
+import sys
+import time
+from _crawling_functions import _checker_funcs, checker_spec
+
+
+PAIRS = (
+    ('spektrum_is_ai', 'spektrum_ai'),
+    ('infoakt_is_ai', 'infoakt_ai'),
+    ('zeit_is_health', 'zeit_health'),
+)
+
+WORDS = (
+    'Forschung Studie Ergebnis Wissenschaft Klima Daten Modell Zelle '
+    'Gehirn Universität Experiment Messung Analyse Energie Physik'
+).split()
+AI_TERMS = (
+    'künstliche Intelligenz', 'maschinelles Lernen', 'ChatGPT',
+    'neuronale Netze', 'Deep Learning'
+)
+KEYWORDS = ('Physik, Klima', 'Forschung, Künstliche Intelligenz')
+META = ('Nachrichten und Hintergründe', 'Gesundheit und Medizin')
+
+
+def make_page(rng, paragraphs=20):
+    """Simulate a page with navigation, text and some of the terms."""
+    ai_terms = rng.choice((0, 0, 1, 2, 3, 5))
+    words = [rng.choice(WORDS) for _ in range(80 * paragraphs)]
+    for _ in range(ai_terms):
+        words.insert(rng.randrange(len(words)), rng.choice(AI_TERMS))
+    text = ''.join(
+        '<p>' + ' '.join(words[i:i + 80]) + '</p>'
+        for i in range(0, len(words), 80)
+    )
+    nav = ''.join(
+        f'<li><a href="/thema/{i}/">Thema {i}</a></li>' for i in range(80)
+    )
+    canonical = rng.choice(('/news/artikel.html', '/news/uebersicht/'))
+    return (
+        '<html><head><title>Seite</title>'
+        f'<meta name="keywords" content="{rng.choice(KEYWORDS)}">'
+        f'<meta name="description" content="{rng.choice(META)}">'
+        f'<link rel="canonical" href="{canonical}">'
+        '<script>var intelligence = "KI";</script>'
+        f'</head><body><nav><ul>{nav}</ul></nav><main>{text}</main>'
+        '</body></html>'
+    )
+
+
+def make_url(rng):
+    return rng.choice((
+        'https://www.spektrum.de/news/ein-artikel/2212123',
+        'https://www.spektrum.de/news/ein-anderer-artikel/1998765',
+        'https://www.spektrum.de/thema/kuenstliche-intelligenz/1234567',
+        'https://www.spektrum.de/news/uebersicht',
+    ))
+
+
+def measure(check, pages):
+    start = time.process_time()
+    for url, html in pages:
+        check(html, url)
+    return (time.process_time() - start) / len(pages)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+
+    rng = random.Random(0)
+    pages = [(make_url(rng), make_page(rng)) for _ in range(count)]
+    specs = checker_spec.load_checkers('checkers.ini')
+    engine = 'Aho-Corasick' if checker_spec.ahocorasick else 'regex'
+    print(f'{count} pages, term lists matched with {engine}')
+
+    for function_name, spec_name in PAIRS:
+        function = getattr(_checker_funcs, function_name)
+        compiled = specs[spec_name]
+
+        # Both versions have to agree before timing them
+        decisions = [function(html, url) for url, html in pages]
+        assert decisions == [compiled(html, url) for url, html in pages], \
+            f'{spec_name} decides differently than {function_name}'
+
+        before = measure(function, pages)
+        after = measure(compiled, pages)
+        print(
+            f'{function_name:15} {before * 1e3:6.2f} ms/page, '
+            f'{spec_name:12} {after * 1e3:6.2f} ms/page, '
+            f'{before / after:4.1f}x ({sum(decisions)} relevant)'
+        )
+
+
+if __name__ == '__main__':
+    main()
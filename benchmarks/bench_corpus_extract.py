@@ -0,0 +1,103 @@
+"""
+Link extraction benchmark of a stored corpus.
+
+Writes a site directory with generated pages (see
+bench_checker_spec.make_page) as JSON files and times the former pool of
+threads parsing every page with BeautifulSoup against the process pool
+of corpus_extract with a growing number of workers, and against a second
+run over the extraction cache after a tenth of the pages were added.
+All have to find the same links before they are timed. The gain of the
+process pool is bounded by the number of CPU cores.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_corpus_extract [pages] [max_workers]
+"""
+
+import concurrent.futures
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from bs4 import BeautifulSoup
+from _crawling_functions import corpus_extract, crawling_objects, write_data
+from benchmarks.bench_checker_spec import make_page
+
+
+def former_links(path):
+    with open(path, 'r', encoding='utf-8') as file:
+        data = json.load(file)
+    soup = BeautifulSoup(data['html_content'], 'lxml')
+    return {tag['href'] for tag in soup.find_all(['a', 'link'], href=True)}
+
+
+def extract_threaded(paths):
+    links = set()
+    with concurrent.futures.ThreadPoolExecutor() as executor:
+        for result in executor.map(former_links, paths):
+            links.update(result)
+    return links
+
+
+def extract_pooled(paths, workers):
+    links = set()
+    for result in corpus_extract.run_pool(paths, False, workers):
+        links.update(result[3])
+    return links
+
+
+def write_pages(folder, rng, start, count):
+    for i in range(start, start + count):
+        write_data.write_html_to_json(
+            folder, f'https://www.spektrum.de/news/artikel/{i}',
+            make_page(rng).replace('/thema/', f'/thema/{i % 500}/')
+        )
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    max_workers = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count()
+
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = os.path.join(tmp, 'bench')
+        goal = crawling_objects.GoalDirectory(directory)
+        tracking = crawling_objects.TrackingFiles(directory)
+        for folder in (goal.article, f'{directory}/resources'):
+            os.makedirs(folder, exist_ok=True)
+        write_pages(goal.article, rng, 0, count)
+        paths = corpus_extract.list_files([goal.article])
+        print(f'{count} pages, {os.cpu_count()} CPU cores')
+
+        start = time.perf_counter()
+        expected = extract_threaded(paths)
+        threaded = time.perf_counter() - start
+        print(f'threads, BeautifulSoup: {count / threaded:7.0f} pages/s')
+
+        for workers in range(1, max_workers + 1):
+            start = time.perf_counter()
+            links = extract_pooled(paths, workers)
+            elapsed = time.perf_counter() - start
+            assert links == expected, 'the process pool finds other links'
+            print(f'{workers} worker processes:   {count / elapsed:7.0f} '
+                  f'pages/s ({threaded / elapsed:.1f}x)')
+
+        cache = corpus_extract.ExtractionCache(
+            tracking.extract_cache, directory
+        )
+        corpus_extract.update(cache, paths, max_workers)
+        added = max(count // 10, 1)
+        write_pages(goal.article, rng, count, added)
+        paths = corpus_extract.list_files([goal.article])
+        start = time.perf_counter()
+        extracted = corpus_extract.update(cache, paths, max_workers)
+        cached = time.perf_counter() - start
+        assert extracted == added, 'the cache extracts unchanged pages'
+        cache.close()
+        print(f'cached, {added} new pages: {cached:7.3f} s '
+              f'({threaded * (count + added) / count / cached:.0f}x)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""
+Equivalence check and throughput benchmark of the link extraction.
+
+Runs the BeautifulSoup based retrieve_data.get_link_info_from_html and
+the lxml based link_extract.get_link_info on the pages stored in a site
+directory. Both have to find the same links, <base> href and canonical
+href on every page, with and without skipping rel=nofollow links, before
+they are timed. The edge cases are checked without a corpus by
+checks/check_link_extract.py.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_link_extract <site_dir> [pages]
+"""
+
+import itertools
+import os
+import sys
+import time
+from _crawling_functions import (
+    crawling_objects, link_extract, page_store, retrieve_data
+)
+
+
+def stored_pages(site_dir, limit):
+    goal_dir = crawling_objects.GoalDirectory(site_dir)
+    folders = [
+        folder for folder in (goal_dir.article, goal_dir.not_article)
+        if os.path.isdir(folder)
+    ]
+    records = itertools.chain.from_iterable(
+        page_store.iter_documents(folder) for folder in folders
+    )
+    return [
+        record['html_content']
+        for record in itertools.islice(records, limit)
+    ]
+
+
+def check_equivalence(pages):
+    """Return the pages on which both extractions differ."""
+    return [
+        html for html in pages
+        if any(
+            retrieve_data.get_link_info_from_html(html, skip_nofollow)
+            != link_extract.get_link_info(html, skip_nofollow)
+            for skip_nofollow in (False, True)
+        )
+    ]
+
+
+def measure(func, pages):
+    start = time.process_time()
+    links = sum(len(func(html)[0]) for html in pages)
+    return time.process_time() - start, links
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    site_dir = sys.argv[1].rstrip('/')
+    limit = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+
+    pages = stored_pages(site_dir, limit)
+    if not pages:
+        print(f'No stored pages found in {site_dir}')
+        sys.exit(1)
+
+    differences = check_equivalence(pages)
+    for html in differences[:5]:
+        print('Different links for:', html[:200])
+        print('  soup:', retrieve_data.get_link_info_from_html(html))
+        print('  lxml:', link_extract.get_link_info(html))
+    if differences:
+        print(f'{len(differences)} pages differ')
+        sys.exit(1)
+
+    soup_time, links = measure(retrieve_data.get_link_info_from_html, pages)
+    lxml_time, _ = measure(link_extract.get_link_info, pages)
+
+    size = sum(len(html) for html in pages) / 2**20
+    print(f'{len(pages)} pages, {size:.1f} MB, {links} links: identical')
+    print(
+        f'BeautifulSoup: {len(pages) / soup_time:8.0f} pages/s, '
+        f'{size / soup_time:6.1f} MB/s'
+    )
+    print(
+        f'lxml:          {len(pages) / lxml_time:8.0f} pages/s, '
+        f'{size / lxml_time:6.1f} MB/s'
+    )
+    print(f'speedup: {soup_time / lxml_time:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""
+URL lookup benchmark of a stored corpus with and without its manifest.
+
+Writes a site directory with generated article pages as JSON files,
+builds the manifest of the site and times retrieve_data.urls_from_jsons
+opening every page against reading the URLs from the manifest. Both
+have to return the same URLs before they are timed.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_manifest [pages] [paragraphs]
+"""
+
+import os
+import sys
+import tempfile
+import time
+from _crawling_functions import (
+    crawling_objects, manifest, retrieve_data, write_data
+)
+
+
+def make_page(i, paragraphs):
+    return '<html><body>' + ''.join(
+        f'<p>Absatz {j} des Artikels {i} mit etwas Text.</p>'
+        for j in range(paragraphs)
+    ) + '</body></html>'
+
+
+def make_site(directory, count, paragraphs):
+    goal = crawling_objects.GoalDirectory(directory)
+    for folder in (goal.article, goal.not_article, f'{directory}/resources'):
+        os.makedirs(folder, exist_ok=True)
+    for i in range(count):
+        write_data.write_html_to_json(
+            goal.article, f'https://www.example.org/artikel/{i}',
+            make_page(i, paragraphs)
+        )
+    return goal
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    paragraphs = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = os.path.join(tmp, 'bench')
+        goal = make_site(directory, count, paragraphs)
+        tracking = crawling_objects.TrackingFiles(directory)
+
+        started = time.perf_counter()
+        opened = retrieve_data.urls_from_jsons(goal.article)
+        open_time = time.perf_counter() - started
+
+        started = time.perf_counter()
+        site_manifest = manifest.Manifest(tracking.manifest, directory)
+        manifest.build(site_manifest)
+        site_manifest.close()
+        build_time = time.perf_counter() - started
+
+        started = time.perf_counter()
+        listed = retrieve_data.urls_from_jsons(goal.article)
+        manifest_time = time.perf_counter() - started
+        assert opened == listed, 'the manifest lists other URLs'
+
+        print(f'{count} pages of {paragraphs} paragraphs')
+        print(f'opening the pages: {open_time:8.3f} s')
+        print(f'manifest:          {manifest_time:8.3f} s '
+              f'({open_time / manifest_time:.0f}x), '
+              f'built once in {build_time:.2f} s')
+
+
+if __name__ == '__main__':
+    main()
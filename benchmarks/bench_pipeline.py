@@ -0,0 +1,97 @@
+"""
+Throughput benchmark of the parse stage of the pipelined crawler.
+
+Analyzes generated pages (see bench_checker_spec.make_page) in the
+crawling process and in a pipeline.ParsePool with a growing number of
+workers, keeping at most twice the workers in flight like the crawler.
+Both have to return the same results before they are timed. The gain
+is bounded by the number of CPU cores.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_pipeline [pages] [max_workers]
+"""
+
+import asyncio
+import os
+import random
+import sys
+import time
+from _crawling_functions import checker_spec, pipeline
+from benchmarks.bench_checker_spec import make_page, make_url
+
+
+def comparable(analysis):
+    """
+    Replace the signature, which has no equality, by its values and
+    leave out the timings.
+    """
+    signature = analysis.signature
+    if signature is not None:
+        signature = (signature.digest, signature.simhash)
+    return analysis._replace(
+        signature=signature, check_seconds=0.0, parse_seconds=0.0
+    )
+
+
+def analyze_inline(checker, pages):
+    return [
+        pipeline.analyze_page(
+            pipeline.decode_html(*page), url, checker, fingerprint=True
+        )
+        for url, page in pages
+    ]
+
+
+async def analyze_pooled(pool, pages):
+    results = [None] * len(pages)
+    pending = {}
+    for index, (url, page) in enumerate(pages):
+        if len(pending) >= 2 * pool.workers:
+            done, _ = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                results[pending.pop(task)] = task.result()
+        task = asyncio.create_task(pool.analyze(url, page, True))
+        pending[task] = index
+    for task, index in pending.items():
+        results[index] = await task
+    return results
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+    max_workers = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count()
+
+    rng = random.Random(0)
+    pages = [
+        (make_url(rng), pipeline.RawPage(make_page(rng).encode(), 'utf-8'))
+        for _ in range(count)
+    ]
+    checker = checker_spec.load_checkers('checkers.ini')['spektrum_ai']
+    print(f'{count} pages, {os.cpu_count()} CPU cores')
+
+    start = time.perf_counter()
+    expected = analyze_inline(checker, pages)
+    inline = time.perf_counter() - start
+    print(f'in process: {count / inline:7.0f} pages/s')
+
+    for workers in range(1, max_workers + 1):
+        pool = pipeline.ParsePool(checker, workers=workers)
+        try:
+            start = time.perf_counter()
+            results = asyncio.run(analyze_pooled(pool, pages))
+            pooled = time.perf_counter() - start
+        finally:
+            pool.close()
+        assert list(map(comparable, results)) == list(
+            map(comparable, expected)
+        ), 'the workers analyze differently'
+        print(
+            f'{workers:2} workers: {count / pooled:7.0f} pages/s, '
+            f'{inline / pooled:4.1f}x'
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""
+CPU benchmark of parsing a page once for all stages.
+
+Compares a checker and the link extraction that each parse the HTML
+(the former process_page) with both sharing one lazily parsed Document.
+The pages are article pages that run the full spektrum_is_ai check.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_shared_document [pages] [paragraphs]
+"""
+
+import random
+import sys
+import time
+from _crawling_functions import _checker_funcs, document, retrieve_data
+
+
+WORDS = (
+    'Forschung Studie Ergebnis Wissenschaft Klima Daten Modell Zelle '
+    'Gehirn Universität Experiment Messung Analyse Energie Physik'
+).split()
+
+
+def make_page(rng, paragraphs):
+    """Simulate an article page with navigation, text and teasers."""
+    nav = ''.join(
+        f'<li><a href="/thema/{i}/">Thema {i}</a></li>' for i in range(80)
+    )
+    text = ''.join(
+        '<p>' + ' '.join(rng.choice(WORDS) for _ in range(80)) + '</p>'
+        for _ in range(paragraphs)
+    )
+    teasers = ''.join(
+        f'<article><a href="/news/artikel/{rng.randint(1000, 99999)}">'
+        f'<h3>Teaser</h3></a></article>'
+        for _ in range(30)
+    )
+    return (
+        '<html><head><title>Artikel</title>'
+        '<meta name="keywords" content="Forschung, Physik, Klima">'
+        '<link rel="canonical" href="https://www.spektrum.de/news/x/123">'
+        f'</head><body><nav><ul>{nav}</ul></nav><main>{text}</main>'
+        f'<aside>{teasers}</aside></body></html>'
+    )
+
+
+def separate(html, url):
+    """The checker and the link extraction each parse the page."""
+    relevant = _checker_funcs.spektrum_is_ai(html, url)
+    return relevant, retrieve_data.get_link_info_from_html(html)
+
+
+def shared(html, url):
+    """The checker and the link extraction share one Document."""
+    page = document.Document(html, url)
+    relevant = document.call_checker(_checker_funcs.spektrum_is_ai, page)
+    return relevant, page.link_info()
+
+
+def measure(func, pages, url):
+    start = time.process_time()
+    for html in pages:
+        func(html, url)
+    return (time.process_time() - start) / len(pages)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    paragraphs = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    rng = random.Random(0)
+    pages = [make_page(rng, paragraphs) for _ in range(count)]
+    url = 'https://www.spektrum.de/news/ein-artikel/2212123'
+
+    # Both versions have to agree before timing them
+    for html in pages[:10]:
+        assert separate(html, url) == shared(html, url)
+
+    before = measure(separate, pages, url)
+    after = measure(shared, pages, url)
+
+    size = sum(len(html) for html in pages) / count / 1024
+    print(f'{count} pages of {size:.0f} KB')
+    print(f'parsed per stage:  {before * 1e3:7.2f} ms CPU/page')
+    print(f'shared document:   {after * 1e3:7.2f} ms CPU/page')
+    print(
+        f'saved: {(before - after) * 1e3:.2f} ms CPU/page '
+        f'({1 - after / before:.0%})'
+    )
+
+
+if __name__ == '__main__':
+    main()
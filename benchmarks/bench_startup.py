@@ -0,0 +1,103 @@
+"""
+Startup benchmark of a crawler with a large queue and visited list.
+
+Writes a site directory with generated queue.txt and visited.txt, and
+times the start of a crawler that reads and filters the whole text
+files against one that loads a snapshot and replays the lines appended
+since. Both have to restore the same queue and visited URLs before
+they are timed.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_startup [urls] [tail]
+"""
+
+import os
+import sys
+import tempfile
+import time
+from _crawling_functions import crawling_objects, new_crawlers
+
+
+PATTERNS = """
+[bench]
+base_url = https://www.spektrum.de
+article_url = https://www\\.spektrum\\.de/.*/[0-9]{2,}$
+not_article_url = https://www\\.spektrum\\.de/.*
+irrelevant_urls = #|\\.png|\\.xml|\\.jpg|quiz/
+"""
+
+
+def make_url(i):
+    return (
+        f'https://www.spektrum.de/news/ein-langer-artikel-titel-'
+        f'ueber-forschung/{i}'
+    )
+
+
+def make_site(directory, count):
+    for folder in ('nonarticle_pages', 'article_pages', 'resources'):
+        os.makedirs(os.path.join(directory, folder), exist_ok=True)
+    resources = os.path.join(directory, 'resources')
+    for name in ('error', 'graph', 'irrelevant', 'forbidden'):
+        open(os.path.join(resources, f'{name}.txt'), 'w').close()
+    with open(os.path.join(resources, 'queue.txt'), 'w') as file:
+        file.writelines(f'{make_url(i)}\n' for i in range(count))
+        file.writelines(f'{make_url(i)}.png\n' for i in range(0, count, 10))
+    with open(os.path.join(resources, 'visited.txt'), 'w') as file:
+        file.writelines(f'{make_url(i)}\n' for i in range(0, count, 2))
+
+
+def append_tail(directory, count, tail):
+    resources = os.path.join(directory, 'resources')
+    with open(os.path.join(resources, 'queue.txt'), 'a') as file:
+        file.writelines(
+            f'{make_url(i)}\n' for i in range(count, count + tail)
+        )
+    with open(os.path.join(resources, 'visited.txt'), 'a') as file:
+        file.writelines(f'{make_url(i)}\n' for i in range(1, 2 * tail, 2))
+
+
+def start(directory, config, interval):
+    settings = crawling_objects.CrawlSettings(
+        section='bench', robots=False, snapshot_interval=interval
+    )
+    started = time.perf_counter()
+    crawler = new_crawlers.ClassicCrawler(directory, config, settings)
+    return crawler, time.perf_counter() - started
+
+
+def state(crawler):
+    return sorted(crawler.to_crawl.entries()), set(crawler.crawled_urls)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    tail = int(sys.argv[2]) if len(sys.argv) > 2 else 10000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        config = os.path.join(tmp, 'patterns.ini')
+        with open(config, 'w') as file:
+            file.write(PATTERNS)
+        directory = os.path.join(tmp, 'bench')
+        make_site(directory, count)
+
+        crawler, _ = start(directory, config, 600)
+        crawler.save_state()
+        append_tail(directory, count, tail)
+
+        full, full_time = start(directory, config, 0)
+        full.save_state()
+        resumed, snapshot_time = start(directory, config, 600)
+        assert state(full) == state(resumed), 'the restored states differ'
+
+        print(
+            f'{len(full.to_crawl)} URLs queued, {len(full.crawled_urls)} '
+            f'visited, {tail} lines appended after the snapshot'
+        )
+        print(f'text files: {full_time:8.2f} s')
+        print(f'snapshot:   {snapshot_time:8.2f} s '
+              f'({full_time / snapshot_time:.1f}x)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""
+Memory benchmark of the visited URLs.
+
+Compares the memory held by a set of URL strings with the scalable
+Bloom filter, and measures the lookup time and the observed false
+positive rate of the filter.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_visited_memory [urls] [error_rate]
+"""
+
+import sys
+import time
+import tracemalloc
+from _crawling_functions import visited_filter
+
+
+def make_urls(count, offset=0):
+    return (
+        f'https://www.spektrum.de/news/ein-langer-artikel-titel-'
+        f'ueber-forschung/{offset + i}'
+        for i in range(count)
+    )
+
+
+def measure(build):
+    # Time without tracemalloc, which slows down every allocation
+    start = time.perf_counter()
+    build()
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    container = build()
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return container, memory, elapsed
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    error_rate = float(sys.argv[2]) if len(sys.argv) > 2 else 1e-5
+
+    url_set, set_memory, set_time = measure(lambda: set(make_urls(count)))
+
+    def build_bloom():
+        bloom = visited_filter.ScalableBloomFilter(error_rate)
+        bloom.update(make_urls(count))
+        return bloom
+    bloom, bloom_memory, bloom_time = measure(build_bloom)
+
+    probes = list(make_urls(100000, offset=count))
+    start = time.perf_counter()
+    false_positives = sum(url in bloom for url in probes)
+    lookup = (time.perf_counter() - start) / len(probes)
+
+    print(f'{count} URLs')
+    print(f'set:   {set_memory / 2**20:8.1f} MiB '
+          f'({set_memory / count:.0f} B/URL), built in {set_time:.1f}s')
+    print(f'bloom: {bloom_memory / 2**20:8.1f} MiB '
+          f'({bloom_memory / count:.1f} B/URL), built in {bloom_time:.1f}s')
+    print(f'bloom lookup: {lookup * 1e6:.1f} us, false positives: '
+          f'{false_positives}/{len(probes)} (target {error_rate})')
+    assert len(url_set) == count
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,37 @@
+import sys
+from _crawling_functions import crawling_objects, manifest
+
+
+def handle_cmd_line_args():
+    """Handle the command line arguments.
+
+    Returns:
+        tuple: The site directory and whether the manifest is rebuilt.
+    """
+    if len(sys.argv) < 2:
+        print('Usage: python build_manifest.py <site_dir> [--rebuild]')
+        sys.exit(1)
+
+    sitename = sys.argv[1]
+    if sitename.endswith('/'):
+        sitename = sitename[:-1]
+
+    return sitename, '--rebuild' in sys.argv[2:]
+
+
+def report(added):
+    if added % 10000 == 0:
+        print(f'{added} pages added')
+
+
+SITENAME, REBUILD = handle_cmd_line_args()
+
+tracking = crawling_objects.TrackingFiles(SITENAME)
+site_manifest = manifest.Manifest(tracking.manifest, SITENAME)
+added = manifest.build(site_manifest, rebuild=REBUILD, progress=report)
+print(f'Added {added} pages to {tracking.manifest}')
+print(
+    f'Manifest now lists {site_manifest.count("article")} article and '
+    f'{site_manifest.count("nonarticle")} board pages'
+)
+site_manifest.close()
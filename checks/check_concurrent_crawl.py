@@ -0,0 +1,101 @@
+"""
+Check of the concurrent fetch mode against a local stand-in site.
+
+Serves a small site from two hosts with http.server on 127.0.0.1 (see
+local_site.LocalSite) and crawls it once with start_crawling one page
+after the other and once with crawl_concurrently. Both have to store
+the same pages, all pages of the site, and the concurrent crawl must
+never have more than per_host requests in flight to one host.
+
+Usage (from the repository root):
+    python -m checks.check_concurrent_crawl [concurrency] [per_host]
+"""
+
+import asyncio
+import contextlib
+import os
+import sys
+import tempfile
+from _crawling_functions import crawling_objects, new_crawlers, page_store
+from checks import local_site
+
+
+SECTION = 'local'
+
+
+def stored_pages(directory):
+    goal = crawling_objects.GoalDirectory(directory)
+    return {
+        record['url']
+        for folder in (goal.article, goal.not_article)
+        for record in page_store.iter_documents(folder)
+    }
+
+
+def make_crawler(tmp, name, patterns, concurrency, per_host):
+    directory = os.path.join(tmp, name)
+    local_site.make_site_directory(directory)
+    settings = crawling_objects.CrawlSettings(
+        concurrency=concurrency, per_host=per_host, delay=(0, 0),
+        section=SECTION, metrics_interval=0
+    )
+    return directory, new_crawlers.ClassicCrawler(
+        directory, config=patterns, settings=settings
+    )
+
+
+def crawl_concurrently(crawler):
+    """Run crawl_concurrently the way start_crawling does."""
+    crawler.ready_to_crawl()
+    try:
+        asyncio.run(crawler.crawl_concurrently())
+    finally:
+        crawler.save_state()
+
+
+def main():
+    concurrency = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    per_host = int(sys.argv[2]) if len(sys.argv) > 2 else 2
+
+    with tempfile.TemporaryDirectory() as tmp:
+        site = local_site.LocalSite(os.path.join(tmp, 'www')).start()
+        try:
+            patterns = os.path.join(tmp, 'patterns.ini')
+            site.write_patterns(patterns, SECTION)
+
+            # The crawlers report every page, only the result is shown
+            with open(os.devnull, 'w') as devnull, \
+                    contextlib.redirect_stdout(devnull):
+                directory, crawler = make_crawler(
+                    tmp, 'sequential', patterns, 1, 1
+                )
+                crawler.start_crawling()
+                sequential = stored_pages(directory)
+
+                site.reset_counts()
+                directory, crawler = make_crawler(
+                    tmp, 'concurrent', patterns, concurrency, per_host
+                )
+                crawl_concurrently(crawler)
+                concurrent = stored_pages(directory)
+        finally:
+            site.stop()
+
+    assert sequential == site.pages(), (
+        f'the sequential crawl missed {site.pages() - sequential}'
+    )
+    assert concurrent == sequential, (
+        f'the concurrent crawl stored other pages: missing '
+        f'{sequential - concurrent}, extra {concurrent - sequential}'
+    )
+    for host, count in site.max_in_flight.items():
+        assert count <= per_host, (
+            f'{count} requests in flight to {host}, per_host is {per_host}'
+        )
+    print(f'concurrent crawl: {len(concurrent)} pages as in the sequential '
+          f'crawl, at most {max(site.max_in_flight.values())} of {per_host} '
+          f'requests per host and {site.max_total} in all in flight')
+
+
+if __name__ == '__main__':
+    main()
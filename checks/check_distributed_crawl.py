@@ -0,0 +1,198 @@
+"""
+Check of the distributed crawl with several workers on one machine.
+
+Serves a small site from three hosts with http.server on 127.0.0.1 (see
+local_site.LocalSite) and starts a coordinator and two workers of
+crawl_distributed.py as separate processes. Once the second worker
+has stored a few pages, it is stopped with SIGTERM and hands off its
+hosts and queue, and a third worker joins. No worker dies without
+handing off, so no lease times out and no page may be crawled twice
+(see distributed): the workers together have to store every page of
+the site exactly once, and every worker has to exit cleanly. Set
+SHOW_LOGS=1 to print the output of all processes.
+
+Usage (from the repository root):
+    python -m checks.check_distributed_crawl [pages_before_stop]
+"""
+
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from _crawling_functions import crawling_objects, distributed, page_store
+from checks import local_site
+
+
+SITE = 'local'
+REPOSITORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPT = os.path.join(REPOSITORY, 'crawl_distributed.py')
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class Processes:
+    """The coordinator and worker processes, logging to files."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.running = {}
+        self.env = dict(
+            os.environ,
+            PYTHONPATH=REPOSITORY + os.pathsep + os.environ.get(
+                'PYTHONPATH', ''
+            ),
+            PYTHONUNBUFFERED='1'
+        )
+
+    def start(self, name, *args):
+        log = open(os.path.join(self.directory, f'{name}.log'), 'w')
+        self.running[name] = subprocess.Popen(
+            [sys.executable, SCRIPT, *args], cwd=self.directory,
+            stdout=log, stderr=subprocess.STDOUT, env=self.env
+        )
+        log.close()
+
+    def wait(self, name, timeout):
+        return self.running[name].wait(timeout)
+
+    def log(self, name):
+        with open(os.path.join(self.directory, f'{name}.log')) as file:
+            return file.read()
+
+    def stop_all(self):
+        # The workers hand off their queue to the coordinator, so it is
+        # stopped last
+        for process in reversed(list(self.running.values())):
+            if process.poll() is None:
+                process.send_signal(signal.SIGINT)
+            try:
+                process.wait(10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+def stored_pages(site_dir):
+    """List the URLs stored by all workers, a URL once per copy."""
+    urls = []
+    workers = os.path.join(site_dir, 'workers')
+    for worker in sorted(os.listdir(workers)):
+        goal = crawling_objects.GoalDirectory(os.path.join(workers, worker))
+        for folder in (goal.article, goal.not_article):
+            urls.extend(
+                record['url'] for record in page_store.iter_documents(folder)
+            )
+    return urls
+
+
+def wait_for_pages(processes, name, goal, count, timeout=60):
+    """Wait until a worker has stored count pages, or fail."""
+    folders = (goal.article, goal.not_article)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        assert processes.running[name].poll() is None, (
+            f'worker {name} exited before it stored {count} pages:\n'
+            f'{processes.log(name)[-2000:]}'
+        )
+        stored = sum(
+            page_store.count_documents(folder) for folder in folders
+            if os.path.isdir(folder)
+        )
+        if stored >= count:
+            return stored
+        time.sleep(0.1)
+    raise AssertionError(f'worker {name} stored no {count} pages in time')
+
+
+def worker_ids(hosts):
+    """
+    Name the workers so that each of the first two owns a host, and the
+    stopped one has hosts to hand off whatever ports the site got.
+    """
+    for number in range(2, 100):
+        first, second = 'w1', f'w{number}'
+        owners = {
+            distributed.owner_of(host, [first, second]) for host in hosts
+        }
+        if owners == {first, second}:
+            return first, second, f'w{number + 1}'
+    raise RuntimeError('No worker ids share the hosts')
+
+
+def main():
+    stop_after = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+
+    with tempfile.TemporaryDirectory() as tmp:
+        site = local_site.LocalSite(
+            os.path.join(tmp, 'www'), hosts=3, boards=4, articles=12,
+            latency=0.1
+        ).start()
+        first, stopped, joining = worker_ids(site.hosts)
+        site.write_patterns(os.path.join(tmp, 'patterns.ini'), SITE)
+        address = f'127.0.0.1:{free_port()}'
+        worker_args = (
+            '--coordinator', address, '--delay', '0', '0',
+            '--concurrency', '4', '--sync-interval', '0.5'
+        )
+
+        processes = Processes(tmp)
+        try:
+            processes.start(
+                'coordinator', 'coordinator', '--listen', address,
+                '--db', os.path.join(tmp, 'coordinator.sqlite')
+            )
+            time.sleep(1)
+            processes.start('w1', 'worker', SITE, '--id', first, *worker_args)
+            processes.start(
+                'w2', 'worker', SITE, '--id', stopped, *worker_args
+            )
+
+            # Stop a worker mid-crawl, it hands off its hosts and queue
+            stopped_at = wait_for_pages(
+                processes, 'w2', crawling_objects.GoalDirectory(
+                    os.path.join(tmp, SITE, 'workers', stopped)
+                ),
+                stop_after
+            )
+            processes.running['w2'].send_signal(signal.SIGTERM)
+            processes.start(
+                'w3', 'worker', SITE, '--id', joining, *worker_args
+            )
+
+            # The stopped worker exits like after Ctrl-C, the others
+            # once the coordinator tells them the crawl is done
+            for name, codes in (('w2', (0, 130)), ('w1', (0,)), ('w3', (0,))):
+                code = processes.wait(name, 180)
+                assert code in codes, (
+                    f'worker {name} exited with {code}:\n'
+                    f'{processes.log(name)[-2000:]}'
+                )
+        finally:
+            processes.stop_all()
+            site.stop()
+            if os.environ.get('SHOW_LOGS'):
+                for name in processes.running:
+                    print(f'--- {name}', processes.log(name), sep='\n')
+
+        handed_off = 'Handed off' in processes.log('w2')
+        stored = stored_pages(os.path.join(tmp, SITE))
+
+    assert handed_off, 'the stopped worker did not hand off its URLs'
+    duplicates = len(stored) - len(set(stored))
+    assert duplicates == 0, f'{duplicates} pages were stored twice'
+    assert set(stored) == site.pages(), (
+        f'the workers missed {site.pages() - set(stored)}'
+    )
+    print(f'distributed crawl: {len(stored)} pages of {len(site.hosts)} '
+          f'hosts stored once by 3 workers, one of them stopped after '
+          f'{stopped_at} pages')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+Check of a crawl whose frontier is too small for the site, resumed from
+snapshots.
+
+Serves a small site from two hosts with http.server on 127.0.0.1 (see
+local_site.LocalSite) and crawls it again and again with a frontier
+limit of a few URLs, once resuming from the snapshot of the last run
+and once reading the text files. The URLs the full frontier dropped are
+only in queue.txt, so both have to come back to them and store all
+pages of the site within a bounded number of runs.
+
+Usage (from the repository root):
+    python -m checks.check_frontier_snapshot [frontier_limit] [max_runs]
+"""
+
+import contextlib
+import os
+import sys
+import tempfile
+from _crawling_functions import crawling_objects, new_crawlers
+from checks import local_site
+from checks.check_concurrent_crawl import SECTION, stored_pages
+
+
+def crawl_until_complete(tmp, name, patterns, site, settings, max_runs):
+    """
+    Crawl the site with a new crawler until it stored every page.
+
+    Returns:
+        int: The number of runs, or None if max_runs were not enough.
+    """
+    directory = os.path.join(tmp, name)
+    local_site.make_site_directory(directory)
+    for run in range(1, max_runs + 1):
+        crawler = new_crawlers.ClassicCrawler(
+            directory, config=patterns, settings=settings
+        )
+        crawler.start_crawling()
+        if stored_pages(directory) == site.pages():
+            return run
+    return None
+
+
+def main():
+    frontier_limit = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    max_runs = int(sys.argv[2]) if len(sys.argv) > 2 else 30
+
+    runs = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        site = local_site.LocalSite(os.path.join(tmp, 'www')).start()
+        try:
+            patterns = os.path.join(tmp, 'patterns.ini')
+            site.write_patterns(patterns, SECTION)
+            with open(os.devnull, 'w') as devnull, \
+                    contextlib.redirect_stdout(devnull):
+                for name, interval in (('snapshots', 600.0), ('text', 0)):
+                    settings = crawling_objects.CrawlSettings(
+                        delay=(0, 0), section=SECTION, metrics_interval=0,
+                        frontier_limit=frontier_limit,
+                        snapshot_interval=interval
+                    )
+                    runs[name] = crawl_until_complete(
+                        tmp, name, patterns, site, settings, max_runs
+                    )
+        finally:
+            site.stop()
+
+    for name, count in runs.items():
+        assert count is not None, (
+            f'the crawl from the {name} did not store all '
+            f'{len(site.pages())} pages in {max_runs} runs'
+        )
+    print(f'frontier limit {frontier_limit}: all {len(site.pages())} pages '
+          f'stored in {runs["snapshots"]} runs resuming from snapshots and '
+          f'{runs["text"]} runs reading the text files')
+
+
+if __name__ == '__main__':
+    main()
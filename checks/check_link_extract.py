@@ -0,0 +1,71 @@
+"""
+Equivalence check of the link extraction.
+
+Runs the lxml based link_extract.get_link_info and the BeautifulSoup
+based retrieve_data.get_link_info_from_html on pages that exercise the
+edge cases of the extraction, with and without skipping rel=nofollow
+links. Both have to find the same links, <base> href and canonical href
+on every page. To check the pages of a crawled site as well, run
+benchmarks/bench_link_extract.py on its directory.
+
+Usage (from the repository root):
+    python -m checks.check_link_extract
+"""
+
+import sys
+from _crawling_functions import link_extract, retrieve_data
+
+
+EDGE_CASES = (
+    '',
+    '   ',
+    '<html></html>',
+    '<?xml version="1.0" encoding="utf-8"?><html><a href="/x">x</a></html>',
+    '<a href="/a">one</a><a href="/a">again</a><a>no href</a><a href="">e</a>',
+    '<base href="/sub/"><base href="/ignored/"><a href="rel">r</a>',
+    '<link rel="stylesheet canonical" href="/c1"><link rel=canonical href=/c2>',
+    '<a href="/n" rel="nofollow noopener">n</a><A HREF="/upper">u</A>',
+    '<a href="/q?a=1&amp;b=2">amp</a><a href="  /space  ">s</a>',
+    '<p><a href="/broken">unclosed <div><a href="/nested">n</a>',
+    '<!-- <a href="/comment">c</a> --><script>var a = \'<a href="/js">\';'
+    '</script><a href="/after">a</a>',
+    '<svg><a href="/svg">s</a></svg><template><a href="/tpl">t</a></template>',
+    '<a href="/upper-rel" rel="NoFollow">u</a><a href="/f" rel="follow">f</a>',
+    '<a href="/n1" rel="nofollow">1</a><a href="/n1">same href followed</a>',
+    '<link rel="canonical nofollow" href="/c-nofollow"><a href="/x">x</a>',
+    '<a href="/tabs" rel="\tnoopener\n nofollow ">t</a>',
+    '<link rel="nofollow" href="/l"><base href="/b/" rel="nofollow">',
+)
+
+
+def differences(skip_nofollow):
+    """Return the edge cases on which both extractions differ."""
+    return [
+        html for html in EDGE_CASES
+        if retrieve_data.get_link_info_from_html(html, skip_nofollow)
+        != link_extract.get_link_info(html, skip_nofollow)
+    ]
+
+
+def main():
+    failed = False
+    for skip_nofollow in (False, True):
+        for html in differences(skip_nofollow):
+            failed = True
+            print(f'Different links (skip_nofollow={skip_nofollow}):', html)
+            print('  soup:', retrieve_data.get_link_info_from_html(
+                html, skip_nofollow
+            ))
+            print('  lxml:', link_extract.get_link_info(html, skip_nofollow))
+    if failed:
+        sys.exit(1)
+    assert any(
+        link_extract.get_link_info(html, True)[0]
+        != link_extract.get_link_info(html)[0] for html in EDGE_CASES
+    ), 'no edge case has a nofollow link'
+    print(f'link extraction: {len(EDGE_CASES)} pages identical, '
+          f'with and without nofollow links')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""
+Crash recovery check of the segment store.
+
+Writes pages to a segment folder, then simulates crashes that leave a
+torn last line in the index (cut inside the length, and cut before the
+fields are complete) or a partly written record in the segment. After
+every crash the folder is opened again and one more page is written.
+Every page listed in the index has to be readable from its offset,
+the segment has to read to its end and the index has to list the page
+written after the crash.
+
+Usage (from the repository root):
+    python -m checks.check_segment_recovery
+"""
+
+import os
+import tempfile
+from _crawling_functions import page_store
+
+
+def write_pages(folder, start, count):
+    writer = page_store.SegmentWriter(folder)
+    for i in range(start, start + count):
+        writer.write(f'https://www.example.org/{i}', f'<p>Seite {i}</p>' * 50)
+    writer.close()
+
+
+def check_folder(folder, expected_last):
+    index = list(page_store.iter_index(folder))
+    for url, segment, offset, length in index:
+        record = page_store.read_record(folder, segment, offset, length)
+        assert record['url'] == url, f'{url} is not at its offset'
+    stored = [
+        record['url'] for name in sorted(os.listdir(folder))
+        if page_store.is_segment(name)
+        for record in page_store.iter_segment(os.path.join(folder, name))
+    ]
+    assert stored == [url for url, *_ in index], (
+        'the segments and the index list other pages'
+    )
+    assert index[-1][0] == expected_last, 'the last page is not indexed'
+    return len(index)
+
+
+def tear_index(folder, keep):
+    """Cut the last line of the index after `keep` of its characters."""
+    path = os.path.join(folder, page_store.INDEX_FILE)
+    with open(path, 'rb') as file:
+        data = file.read()
+    last = data.rstrip(b'\n').rfind(b'\n') + 1
+    with open(path, 'r+b') as file:
+        file.truncate(last + keep(data[last:]))
+
+
+def main():
+    with tempfile.TemporaryDirectory() as folder:
+        write_pages(folder, 0, 10)
+
+        # Cut inside the length: the line still has four fields
+        tear_index(folder, lambda line: len(line) - 2)
+        write_pages(folder, 100, 1)
+        count = check_folder(folder, 'https://www.example.org/100')
+        assert count == 10, f'{count} pages indexed instead of 10'
+
+        # Cut after the URL
+        tear_index(folder, lambda line: line.index(b'\t') + 3)
+        write_pages(folder, 200, 1)
+        count = check_folder(folder, 'https://www.example.org/200')
+        assert count == 10, f'{count} pages indexed instead of 10'
+
+        # A record cut short in the segment, its index line never written
+        segment = os.path.join(folder, page_store.segment_name(0))
+        with open(segment, 'ab') as file:
+            file.write(b'\x1f\x8b\x08\x00partial')
+        write_pages(folder, 300, 1)
+        count = check_folder(folder, 'https://www.example.org/300')
+        assert count == 11, f'{count} pages indexed instead of 11'
+
+    print('segment recovery: ok')
+
+
+if __name__ == '__main__':
+    main()
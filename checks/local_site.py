@@ -0,0 +1,165 @@
+"""
+A small stand-in site served by http.server on 127.0.0.1 for the checks
+that crawl. The site spans several hosts (one port each) that link to
+each other, and every server counts the requests it is answering at the
+same time.
+
+Author: Bruno Brocai
+"""
+
+import http.server
+import os
+import threading
+import time
+
+
+PATTERNS = """
+[{section}]
+base_url = {base_url}
+article_url = http://127\\.0\\.0\\.1:[0-9]+/p[0-9]+\\.html
+not_article_url = http://127\\.0\\.0\\.1:[0-9]+/.*
+irrelevant_urls = #|\\.png
+"""
+
+RESOURCES = (
+    'visited.txt', 'error.txt', 'graph.txt', 'queue.txt', 'irrelevant.txt',
+    'forbidden.txt'
+)
+
+
+class Handler(http.server.SimpleHTTPRequestHandler):
+    """Serve the folder of a host and count the requests in flight."""
+
+    def do_GET(self):
+        self.server.site.started(self.server.host)
+        try:
+            # Keep the request open long enough to overlap with others
+            time.sleep(self.server.site.latency)
+            super().do_GET()
+        finally:
+            self.server.site.finished(self.server.host)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class LocalSite:
+    """
+    Serve a generated site from several hosts.
+
+    Every host has an index page linking to its board pages. Every board
+    links to some articles of its own host and of the next host.
+
+    Args:
+        root (str): The folder the pages are written to.
+        hosts (int): The number of hosts (ports).
+        boards (int): The board pages per host.
+        articles (int): The articles per board.
+        latency (float): Seconds every request is held open.
+    """
+
+    def __init__(self, root, hosts=2, boards=3, articles=6, latency=0.05):
+        self.root = root
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.in_flight = {}
+        self.max_in_flight = {}
+        self.total_in_flight = 0
+        self.max_total = 0
+
+        self.servers = []
+        for number in range(hosts):
+            folder = os.path.join(root, f'host{number}')
+            os.makedirs(folder, exist_ok=True)
+            server = http.server.ThreadingHTTPServer(
+                ('127.0.0.1', 0),
+                lambda *args, folder=folder: Handler(*args, directory=folder)
+            )
+            server.daemon_threads = True
+            server.site = self
+            server.host = f'127.0.0.1:{server.server_address[1]}'
+            self.servers.append(server)
+        self.hosts = [server.host for server in self.servers]
+        self.write_pages(boards, articles)
+
+    @property
+    def base_url(self):
+        return f'http://{self.hosts[0]}'
+
+    def write_pages(self, boards, articles):
+        self.urls = []
+        for number, host in enumerate(self.hosts):
+            folder = os.path.join(self.root, f'host{number}')
+            other = self.hosts[(number + 1) % len(self.hosts)]
+            links = ''.join(
+                f'<a href="/board{i}">Board {i}</a>' for i in range(boards)
+            )
+            self.write(folder, 'index.html', links)
+            for board in range(boards):
+                links = ''.join(
+                    f'<a href="/p{board * articles + i}.html">Artikel</a>'
+                    for i in range(articles)
+                ) + (
+                    f'<a href="http://{other}/p{board * articles}.html">'
+                    'Anderer Host</a><a href="/logo.png">Logo</a>'
+                    '<a href="#top">Oben</a>'
+                )
+                self.write(folder, f'board{board}', links)
+            for page in range(boards * articles):
+                self.write(
+                    folder, f'p{page}.html',
+                    f'<p>Artikel {page} auf {host}</p><a href="/">Start</a>'
+                )
+
+    def write(self, folder, name, body):
+        with open(os.path.join(folder, name), 'w', encoding='utf-8') as file:
+            file.write(f'<html><body>{body}</body></html>')
+        host = self.hosts[int(os.path.basename(folder)[len('host'):])]
+        path = '/' if name == 'index.html' else f'/{name}'
+        self.urls.append(f'http://{host}{path}')
+
+    def started(self, host):
+        with self.lock:
+            self.in_flight[host] = self.in_flight.get(host, 0) + 1
+            self.max_in_flight[host] = max(
+                self.max_in_flight.get(host, 0), self.in_flight[host]
+            )
+            self.total_in_flight += 1
+            self.max_total = max(self.max_total, self.total_in_flight)
+
+    def finished(self, host):
+        with self.lock:
+            self.in_flight[host] -= 1
+            self.total_in_flight -= 1
+
+    def reset_counts(self):
+        with self.lock:
+            self.max_in_flight = {}
+            self.max_total = 0
+
+    def start(self):
+        for server in self.servers:
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        for server in self.servers:
+            server.shutdown()
+            server.server_close()
+
+    def pages(self):
+        """Return the URLs of all pages a complete crawl stores."""
+        return set(self.urls)
+
+    def write_patterns(self, path, section):
+        """Write a patterns file with a section for the site."""
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(PATTERNS.format(section=section, base_url=self.base_url))
+
+
+def make_site_directory(directory):
+    """Create a site directory like MkCrawlingDir.py."""
+    for folder in ('nonarticle_pages', 'article_pages', 'resources'):
+        os.makedirs(os.path.join(directory, folder), exist_ok=True)
+    for name in RESOURCES:
+        open(os.path.join(directory, 'resources', name), 'a').close()
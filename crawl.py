@@ -1,6 +1,9 @@
 import typer
-from typing import Optional
-from _crawling_functions import new_crawlers, _checker_funcs
+from typing import List, Optional, Tuple
+from _crawling_functions import (
+    new_crawlers, _checker_funcs, checker_spec, crawling_objects,
+    http_client, browser_pool, metrics
+)
 
 
 app = typer.Typer()
@@ -11,18 +14,177 @@ def validate_url(url: str) -> str:
         return url[:-1]
     return url
 
+def validate_store(store: str) -> str:
+    """Check that the queue store is one the crawler knows."""
+    if store not in new_crawlers.STORES:
+        raise typer.BadParameter(
+            f"Unknown store '{store}', choose from {list(new_crawlers.STORES)}"
+        )
+    return store
+
 @app.command()
 def crawl(
     url: str = typer.Argument(..., help="Site directory to crawl"),
     checker_function: Optional[str] = typer.Option(
         None,
         "--checker", "-c",
-        help="Name of the checker function from _checker_funcs to use"
+        help="Name of the checker function from _checker_funcs "
+             "or of a checker section in checkers.ini"
     ),
     dynamic_content: Optional[bool] = typer.Option(
         False,
         "--dynamic", "-d",
         help="Enable dynamic content crawling"
+    ),
+    concurrency: int = typer.Option(
+        1,
+        "--concurrency", "-n",
+        help="Number of requests kept in flight at once (1 = sequential)"
+    ),
+    per_host: int = typer.Option(
+        1,
+        "--per-host",
+        help="Maximum number of simultaneous requests to one host"
+    ),
+    delay: Tuple[float, float] = typer.Option(
+        (3, 7),
+        "--delay",
+        help="Range of seconds to wait between two requests to one host, "
+             "slowed down by robots.txt and by overloaded hosts"
+    ),
+    headers: Optional[List[str]] = typer.Option(
+        None,
+        "--header", "-H",
+        help="Default header sent with every request, as 'Name: value'"
+    ),
+    browser_pages: int = typer.Option(
+        1,
+        "--browser-pages",
+        help="Number of browser pages kept open for dynamic crawling"
+    ),
+    recycle_after: int = typer.Option(
+        50,
+        "--recycle-after",
+        help="Replace a browser page after it rendered this many pages"
+    ),
+    ordering: str = typer.Option(
+        'bfs',
+        "--order",
+        help="Order of the queue: bfs, article (articles first) or host"
+    ),
+    frontier_limit: Optional[int] = typer.Option(
+        None,
+        "--frontier-limit",
+        help="Maximum number of queued URLs kept in memory"
+    ),
+    store: str = typer.Option(
+        'memory',
+        "--store",
+        callback=validate_store,
+        help="Keep queue and visited URLs in memory or in an sqlite database"
+    ),
+    visited: str = typer.Option(
+        'set',
+        "--visited",
+        help="Hold visited URLs in a set or in a compact bloom filter"
+    ),
+    visited_error_rate: float = typer.Option(
+        1e-5,
+        "--visited-error-rate",
+        help="False positive rate of the bloom filter"
+    ),
+    snapshot_interval: float = typer.Option(
+        10,
+        "--snapshot-interval",
+        help="Minutes between two snapshots of queue and visited URLs, "
+             "0 to read the whole text files at every start"
+    ),
+    metrics_interval: float = typer.Option(
+        10,
+        "--metrics-interval",
+        help="Seconds between two samples written to resources/metrics.tsv, "
+             "0 to write none"
+    ),
+    metrics_port: Optional[int] = typer.Option(
+        None,
+        "--metrics-port",
+        help="Port of a local HTTP endpoint exporting the metrics at "
+             "/metrics in the Prometheus format"
+    ),
+    storage: str = typer.Option(
+        'json',
+        "--storage",
+        help="Store pages as one json file each or in jsonl segments"
+    ),
+    segment_size: int = typer.Option(
+        64,
+        "--segment-size",
+        help="Size of a jsonl segment in MB"
+    ),
+    dedup: str = typer.Option(
+        'off',
+        "--dedup",
+        help="Do not store duplicate pages: off, exact or near"
+    ),
+    dedup_distance: int = typer.Option(
+        3,
+        "--dedup-distance",
+        help="Number of differing SimHash bits still counted as duplicate"
+    ),
+    duplicate_links: bool = typer.Option(
+        True,
+        "--duplicate-links/--skip-duplicate-links",
+        help="Queue the links found on duplicate pages"
+    ),
+    refresh: bool = typer.Option(
+        False,
+        "--refresh",
+        help="Crawl the board pages that are due for a revisit again"
+    ),
+    revisit_interval: Tuple[float, float] = typer.Option(
+        (1, 168),
+        "--revisit-interval",
+        help="Shortest and longest hours between two visits of a board page"
+    ),
+    use_journal: bool = typer.Option(
+        True,
+        "--journal/--no-journal",
+        help="Write the resource files through a journal with group commit"
+    ),
+    fsync: str = typer.Option(
+        'periodic',
+        "--fsync",
+        help="When the journal is synced to disk: always, periodic or never"
+    ),
+    group_commit: int = typer.Option(
+        16,
+        "--group-commit",
+        help="Number of pages written to the journal together"
+    ),
+    follow_nofollow: bool = typer.Option(
+        True,
+        "--follow-nofollow/--skip-nofollow",
+        help="Queue links marked rel=nofollow"
+    ),
+    obey_robots: bool = typer.Option(
+        True,
+        "--robots/--ignore-robots",
+        help="Do not queue urls disallowed by the robots.txt of their host"
+    ),
+    robots_ttl: float = typer.Option(
+        24,
+        "--robots-ttl",
+        help="Hours a cached robots.txt is used before it is fetched again"
+    ),
+    workers: int = typer.Option(
+        0,
+        "--workers", "-w",
+        help="Number of processes parsing the fetched pages (0 = none)"
+    ),
+    parse_queue: Optional[int] = typer.Option(
+        None,
+        "--parse-queue",
+        help="Maximum number of fetched pages waiting to be parsed"
     )
 ):
     """
@@ -32,18 +194,88 @@ def crawl(
     otherwise it will use the ClassicCrawler.
     """
     site_url = validate_url(url)
+    try:
+        http_client.configure(
+            headers=http_client.parse_header_options(headers),
+            pool_maxsize=max(16, concurrency)
+        )
+    except ValueError as e:
+        typer.echo(f"Error: {e}")
+        raise typer.Exit(1)
+
+    if metrics_port is not None:
+        try:
+            metrics.serve(metrics_port)
+        except OSError as e:
+            typer.echo(f"Error: Cannot serve the metrics: {e}")
+            raise typer.Exit(1)
+        typer.echo(
+            f"Metrics at http://127.0.0.1:{metrics_port}/metrics"
+        )
+
+    if dynamic_content:
+        browser_pool.configure(size=browser_pages, recycle_after=recycle_after)
+
+    settings = crawling_objects.CrawlSettings(
+        concurrency=concurrency,
+        per_host=per_host,
+        delay=delay,
+        ordering=ordering,
+        frontier_limit=frontier_limit,
+        store=store,
+        visited=visited,
+        visited_error_rate=visited_error_rate,
+        snapshot_interval=snapshot_interval * 60,
+        metrics_interval=metrics_interval,
+        storage=storage,
+        segment_size=segment_size * 2**20,
+        dedup=dedup,
+        dedup_distance=dedup_distance,
+        duplicate_links=duplicate_links,
+        refresh=refresh,
+        revisit_interval=tuple(hours * 3600 for hours in revisit_interval),
+        journal=use_journal,
+        fsync=fsync,
+        group_commit=group_commit,
+        follow_nofollow=follow_nofollow,
+        robots=obey_robots,
+        robots_ttl=robots_ttl * 3600,
+        workers=workers,
+        parse_queue=parse_queue
+    )
 
     if checker_function:
+        # A function from _checker_funcs or a section of checkers.ini
         try:
             check_func = getattr(_checker_funcs, checker_function)
-            crawler = new_crawlers.CheckerCrawler(site_url, check_func)
         except AttributeError:
-            available_funcs = [f for f in dir(_checker_funcs)
-                             if not f.startswith('_')]
-            typer.echo(f"Error: Invalid checker function. Available functions: {available_funcs}")
-            raise typer.Exit(1)
-    else:
-        crawler = new_crawlers.ClassicCrawler(site_url)
+            try:
+                specs = checker_spec.load_checkers('checkers.ini')
+            except ValueError as e:
+                typer.echo(f"Error in checkers.ini: {e}")
+                raise typer.Exit(1)
+            if checker_function not in specs:
+                available_funcs = [f for f in dir(_checker_funcs)
+                                 if not f.startswith('_')]
+                typer.echo(f"Error: Invalid checker function. Available functions: {available_funcs}, checkers.ini: {list(specs)}")
+                raise typer.Exit(1)
+            check_func = specs[checker_function]
+
+    # A missing patterns.ini section or an unknown setting ends here
+    try:
+        if checker_function:
+            crawler = new_crawlers.CheckerCrawler(
+                site_url, check_func, settings=settings
+            )
+        else:
+            crawler = new_crawlers.ClassicCrawler(site_url, settings=settings)
+    except KeyError as e:
+        typer.echo(f"Error: Cannot crawl {site_url}: no section {e} "
+                   f"in patterns.ini")
+        raise typer.Exit(1)
+    except (OSError, ValueError) as e:
+        typer.echo(f"Error: Cannot crawl {site_url}: {e}")
+        raise typer.Exit(1)
 
     try:
         crawler.start_crawling(dynamic_pages=dynamic_content)
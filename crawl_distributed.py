@@ -0,0 +1,213 @@
+import json
+import signal
+import typer
+from typing import List, Optional, Tuple
+from _crawling_functions import (
+    _checker_funcs, checker_spec, crawling_objects, distributed, http_client,
+    metrics
+)
+
+
+app = typer.Typer()
+
+
+def parse_address(address):
+    """Split 'host:port' into the address tuple of a socket."""
+    host, sep, port = address.rpartition(':')
+    if not sep or not port.isdigit():
+        raise typer.BadParameter(
+            f"Invalid address '{address}', expected 'host:port'"
+        )
+    return host or '127.0.0.1', int(port)
+
+
+@app.command()
+def coordinator(
+    database: str = typer.Option(
+        'coordinator.sqlite',
+        "--db",
+        help="Path of the inbox database of the forwarded links"
+    ),
+    address: str = typer.Option(
+        '127.0.0.1:8740',
+        "--listen", "-l",
+        help="Address to listen on, as 'host:port'"
+    ),
+    worker_timeout: float = typer.Option(
+        distributed.WORKER_TIMEOUT,
+        "--worker-timeout",
+        help="Seconds without heartbeat after which a worker is gone"
+    ),
+    lease_time: float = typer.Option(
+        distributed.LEASE_TIME,
+        "--lease-time",
+        help="Seconds a worker has to acknowledge the links it leased"
+    )
+):
+    """
+    Run the coordinator of a distributed crawl until interrupted.
+    """
+    state = distributed.Coordinator(database, worker_timeout, lease_time)
+    server = distributed.CoordinatorServer(parse_address(address), state)
+    typer.echo(f"Coordinator listening on {address}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        state.close()
+
+
+@app.command()
+def worker(
+    site: str = typer.Argument(
+        ..., help="Site directory (patterns.ini section) to crawl"
+    ),
+    worker_id: str = typer.Option(
+        ...,
+        "--id",
+        help="Unique id of the worker, keep it when restarting the worker"
+    ),
+    address: str = typer.Option(
+        '127.0.0.1:8740',
+        "--coordinator",
+        help="Address of the coordinator, as 'host:port'"
+    ),
+    checker_function: Optional[str] = typer.Option(
+        None,
+        "--checker", "-c",
+        help="Name of the checker function from _checker_funcs "
+             "or of a checker section in checkers.ini"
+    ),
+    concurrency: int = typer.Option(
+        4,
+        "--concurrency", "-n",
+        help="Number of requests kept in flight at once"
+    ),
+    per_host: int = typer.Option(
+        1,
+        "--per-host",
+        help="Maximum number of simultaneous requests to one host"
+    ),
+    delay: Tuple[float, float] = typer.Option(
+        (3, 7),
+        "--delay",
+        help="Range of seconds to wait between two requests to one host"
+    ),
+    max_pages: Optional[int] = typer.Option(
+        None,
+        "--max-pages",
+        help="Maximum number of pages crawled by this worker"
+    ),
+    sync_interval: float = typer.Option(
+        2.0,
+        "--sync-interval",
+        help="Seconds between two exchanges of links with the coordinator"
+    ),
+    headers: Optional[List[str]] = typer.Option(
+        None,
+        "--header", "-H",
+        help="Default header sent with every request, as 'Name: value'"
+    ),
+    storage: str = typer.Option(
+        'json',
+        "--storage",
+        help="Store pages as one json file each or in jsonl segments"
+    ),
+    metrics_port: Optional[int] = typer.Option(
+        None,
+        "--metrics-port",
+        help="Port of a local HTTP endpoint exporting the metrics at "
+             "/metrics in the Prometheus format"
+    )
+):
+    """
+    Crawl the hosts of a site that the coordinator assigns to this worker.
+
+    The worker stores its pages and crawl state in <site>/workers/<id>.
+    """
+    try:
+        http_client.configure(
+            headers=http_client.parse_header_options(headers),
+            pool_maxsize=max(16, concurrency)
+        )
+    except ValueError as e:
+        typer.echo(f"Error: {e}")
+        raise typer.Exit(1)
+
+    if metrics_port is not None:
+        try:
+            metrics.serve(metrics_port)
+        except OSError as e:
+            typer.echo(f"Error: Cannot serve the metrics: {e}")
+            raise typer.Exit(1)
+
+    checker_func = None
+    if checker_function:
+        try:
+            checker_func = getattr(_checker_funcs, checker_function)
+        except AttributeError:
+            try:
+                specs = checker_spec.load_checkers('checkers.ini')
+            except ValueError as e:
+                typer.echo(f"Error in checkers.ini: {e}")
+                raise typer.Exit(1)
+            if checker_function not in specs:
+                typer.echo(f"Error: Unknown checker '{checker_function}'")
+                raise typer.Exit(1)
+            checker_func = specs[checker_function]
+
+    site = site.rstrip('/')
+    settings = crawling_objects.CrawlSettings(
+        concurrency=concurrency,
+        per_host=per_host,
+        delay=delay,
+        storage=storage,
+        section=site
+    )
+    # Stopping the worker hands off its queue like Ctrl-C does
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    client = distributed.CoordinatorClient(parse_address(address))
+    try:
+        crawler = distributed.DistributedCrawler(
+            distributed.worker_directory(site, worker_id),
+            worker_id,
+            client,
+            checker_func,
+            settings=settings,
+            sync_interval=sync_interval
+        )
+        crawler.start_crawling(max_pages)
+    except Exception as e:
+        typer.echo(f"Error during crawling: {str(e)}")
+        raise typer.Exit(1)
+
+
+@app.command()
+def status(
+    address: str = typer.Option(
+        '127.0.0.1:8740',
+        "--coordinator",
+        help="Address of the coordinator, as 'host:port'"
+    )
+):
+    """
+    Print the workers and the inbox of a running coordinator.
+    """
+    client = distributed.CoordinatorClient(parse_address(address))
+    try:
+        typer.echo(json.dumps(client.call('status'), indent=2))
+    except ConnectionError as e:
+        typer.echo(f"Error: {e}")
+        raise typer.Exit(1)
+    finally:
+        client.close()
+
+
+def main():
+    app()
+
+
+if __name__ == "__main__":
+    main()
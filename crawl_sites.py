@@ -0,0 +1,200 @@
+import typer
+from typing import List, Optional, Tuple
+from _crawling_functions import (
+    new_crawlers, _checker_funcs, checker_spec, crawling_objects,
+    http_client, metrics, orchestrator
+)
+
+
+app = typer.Typer()
+
+
+def load_checker(name, specs):
+    """Find a checker function of _checker_funcs or a checkers.ini section."""
+    if hasattr(_checker_funcs, name):
+        return getattr(_checker_funcs, name)
+    if name in specs:
+        return specs[name]
+    raise typer.BadParameter(
+        f"Unknown checker '{name}'. Available functions: "
+        f"{[f for f in dir(_checker_funcs) if not f.startswith('_')]}, "
+        f"checkers.ini: {list(specs)}"
+    )
+
+
+def validate_store(store: str) -> str:
+    """Check that the queue store is one the crawler knows."""
+    if store not in new_crawlers.STORES:
+        raise typer.BadParameter(
+            f"Unknown store '{store}', choose from {list(new_crawlers.STORES)}"
+        )
+    return store
+
+
+@app.command()
+def crawl_sites(
+    sites: List[str] = typer.Argument(
+        ..., help="Site directories (patterns.ini sections) to crawl"
+    ),
+    checkers: Optional[List[str]] = typer.Option(
+        None,
+        "--checker", "-c",
+        help="Checker of a site as 'site=checker', a function from "
+             "_checker_funcs or a section of checkers.ini"
+    ),
+    concurrency: int = typer.Option(
+        16,
+        "--concurrency", "-n",
+        help="Number of requests kept in flight over all sites"
+    ),
+    per_site: int = typer.Option(
+        4,
+        "--per-site",
+        help="Number of requests kept in flight for one site"
+    ),
+    per_host: int = typer.Option(
+        1,
+        "--per-host",
+        help="Maximum number of simultaneous requests to one host"
+    ),
+    delay: Tuple[float, float] = typer.Option(
+        (3, 7),
+        "--delay",
+        help="Range of seconds to wait between two requests to one host"
+    ),
+    max_pages: Optional[int] = typer.Option(
+        None,
+        "--max-pages",
+        help="Maximum number of pages crawled per site"
+    ),
+    status_interval: float = typer.Option(
+        60,
+        "--status-interval",
+        help="Seconds between two status tables of all sites"
+    ),
+    headers: Optional[List[str]] = typer.Option(
+        None,
+        "--header", "-H",
+        help="Default header sent with every request, as 'Name: value'"
+    ),
+    ordering: str = typer.Option(
+        'bfs',
+        "--order",
+        help="Order of the queues: bfs, article (articles first) or host"
+    ),
+    store: str = typer.Option(
+        'memory',
+        "--store",
+        callback=validate_store,
+        help="Keep queues and visited URLs in memory or in sqlite databases"
+    ),
+    storage: str = typer.Option(
+        'json',
+        "--storage",
+        help="Store pages as one json file each or in jsonl segments"
+    ),
+    dedup: str = typer.Option(
+        'off',
+        "--dedup",
+        help="Do not store duplicate pages: off, exact or near"
+    ),
+    metrics_port: Optional[int] = typer.Option(
+        None,
+        "--metrics-port",
+        help="Port of a local HTTP endpoint exporting the metrics at "
+             "/metrics in the Prometheus format"
+    )
+):
+    """
+    Crawl several sites at once with one shared fetch engine.
+
+    Every site keeps its own queue, storage and checker, while the
+    requests of all sites share the connection pool and the per-host
+    politeness.
+    """
+    try:
+        http_client.configure(
+            headers=http_client.parse_header_options(headers),
+            pool_maxsize=max(16, concurrency)
+        )
+    except ValueError as e:
+        typer.echo(f"Error: {e}")
+        raise typer.Exit(1)
+
+    if metrics_port is not None:
+        try:
+            metrics.serve(metrics_port)
+        except OSError as e:
+            typer.echo(f"Error: Cannot serve the metrics: {e}")
+            raise typer.Exit(1)
+
+    try:
+        specs = checker_spec.load_checkers('checkers.ini')
+    except ValueError as e:
+        typer.echo(f"Error in checkers.ini: {e}")
+        raise typer.Exit(1)
+
+    site_checkers = {}
+    for option in checkers or ():
+        site, sep, name = option.partition('=')
+        if not sep or site.rstrip('/') not in [s.rstrip('/') for s in sites]:
+            typer.echo(f"Error: Invalid checker '{option}', expected "
+                       f"'site=checker' for one of {sites}")
+            raise typer.Exit(1)
+        site_checkers[site.rstrip('/')] = load_checker(name, specs)
+
+    crawlers = {}
+    for site in sites:
+        site = site.rstrip('/')
+        settings = crawling_objects.CrawlSettings(
+            concurrency=per_site,
+            per_host=per_host,
+            delay=delay,
+            ordering=ordering,
+            store=store,
+            storage=storage,
+            dedup=dedup
+        )
+        try:
+            if site in site_checkers:
+                crawlers[site] = new_crawlers.CheckerCrawler(
+                    site, site_checkers[site], settings=settings
+                )
+            else:
+                crawlers[site] = new_crawlers.ClassicCrawler(
+                    site, settings=settings
+                )
+        except KeyError as e:
+            typer.echo(f"Error: Cannot crawl {site}: no section {e} "
+                       f"in patterns.ini")
+            raise typer.Exit(1)
+        except (OSError, ValueError) as e:
+            typer.echo(f"Error: Cannot crawl {site}: {e}")
+            raise typer.Exit(1)
+
+    try:
+        crawl = orchestrator.Orchestrator(
+            crawlers,
+            concurrency=concurrency,
+            per_site=per_site,
+            per_host=per_host,
+            delay=delay,
+            status_interval=status_interval
+        )
+    except ValueError as e:
+        typer.echo(f"Error: {e}")
+        raise typer.Exit(1)
+
+    try:
+        crawl.start_crawling(max_pages)
+    except Exception as e:
+        typer.echo(f"Error during crawling: {str(e)}")
+        raise typer.Exit(1)
+
+
+def main():
+    app()
+
+
+if __name__ == "__main__":
+    main()
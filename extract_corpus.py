@@ -0,0 +1,224 @@
+import os
+import time
+import typer
+from typing import List, Optional
+from tqdm import tqdm
+from _crawling_functions import (
+    canonicalize, corpus_extract, crawl_store, crawling_objects,
+    retrieve_data, url_classifier, write_data
+)
+
+
+app = typer.Typer()
+
+# URLs written to a queue at once
+BATCH_SIZE = 10000
+
+
+def batches(urls, size=BATCH_SIZE):
+    batch = []
+    for url in urls:
+        batch.append(url)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def read_known(paths, reader):
+    """Read the URLs of the tracking files that exist."""
+    known = set()
+    for path in paths:
+        if os.path.exists(path):
+            known |= reader(path)
+    return known
+
+
+def reseed_site(site, urls, config, section):
+    """
+    Queue the links of the corpus that belong to the site and were
+    neither crawled nor queued yet.
+
+    With the sqlite store the links go into crawl.sqlite, otherwise they
+    are appended to queue.txt.
+
+    Returns:
+        int: The number of queued links.
+    """
+    patterns = crawling_objects.UrlPatterns(config, section)
+    classifier = url_classifier.UrlClassifier.from_patterns(patterns)
+    canonicalizer = canonicalize.UrlCanonicalizer(patterns.drop_params)
+    tracking = crawling_objects.TrackingFiles(site)
+    relevant = (
+        url for url in map(canonicalizer.canonical, urls)
+        if classifier.classify(url) != url_classifier.IRRELEVANT
+    )
+
+    queued = 0
+    if os.path.exists(tracking.store):
+        store = crawl_store.CrawlStore(
+            tracking.store, classify=classifier.page_kind, reset_leases=False
+        )
+        try:
+            for batch in batches(relevant):
+                queued += len(store.enqueue(batch))
+        finally:
+            store.close()
+        return queued
+
+    known = read_known(
+        (tracking.visited, tracking.queue), retrieve_data.read_linklist
+    )
+    for batch in batches(relevant):
+        new = [url for url in dict.fromkeys(batch) if url not in known]
+        known.update(new)
+        write_data.append_lines_to_file(tracking.queue, new)
+        queued += len(new)
+    return queued
+
+
+def reseed_media(media_dir, urls):
+    """
+    Append the images of the corpus that the media crawler of a media
+    directory neither downloaded nor queued yet to its queue.
+
+    Returns:
+        int: The number of queued images.
+    """
+    tracking = crawling_objects.MediaTrackingFiles(
+        media_dir, crawling_objects.MediaGoalDirectory(media_dir)
+    )
+    os.makedirs(os.path.dirname(tracking.queue), exist_ok=True)
+    known = read_known(
+        (
+            tracking.image_index, tracking.pdf_index, tracking.video_index,
+            tracking.audio_index
+        ),
+        retrieve_data.read_index_csv
+    ) | read_known((tracking.queue,), retrieve_data.read_linklist)
+
+    queued = 0
+    for batch in batches(urls):
+        new = [url for url in batch if url not in known]
+        known.update(new)
+        write_data.append_lines_to_file(tracking.queue, new)
+        queued += len(new)
+    return queued
+
+
+@app.command()
+def extract_corpus(
+    site: str = typer.Argument(..., help="Site directory of the corpus"),
+    images: bool = typer.Option(
+        False,
+        "--images",
+        help="Extract the images instead of the links"
+    ),
+    folders: Optional[List[str]] = typer.Option(
+        None,
+        "--folder",
+        help="Corpus folder to read instead of the page folders of the site"
+    ),
+    workers: Optional[int] = typer.Option(
+        None,
+        "--workers", "-w",
+        help="Worker processes, the number of CPU cores by default"
+    ),
+    chunk_size: int = typer.Option(
+        corpus_extract.CHUNK_SIZE,
+        "--chunk-size",
+        help="Files handed to a worker process at once"
+    ),
+    new_only: bool = typer.Option(
+        False,
+        "--new-only",
+        help="Only use the files extracted in this run"
+    ),
+    out: Optional[str] = typer.Option(
+        None,
+        "--out", "-o",
+        help="Write the extracted URLs to this file, one per line"
+    ),
+    reseed: bool = typer.Option(
+        False,
+        "--reseed",
+        help="Queue the links that belong to the site and were not crawled"
+    ),
+    media: Optional[str] = typer.Option(
+        None,
+        "--media",
+        help="Media directory whose queue the images are added to"
+    ),
+    config: str = typer.Option(
+        'patterns.ini',
+        "--config",
+        help="Patterns file used by --reseed"
+    ),
+    section: Optional[str] = typer.Option(
+        None,
+        "--section",
+        help="Section of the patterns file, the site directory by default"
+    )
+):
+    """
+    Extract the links or images of the stored pages of a site in a pool
+    of processes. The results of every file are cached in
+    resources/extract_cache.sqlite, so running it again only parses the
+    pages stored since.
+    """
+    site = site.rstrip('/')
+    kind = corpus_extract.IMAGES if images else corpus_extract.LINKS
+    if reseed and images:
+        raise typer.BadParameter('--reseed takes links, use --media')
+    if media and not images:
+        raise typer.BadParameter('--media takes images, add --images')
+
+    goal = crawling_objects.GoalDirectory(site)
+    tracking = crawling_objects.TrackingFiles(site)
+    os.makedirs(os.path.dirname(tracking.extract_cache), exist_ok=True)
+    paths = corpus_extract.list_files(
+        folders or [goal.article, goal.not_article]
+    )
+
+    started = time.time()
+    cache = corpus_extract.ExtractionCache(tracking.extract_cache, site)
+    try:
+        with tqdm(desc='Extracting files') as bar:
+            extracted = corpus_extract.update(
+                cache, paths, workers, chunk_size,
+                progress=lambda count: bar.update()
+            )
+        typer.echo(
+            f'Extracted {extracted} of {len(paths)} files, '
+            f'{len(paths) - extracted} were cached'
+        )
+
+        since = started if new_only else None
+        if out is not None:
+            written = 0
+            with open(out, 'w', encoding='utf-8') as file:
+                for url in cache.unique_urls(kind, since):
+                    file.write(url + '\n')
+                    written += 1
+            typer.echo(f'Wrote {written} {kind} to {out}')
+        if reseed:
+            queued = reseed_site(
+                site, cache.unique_urls(kind, since), config, section or site
+            )
+            typer.echo(f'Queued {queued} links for {site}')
+        if media is not None:
+            queued = reseed_media(
+                media.rstrip('/'), cache.unique_urls(kind, since)
+            )
+            typer.echo(f'Queued {queued} images for {media}')
+    finally:
+        cache.close()
+
+
+def main():
+    app()
+
+
+if __name__ == "__main__":
+    main()
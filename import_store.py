@@ -0,0 +1,47 @@
+import sys
+from _crawling_functions import crawl_store, crawling_objects, url_classifier
+
+
+def handle_cmd_line_args():
+    """Handle the command line arguments.
+
+    Returns:
+        str: The site directory and the name of its patterns.ini section.
+    """
+    if len(sys.argv) < 2:
+        print('Usage: python import_store.py <site_dir> [ordering]')
+        sys.exit(1)
+
+    sitename = sys.argv[1]
+    if sitename.endswith('/'):
+        sitename = sitename[:-1]
+
+    try:
+        ordering = sys.argv[2]
+    except IndexError:
+        ordering = 'bfs'
+
+    return sitename, ordering
+
+
+SITENAME, ORDERING = handle_cmd_line_args()
+
+patterns = crawling_objects.UrlPatterns('patterns.ini', SITENAME)
+classifier = url_classifier.UrlClassifier.from_patterns(patterns)
+tracking = crawling_objects.TrackingFiles(SITENAME)
+
+store = crawl_store.CrawlStore(
+    tracking.store, ordering=ORDERING, classify=classifier.page_kind
+)
+visited, queued = crawl_store.import_text_resources(
+    store,
+    tracking,
+    accept=lambda url: classifier.classify(url) != url_classifier.IRRELEVANT
+)
+store.set_imported()
+print(f'Imported {visited} visited and {queued} queued URLs into {tracking.store}')
+print(
+    f'Store now holds {store.count(crawl_store.QUEUED)} queued and '
+    f'{store.count(crawl_store.VISITED)} visited URLs'
+)
+store.close()
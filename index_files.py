@@ -1,5 +1,6 @@
 import os
 import sys
+from _crawling_functions import manifest
 
 
 def rename_files_with_padded_index(directory):
@@ -15,6 +16,7 @@ def rename_files_with_padded_index(directory):
     num_digits = len(str(num_files))
 
     # Iterate over each file and rename it with a zero-padded index
+    moves = []
     for index, filename in enumerate(files):
         # Construct zero-padded index
         padded_index = str(index + 1).zfill(num_digits)
@@ -27,6 +29,20 @@ def rename_files_with_padded_index(directory):
             os.path.join(directory, filename),
             os.path.join(directory, new_filename)
         )
+        moves.append((
+            os.path.join(directory, filename),
+            os.path.join(directory, new_filename)
+        ))
+
+    # Keep the URL of every renamed file in the manifest of the site
+    site = os.path.dirname(os.path.abspath(directory))
+    site_manifest = manifest.open_manifest(site)
+    if site_manifest is not None:
+        site_manifest.relocate(
+            (os.path.abspath(old), os.path.abspath(new))
+            for old, new in moves
+        )
+        site_manifest.close()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,60 @@
+import os
+import sys
+from _crawling_functions import (
+    crawl_store, crawling_objects, journal, page_store
+)
+
+
+def handle_cmd_line_args():
+    """Handle the command line arguments.
+
+    Returns:
+        str: The site directory.
+    """
+    if len(sys.argv) < 2:
+        print('Usage: python recover_crawl.py <site_dir>')
+        sys.exit(1)
+
+    sitename = sys.argv[1]
+    if sitename.endswith('/'):
+        sitename = sitename[:-1]
+
+    return sitename
+
+
+SITENAME = handle_cmd_line_args()
+
+tracking = crawling_objects.TrackingFiles(SITENAME)
+goal_dir = crawling_objects.GoalDirectory(SITENAME)
+
+# Replay the complete groups of the journal into the text files
+replayed = journal.recover(tracking)
+dropped = replayed.pop('dropped_bytes')
+rewound = replayed.pop('rewound_bytes')
+if rewound:
+    print(f'Removed {rewound} bytes of an unfinished checkpoint '
+          f'from the text files')
+for view, count in replayed.items():
+    if count:
+        print(f'Replayed {count} lines into {getattr(tracking, view)}')
+print(f'Dropped {dropped} bytes of an unfinished group from the journal')
+
+# Put the URLs that were in progress back into the queue
+if os.path.exists(tracking.store):
+    store = crawl_store.CrawlStore(tracking.store, reset_leases=False)
+    released = store.release_leases()
+    print(f'Released {released} leased URLs in {tracking.store}')
+    store.close()
+
+# Cut off partly written records at the end of the page segments
+for folder in (goal_dir.article, goal_dir.not_article):
+    if os.path.isdir(folder) and any(
+        page_store.is_segment(f) for f in os.listdir(folder)
+    ):
+        page_store.SegmentWriter(folder).close()
+        print(f'Checked the segments in {folder}')
+
+# A filter saved halfway is ignored, the next start rebuilds it
+if os.path.exists(tracking.visited_filter + '.tmp'):
+    os.remove(tracking.visited_filter + '.tmp')
+    print('Removed an unfinished visited filter')
@@ -0,0 +1,80 @@
+import json
+import time
+import typer
+from typing import List, Optional
+from _crawling_functions import site_status
+
+
+app = typer.Typer()
+
+
+def collect(directories, root):
+    """Read the summaries of the site directories, see site_status."""
+    rows = []
+    missing = []
+    for directory in directories or site_status.find_sites(root):
+        row = site_status.site_status(directory.rstrip('/'))
+        if row is None:
+            missing.append(directory)
+        else:
+            rows.append(row)
+    return rows, missing
+
+
+def render(rows, missing):
+    lines = [site_status.format_table(rows)]
+    if missing:
+        lines.append(f"No summary yet: {', '.join(missing)}")
+    return '\n'.join(lines)
+
+
+@app.command()
+def status(
+    directories: Optional[List[str]] = typer.Argument(
+        None, help="Site directories, all directories below --root if none"
+    ),
+    root: str = typer.Option(
+        '.',
+        "--root",
+        help="Directory holding the site directories"
+    ),
+    watch: Optional[float] = typer.Option(
+        None,
+        "--watch", "-w",
+        help="Refresh the table every so many seconds until Ctrl-C"
+    ),
+    as_json: bool = typer.Option(
+        False,
+        "--json",
+        help="Print the summaries as json"
+    )
+):
+    """
+    Print the stored pages, queue, error rate, throughput and last
+    activity of every site from the summaries kept by the crawlers.
+    """
+    if watch is None:
+        rows, missing = collect(directories, root)
+        if as_json:
+            typer.echo(json.dumps(rows, indent=2))
+        else:
+            typer.echo(render(rows, missing))
+        return
+
+    try:
+        while True:
+            rows, missing = collect(directories, root)
+            # Clear the terminal and draw the table from the top
+            typer.echo('\033[H\033[J' + time.strftime('%H:%M:%S'))
+            typer.echo(render(rows, missing))
+            time.sleep(watch)
+    except KeyboardInterrupt:
+        pass
+
+
+def main():
+    app()
+
+
+if __name__ == "__main__":
+    main()